@@ -0,0 +1,42 @@
+import argparse
+import logging
+import sys
+from main_functions.batch_runner import run_batch
+
+# Set up logging configurations.
+logging.basicConfig(
+    filename='batch_reports.log',
+    filemode='a',
+    format='%(asctime)s - %(processName)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+
+
+def main():
+    """
+    Entry point for the headless report runner.
+
+    Runs the reports listed in a manifest without the GUI, e.g. from cron:
+
+        0 2 * * * cd /opt/gestao_inventario && python3 batch_reports.py nightly.json
+
+    Exits with status 1 if any task failed.
+    """
+    parser = argparse.ArgumentParser(description="Run report packs without the GUI.")
+    parser.add_argument('manifest', help="JSON manifest with reports, filiais and periodos")
+    args = parser.parse_args()
+
+    try:
+        results = run_batch(args.manifest)
+    except Exception as e:
+        logging.error(f"An unexpected error occurred while running the batch: {e}")
+        raise
+
+    failed = [result for result in results if result['status'] != 'ok']
+    print(f"{len(results) - len(failed)} of {len(results)} reports written")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    # If the script is executed as the main module, call the main function.
+    main()
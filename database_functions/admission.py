@@ -0,0 +1,162 @@
+import collections
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from database_functions.cancellation import QueryCancelled
+from database_functions.db_connect import config
+
+# Get a logger
+logger = logging.getLogger(__name__)
+
+# Classes of work, in the order they are served.
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+PRIORITIES = (INTERACTIVE, BULK)
+
+# Waits longer than this are logged.
+SLOW_QUEUE_SECONDS = 1.0
+
+
+class AdmissionController:
+    """
+    Decides when a statement may run, so bulk work cannot crowd out the lookups.
+
+    Interactive lookups (searches, stock) and bulk jobs (reports, table dumps)
+    have separate concurrency budgets and separate FIFO queues. Interactive
+    requests may also borrow a free bulk slot, and when a slot frees up the
+    interactive queue is served first; bulk requests never use interactive
+    slots. The time every request spends queued is kept for the metrics.
+    """
+
+    def __init__(self, interactive_slots=4, bulk_slots=2, samples=1000):
+        """
+        Parameters:
+        - interactive_slots (int): Statements of the interactive class running at once.
+        - bulk_slots (int): Statements of the bulk class running at once.
+        - samples (int): Queue times kept per class for the percentiles.
+        """
+        self.budgets = {INTERACTIVE: interactive_slots, BULK: bulk_slots}
+        self.running = {INTERACTIVE: 0, BULK: 0}
+        self._waiters = {priority: collections.deque() for priority in PRIORITIES}
+        self._queue_times = {priority: collections.deque(maxlen=samples) for priority in PRIORITIES}
+        self._requests = {priority: 0 for priority in PRIORITIES}
+        self._lock = threading.Lock()
+
+    def _free_pool(self, priority):
+        # Pool of slots a request of this class may take now, or None.
+        if priority == INTERACTIVE:
+            for pool in (INTERACTIVE, BULK):
+                if self.running[pool] < self.budgets[pool]:
+                    return pool
+            return None
+        if self.running[BULK] < self.budgets[BULK] and not self._waiters[INTERACTIVE]:
+            return BULK
+        return None
+
+    def _dispatch(self):
+        # Hand the free slots to the queued requests, interactive ones first.
+        for priority in PRIORITIES:
+            while self._waiters[priority]:
+                pool = self._free_pool(priority)
+                if pool is None:
+                    break
+                waiter = self._waiters[priority].popleft()
+                self.running[pool] += 1
+                waiter['pool'] = pool
+                waiter['event'].set()
+
+    def acquire(self, priority=BULK, token=None):
+        """
+        Wait for a slot.
+
+        Parameters:
+        - priority (str): 'interactive' or 'bulk'.
+        - token (CancellationToken, optional): Stops waiting when cancelled.
+
+        Returns:
+        - str: The pool of the slot, to pass to 'release'.
+        """
+        if priority not in PRIORITIES:
+            priority = BULK
+        start = time.monotonic()
+        with self._lock:
+            self._requests[priority] += 1
+            pool = None if self._waiters[priority] else self._free_pool(priority)
+            if pool is not None:
+                self.running[pool] += 1
+                self._queue_times[priority].append(0.0)
+                return pool
+            waiter = {'event': threading.Event(), 'pool': None}
+            self._waiters[priority].append(waiter)
+
+        while not waiter['event'].wait(0.2):
+            if token and token.cancelled:
+                with self._lock:
+                    if waiter['pool'] is None:
+                        self._waiters[priority].remove(waiter)
+                        raise QueryCancelled()
+                # A slot arrived together with the cancellation: give it back below.
+                break
+
+        waited = time.monotonic() - start
+        with self._lock:
+            self._queue_times[priority].append(waited)
+        if waited >= SLOW_QUEUE_SECONDS:
+            logger.info(f"{priority} request waited {waited:.1f}s for a database slot")
+        if token and token.cancelled:
+            self.release(waiter['pool'])
+            raise QueryCancelled()
+        return waiter['pool']
+
+    def release(self, pool):
+        """
+        Give back a slot taken by 'acquire'.
+        """
+        with self._lock:
+            self.running[pool] -= 1
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, priority=BULK, token=None):
+        """
+        Hold a slot of the given class while the block runs.
+        """
+        pool = self.acquire(priority, token)
+        try:
+            yield pool
+        finally:
+            self.release(pool)
+
+    def metrics(self):
+        """
+        Queue statistics of each class.
+
+        Returns:
+        - dict: Per class: 'requests', 'running', 'waiting', 'budget' and the
+          p50, p95 and max queue time in seconds over the last samples.
+        """
+        with self._lock:
+            result = {}
+            for priority in PRIORITIES:
+                times = sorted(self._queue_times[priority])
+
+                def percentile(fraction):
+                    return round(times[min(len(times) - 1, int(fraction * len(times)))], 3) if times else None
+
+                result[priority] = {
+                    'requests': self._requests[priority],
+                    'running': self.running[priority],
+                    'waiting': len(self._waiters[priority]),
+                    'budget': self.budgets[priority],
+                    'queue_p50': percentile(0.5),
+                    'queue_p95': percentile(0.95),
+                    'queue_max': round(times[-1], 3) if times else None,
+                }
+            return result
+
+
+admission = AdmissionController(
+    interactive_slots=config.getint('admission', 'interactive_slots', fallback=4),
+    bulk_slots=config.getint('admission', 'bulk_slots', fallback=2),
+)
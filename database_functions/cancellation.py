@@ -0,0 +1,73 @@
+import logging
+import threading
+
+# Get a logger
+logger = logging.getLogger(__name__)
+
+
+class QueryCancelled(Exception):
+    """
+    Raised by a fetch backend when its statement was cancelled through a CancellationToken.
+    """
+
+
+class CancellationToken:
+    """
+    Lets the thread that started a query cancel it from another thread.
+
+    The fetch backend attaches a callback that interrupts the running statement
+    on the server (pyodbc 'Cursor.cancel', sqlite3 'Connection.interrupt');
+    'cancel' sets the flag and runs the attached callbacks.
+    """
+
+    def __init__(self):
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """
+        Mark the token as cancelled and interrupt the statements attached to it.
+        """
+        with self._lock:
+            self._cancelled.set()
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"An error occurred while cancelling a statement: {e}")
+
+    def attach(self, callback):
+        """
+        Register the callback that interrupts the running statement.
+
+        If the token is already cancelled the callback runs right away.
+
+        Parameters:
+        - callback (callable): Function without arguments that cancels the statement.
+        """
+        with self._lock:
+            if not self._cancelled.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def detach(self, callback):
+        """
+        Remove a callback once its statement has finished.
+        """
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def raise_if_cancelled(self):
+        """
+        Raise QueryCancelled if the token was cancelled.
+        """
+        if self.cancelled:
+            raise QueryCancelled()
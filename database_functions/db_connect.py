@@ -10,39 +10,45 @@ app_path = os.path.abspath(os.path.dirname(sys.argv[0]))
 # Construct the path to the .ini file
 config_path = os.path.join(app_path, 'db_config.ini')
 
-with open(config_path, 'r', encoding='utf-8') as f:
-    config_content = f.read()
-
+# A missing file leaves the configuration empty, so modules that only need the
+# optional sections (or no database at all, like the tests) can still be imported.
 config = configparser.ConfigParser()
-config.read_string(config_content)
+config.read(config_path, encoding='utf-8')
 
 # Get a logger
 logger = logging.getLogger(__name__)
 
 
 class Database:
-    def __init__(self, db_config, db_type='sql_server'):
+    def __init__(self, db_config, db_type='sql_server', section=None):
         """
         Initialize the Database object.
         
         Parameters:
         - db_config: Configuration dictionary containing the database parameters
-        - db_type (str): The type of the database. Supported values are 'sql_server' and 'mysql'.
+        - db_type (str): The type of the database. Supported values are 'sql_server', 'mysql' and 'sqlite'.
+        - section (str, optional): Configuration section with the parameters. Defaults to the
+          section named after the type; other names allow a second server of the same type.
         """
         self.db_type = db_type
         self.connection = None
+        section = section or db_type
 
         if self.db_type == 'sql_server':
-            self.sql_server = db_config['sql_server']['server']
-            self.sql_database = db_config['sql_server']['database']
-            self.sql_username = db_config['sql_server']['username']
-            self.sql_password = db_config['sql_server']['password']
+            self.sql_server = db_config[section]['server']
+            self.sql_database = db_config[section]['database']
+            self.sql_username = db_config[section]['username']
+            self.sql_password = db_config[section]['password']
 
         elif self.db_type == 'mysql':
-            self.mysql_username = db_config['mysql']['username']
-            self.mysql_password = db_config['mysql']['password']
-            self.mysql_host = db_config['mysql']['host']
-            self.mysql_database = db_config['mysql']['database']
+            self.mysql_username = db_config[section]['username']
+            self.mysql_password = db_config[section]['password']
+            self.mysql_host = db_config[section]['host']
+            self.mysql_database = db_config[section]['database']
+
+        elif self.db_type == 'sqlite':
+            # Local stand-in database used for development and benchmarks.
+            self.sqlite_path = db_config[section]['path']
 
         else:
             logger.error(f"Unsupported database type: {self.db_type}")
@@ -61,6 +67,8 @@ class Database:
             return self.connect_sql_server()
         elif self.db_type == 'mysql':
             return self.connect_mysql()
+        elif self.db_type == 'sqlite':
+            return self.connect_sqlite()
 
     def connect_sql_server(self):
         """
@@ -97,3 +105,19 @@ class Database:
         except Exception as e:
             logger.error(f"An error occurred while connecting to the MySQL database: {e}")
             return None
+
+    def connect_sqlite(self):
+        """
+        Establish a connection to a SQLite stand-in database.
+
+        Returns:
+        - Connection object: If successful.
+        - None: Otherwise.
+        """
+
+        try:
+            self.connection = create_engine(f"sqlite:///{self.sqlite_path}")
+            return self.connection
+        except Exception as e:
+            logger.error(f"An error occurred while connecting to the SQLite database: {e}")
+            return None
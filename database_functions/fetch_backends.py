@@ -0,0 +1,207 @@
+import logging
+from decimal import Decimal
+import numpy as np
+import pandas as pd
+from database_functions.cancellation import QueryCancelled
+
+# Get a logger
+logger = logging.getLogger(__name__)
+
+
+class FetchBackend:
+    """
+    Base class for the strategies used to turn a SQL query into a DataFrame.
+
+    Subclasses implement 'fetch', receiving the SQLAlchemy engine returned by
+    'Database.connect' and returning a DataFrame with the query result.
+    Backends that set 'cancellable' interrupt the running statement when the
+    CancellationToken passed to 'fetch' is cancelled. The optional
+    ProgressReporter passed to 'fetch' receives the phases and the rows read.
+    """
+    name = None
+    cancellable = False
+
+    def fetch(self, engine, query, params=None, token=None, progress=None):
+        raise NotImplementedError
+
+
+class PandasBackend(FetchBackend):
+    """
+    Fetch data through 'pd.read_sql', the original download path.
+    """
+    name = 'pandas'
+
+    # Rows per chunk when the progress is reported.
+    chunksize = 5000
+
+    def fetch(self, engine, query, params=None, token=None, progress=None):
+        if token:
+            token.raise_if_cancelled()
+        if progress is None:
+            if params:
+                return pd.read_sql(query, engine, params=params)
+            return pd.read_sql(query, engine)
+
+        # Read in chunks to count the rows as they arrive.
+        progress.phase('executando')
+        chunks = []
+        for chunk in pd.read_sql(query, engine, params=params or None, chunksize=self.chunksize):
+            if not chunks:
+                progress.phase('lendo')
+            chunks.append(chunk)
+            progress.add_rows(len(chunk))
+        return pd.concat(chunks, ignore_index=True)
+
+
+class CursorBackend(FetchBackend):
+    """
+    Fetch data through a raw DBAPI cursor, assembling the result column by column.
+
+    Rows are read in blocks of 'arraysize' with 'fetchmany' and each block is
+    transposed straight into NumPy arrays, so no intermediate list of row tuples
+    for the whole result is ever kept in memory.
+    """
+    name = 'cursor'
+    cancellable = True
+
+    def __init__(self, arraysize=5000):
+        """
+        Parameters:
+        - arraysize (int): Number of rows requested from the driver per round trip.
+        """
+        self.arraysize = arraysize
+
+    def fetch(self, engine, query, params=None, token=None, prepare=None, progress=None):
+        """
+        Parameters:
+        - engine: SQLAlchemy engine of the database.
+        - query (str): SQL query to execute.
+        - params (tuple, optional): Parameters for the SQL query.
+        - token (CancellationToken, optional): Token used to cancel the statement.
+        - prepare (callable, optional): Called with the cursor before the query, on the
+          same connection, e.g. to fill a temporary table the query reads.
+        - progress (ProgressReporter, optional): Receives the phases and the rows read.
+
+        Returns:
+        - DataFrame: The query result.
+        """
+        if token:
+            token.raise_if_cancelled()
+        raw_connection = engine.raw_connection()
+        cancel = None
+        try:
+            cursor = raw_connection.cursor()
+            cursor.arraysize = self.arraysize
+            if token:
+                cancel = _cancel_callback(raw_connection, cursor)
+                token.attach(cancel)
+            if prepare:
+                prepare(cursor)
+            if progress:
+                progress.phase('executando')
+            cursor.execute(query, tuple(params) if params else ())
+            if progress:
+                progress.phase('lendo')
+            columns = [description[0] for description in cursor.description]
+            blocks = [[] for _ in columns]
+
+            # Read the result in blocks and keep one array per column and block.
+            while True:
+                if token:
+                    token.raise_if_cancelled()
+                rows = cursor.fetchmany(self.arraysize)
+                if not rows:
+                    break
+                for index, values in enumerate(zip(*rows)):
+                    block = np.empty(len(values), dtype=object)
+                    block[:] = values
+                    blocks[index].append(block)
+                if progress:
+                    progress.add_rows(len(rows))
+            cursor.close()
+        except QueryCancelled:
+            raise
+        except Exception as e:
+            # The driver reports a cancelled statement as an ordinary error.
+            if token and token.cancelled:
+                raise QueryCancelled() from e
+            raise
+        finally:
+            if cancel:
+                token.detach(cancel)
+            raw_connection.close()
+
+        data = {column: _column_array(column_blocks) for column, column_blocks in zip(columns, blocks)}
+        return pd.DataFrame(data, columns=columns).infer_objects()
+
+
+def _cancel_callback(raw_connection, cursor):
+    """
+    Find the driver call that interrupts the statement running on a cursor.
+
+    pyodbc cancels per cursor ('Cursor.cancel'); sqlite3 interrupts the whole
+    connection ('Connection.interrupt').
+    """
+    if hasattr(cursor, 'cancel'):
+        return cursor.cancel
+    driver_connection = getattr(raw_connection, 'driver_connection', raw_connection)
+    return getattr(driver_connection, 'interrupt', lambda: None)
+
+
+def _column_array(blocks):
+    """
+    Join the blocks of a column and convert numeric columns to float arrays.
+
+    Mirrors the 'coerce_float' behaviour of 'pd.read_sql': Decimal values returned
+    by the driver become floats and NULLs in numeric columns become NaN.
+
+    Parameters:
+    - blocks (list): Object arrays with the values of one column.
+
+    Returns:
+    - np.ndarray: The full column.
+    """
+    if not blocks:
+        return np.empty(0, dtype=object)
+    values = np.concatenate(blocks)
+    nulls = np.equal(values, None)
+    sample = next((value for value in values[~nulls][:1]), None)
+
+    if isinstance(sample, Decimal) or (isinstance(sample, (int, float)) and not isinstance(sample, bool)):
+        # Integer only when every value is one; SQLite and T-SQL expressions can mix ints and floats.
+        if not nulls.any() and all(isinstance(value, int) and not isinstance(value, bool) for value in values):
+            try:
+                return values.astype(np.int64)
+            except OverflowError:
+                pass
+        try:
+            values[nulls] = np.nan
+            return values.astype(np.float64)
+        except (TypeError, ValueError):
+            # Mixed column, keep the original objects.
+            values[nulls] = None
+    return values
+
+
+# Available fetch backends, keyed by name.
+BACKENDS = {
+    PandasBackend.name: PandasBackend,
+    CursorBackend.name: CursorBackend,
+}
+
+
+def get_backend(name='pandas', **options):
+    """
+    Create the fetch backend registered under the given name.
+
+    Parameters:
+    - name (str): Backend name, one of the keys of BACKENDS.
+    - options: Keyword arguments passed to the backend constructor.
+
+    Returns:
+    - FetchBackend: The backend instance.
+    """
+    if name not in BACKENDS:
+        logger.error(f"Unsupported fetch backend: {name}")
+        raise ValueError(f"Unsupported fetch backend: {name}")
+    return BACKENDS[name](**options)
@@ -2,37 +2,423 @@ import pandas as pd
 import logging
 import os
 import datetime
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from sqlalchemy import exc as sa_exc
+from database_functions.admission import admission
 from database_functions.db_connect import Database, config
+from database_functions.cancellation import QueryCancelled
+from database_functions.fetch_backends import get_backend
+from database_functions.registry import QUERY_REGISTRY, DEFAULT_SETTINGS, find_query
+from database_functions.queries import drop_temp_table, create_codes_table, insert_codes
+from database_functions.local_store import local_store, sync_local_store
+from database_functions.profiler import profile_download
+from database_functions.progress import job_reporter, estimate_rows, record_rows
+from database_functions.snapshots import (snapshot_store, mark_snapshot, offline_enabled, snapshot_max_age)
 from openpyxl import load_workbook
 
 # Get a logger
 logger = logging.getLogger(__name__)
 
+# Engines are created once per database type and reused, so their connection pool survives between queries.
+_engines = {}
+_engines_lock = threading.Lock()
 
-def download(query, params=None):
+# Target of the interactive queries; the other targets fall back to it (see run_on_target).
+PRIMARY = 'primary'
+
+# Targets that failed, with the moment they may be tried again.
+_targets_down = {}
+
+# Optional semaphore limiting the statements running at once (see limit_db_concurrency).
+_db_slots = None
+
+# Set when a query failed and a snapshot was served, cleared once the database answers again.
+_connection_lost = threading.Event()
+
+
+def get_engine(db_type='sql_server'):
+    """
+    Return the shared engine (and connection pool) of a database, creating it on first use.
+
+    Parameters:
+    - db_type (str): Configuration section of the database. Its 'type' key gives the kind
+      of database accepted by Database, and defaults to the section name.
+
+    Returns:
+    - Engine: The SQLAlchemy engine, or None if it could not be created.
+    """
+    with _engines_lock:
+        if db_type not in _engines:
+            kind = config.get(db_type, 'type', fallback=db_type)
+            engine = Database(db_config=config, db_type=kind, section=db_type).connect()
+            if engine is None:
+                return None
+            _engines[db_type] = engine
+        return _engines[db_type]
+
+
+def target_section(target):
+    """
+    Configuration section of a named connection target.
+
+    Targets are listed in the [targets] section, e.g. 'primary = sql_server' and
+    'reporting = sql_server_reporting'. The primary defaults to [sql_server].
+
+    Parameters:
+    - target (str): Name of the target, such as 'primary' or 'reporting'.
+
+    Returns:
+    - str: The section name, or None if the target is not configured.
+    """
+    section = config.get('targets', target, fallback=None)
+    if section is None and target == PRIMARY:
+        return 'sql_server'
+    return section
+
+
+def target_route(target):
+    """
+    Targets to try, in order, for a query routed to a target.
+
+    A target that is not configured, or failed less than 'retry_seconds' ago,
+    is skipped; the primary always comes last.
+
+    Returns:
+    - list: Target names.
+    """
+    if target == PRIMARY or target_section(target) is None:
+        return [PRIMARY]
+    if time.monotonic() < _targets_down.get(target, 0):
+        return [PRIMARY]
+    return [target, PRIMARY]
+
+
+def run_on_target(target, run):
+    """
+    Run a function with the engine of a target, falling back to the primary.
+
+    Only connection errors (see is_connection_error) fall back; the target is
+    then skipped for the next 'retry_seconds' of [targets].
+
+    Parameters:
+    - target (str): Name of the target.
+    - run (callable): Receives the engine and returns the result.
+
+    Returns:
+    - The result of 'run'.
+    """
+    for name in target_route(target):
+        db = get_engine(target_section(name))
+        try:
+            if db is None:
+                raise ConnectionError(f"database engine of target {name} unavailable")
+            return run(db)
+        except Exception as e:
+            if name == PRIMARY or not is_connection_error(e):
+                raise
+            _targets_down[name] = time.monotonic() + config.getint('targets', 'retry_seconds', fallback=60)
+            logger.warning(f"target {name} unavailable, falling back to the primary: {e}")
+
+
+def limit_db_concurrency(semaphore):
+    """
+    Limit the statements running at once to the slots of a semaphore.
+
+    The batch report runner passes the same multiprocessing semaphore to all of
+    its worker processes, so the cap holds across the whole process pool.
+
+    Parameters:
+    - semaphore: A threading or multiprocessing semaphore, or None to remove the limit.
+    """
+    global _db_slots
+    _db_slots = semaphore
+
+
+@contextmanager
+def _db_slot(priority, token=None):
+    # Wait for admission in the class of the query, then for the process pool cap if one is set.
+    with admission.slot(priority, token=token):
+        with _db_slots or nullcontext():
+            yield
+
+
+def is_connection_error(error):
+    """
+    Check whether an exception means the database could not be reached.
+
+    Only these errors fall back to the offline snapshots; a failing statement
+    (syntax, permissions, missing column) must not be hidden behind old data.
+
+    Parameters:
+    - error (Exception): Exception raised while running a query.
+
+    Returns:
+    - bool: True for connection and timeout errors.
+    """
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    if isinstance(error, (sa_exc.OperationalError, sa_exc.InterfaceError)):
+        return True
+    if isinstance(error, sa_exc.DBAPIError) and error.connection_invalidated:
+        return True
+    # The cursor backend raises the driver errors directly (pyodbc, pymysql, sqlite3).
+    return type(error).__name__ in ('OperationalError', 'InterfaceError')
+
+
+def _fresh_snapshot(query, params, name):
+    # Return the snapshot of a query if it is younger than the configured max age.
+    snapshot, created = snapshot_store.load(query, params)
+    if snapshot is not None and datetime.datetime.now() - created <= snapshot_max_age():
+        logger.info(f"download served from snapshot ({name})")
+        return snapshot
+    return None
+
+
+def _keep_snapshot(query, params, name, data_frame, connection_error):
+    # Save a successful result, or fall back to the last snapshot when the database is unreachable.
+    if data_frame is not None:
+        snapshot_store.save(query, params, data_frame, name)
+        if _connection_lost.is_set():
+            # The database is back: refresh the other snapshots in the background.
+            _connection_lost.clear()
+            threading.Thread(target=sync_snapshots, daemon=True).start()
+        return data_frame
+
+    if not connection_error:
+        return None
+
+    snapshot, created = snapshot_store.load(query, params)
+    if snapshot is not None:
+        _connection_lost.set()
+        logger.warning(f"database unavailable, using snapshot of {name} from {created}")
+    return snapshot
+
+
+def download(query, params=None, backend=None, token=None, name=None):
     """
     Downloads data from the database using a specified SQL query.
 
+    When the offline mode is enabled, results of the queries registered with
+    'snapshot' are saved to disk. A snapshot younger than the configured max age
+    is returned without querying the database, and any snapshot is returned if
+    the database cannot be reached (see is_connection_error).
+
     Parameters:
     - query (str): SQL query to execute.
     - params (dict, optional): Parameter for the SQL query.
+    - backend (str, optional): Fetch backend to use. Defaults to the one registered for the query.
+    - token (CancellationToken, optional): Token used to cancel the statement while it runs.
+    - name (str, optional): Registry name of a query generated by a builder, such as 'report_query'.
 
     Returns:
-    - DataFrame: DataFrame containing the results or None if an error occurred.
+    - DataFrame: DataFrame containing the results or None if an error occurred or the query was cancelled.
     """
-    # Create an instance of the Database class and establish a connection.
-    db_instance = Database(db_config=config, db_type='sql_server')
-    db = db_instance.connect()
+    name, settings = find_query(query, name)
+    use_snapshot = settings['snapshot'] and offline_enabled()
+
+    # Serve recent snapshots straight from disk.
+    if use_snapshot:
+        snapshot = _fresh_snapshot(query, params, name)
+        if snapshot is not None:
+            return snapshot
 
+    # Pick the fetch backend registered for this query unless one was requested.
+    fetch_backend = get_backend(backend or settings['backend'])
+    if token and not fetch_backend.cancellable:
+        # Only the cursor backend can interrupt a running statement.
+        fetch_backend = get_backend('cursor')
+
+    # Report the progress to the job of this thread, if one listens (see progress.progress_job).
+    progress = job_reporter(name or 'consulta', lambda: estimate_rows(name, params))
+
+    def fetch_from(db):
+        # Execute the SQL query on the engine of the target and store the result in a DataFrame.
+        with _db_slot(settings['priority'], token):
+            start = time.perf_counter()
+            data_frame = fetch_backend.fetch(db, query, params, token=token, progress=progress)
+            elapsed = time.perf_counter() - start
+        profile_download(db, name, query, params, elapsed, len(data_frame))
+        return data_frame
+
+    connection_error = False
     try:
-        # Execute the SQL query and store the result in a DataFrame.
-        if params:
-            data_frame = pd.read_sql(query, db, params=params)
-        else:
-            data_frame = pd.read_sql(query, db)
-        logger.info("download was successful")
+        if progress:
+            progress.phase('aguardando')
+        data_frame = run_on_target(settings['target'], fetch_from)
+        mark_snapshot(data_frame)
+        record_rows(name, params, len(data_frame))
+        if progress:
+            progress.finish()
+        logger.info(f"download was successful ({name or 'ad hoc query'}, {fetch_backend.name} backend)")
+    except QueryCancelled:
+        logger.info(f"download cancelled ({name or 'ad hoc query'})")
+        return None
+    except Exception as e:
+        logger.error(f"An error occurred: {e}")
+        connection_error = is_connection_error(e)
+        data_frame = None
+
+    if not use_snapshot:
+        return data_frame
+    return _keep_snapshot(query, params, name, data_frame, connection_error)
+
+
+def temp_table_name(engine, name):
+    """
+    Build the name of a session temporary table for the dialect of an engine.
+
+    Parameters:
+    - engine: SQLAlchemy engine.
+    - name (str): Base name of the table.
+
+    Returns:
+    - str: '#name' on SQL Server, 'temp.name' on SQLite.
+    """
+    if engine.dialect.name == 'mssql':
+        return f"#{name}"
+    return f"temp.{name}"
+
+
+def download_for_codes(query, codes, token=None, name='query_resultado_lote'):
+    """
+    Upload a list of product codes once and run a query that joins them, on a single connection.
+
+    The codes go to a session temporary table with a bulk insert (pyodbc
+    'fast_executemany' sends them in one round trip), so the query can resolve
+    all of them in one set-based statement. In offline mode the result is kept
+    as a snapshot of the query and the list of codes.
+
+    Parameters:
+    - query (callable): Receives the temporary table name and returns the SQL query.
+    - codes (list): Product codes, without duplicates.
+    - token (CancellationToken, optional): Token used to cancel the statement while it runs.
+    - name (str): Registry name of the query.
+
+    Returns:
+    - DataFrame: DataFrame containing the results or None if an error occurred or the query was cancelled.
+    """
+    # The snapshot key must not depend on the dialect, so it uses the plain table name.
+    snapshot_query = query('busca_codigos')
+    params = tuple(codes)
+    name, settings = find_query(snapshot_query, name)
+    use_snapshot = settings['snapshot'] and offline_enabled()
+
+    if use_snapshot:
+        snapshot = _fresh_snapshot(snapshot_query, params, name)
+        if snapshot is not None:
+            return snapshot
+
+    def upload_codes(cursor):
+        cursor.execute(drop_temp_table(table))
+        cursor.execute(create_codes_table(table))
+        if hasattr(cursor, 'fast_executemany'):
+            cursor.fast_executemany = True
+        cursor.executemany(insert_codes(table), [(code,) for code in codes])
+
+    def fetch_from(db):
+        nonlocal table
+        table = temp_table_name(db, 'busca_codigos')
+        with _db_slot(settings['priority'], token):
+            start = time.perf_counter()
+            data_frame = get_backend('cursor').fetch(db, query(table), token=token, prepare=upload_codes,
+                                                     progress=progress)
+            elapsed = time.perf_counter() - start
+        profile_download(db, name, query(table), None, elapsed, len(data_frame))
+        return data_frame
+
+    table = None
+    progress = job_reporter(name)
+
+    connection_error = False
+    try:
+        if progress:
+            progress.phase('aguardando')
+        data_frame = run_on_target(settings['target'], fetch_from)
+        mark_snapshot(data_frame)
+        if progress:
+            progress.finish()
+        logger.info(f"download was successful ({len(codes)} codes)")
+    except QueryCancelled:
+        logger.info("download cancelled (codes)")
+        return None
     except Exception as e:
         logger.error(f"An error occurred: {e}")
+        connection_error = is_connection_error(e)
         data_frame = None
 
+    if not use_snapshot:
+        return data_frame
+    return _keep_snapshot(snapshot_query, params, name, data_frame, connection_error)
+
+
+def download_local(query, params=None):
+    """
+    Bring the local store up to date and run a query on it (see local_store.py).
+
+    Only the ranges of rows that changed since the last sync are downloaded.
+    If the database cannot be reached the query runs on the last synced copy,
+    and the result is marked with the moment of that sync.
+
+    Parameters:
+    - query (str): SQLite query on the tables of the local store.
+    - params (tuple, optional): Parameters for the query.
+
+    Returns:
+    - DataFrame: DataFrame containing the results or None if an error occurred.
+    """
+    def sync_from(db):
+        with _db_slot('bulk'):
+            sync_local_store(db)
+
+    synced = True
+    try:
+        run_on_target(DEFAULT_SETTINGS['target'], sync_from)
+    except Exception as e:
+        if not is_connection_error(e):
+            logger.error(f"An error occurred while syncing the local store: {e}")
+            return None
+        logger.warning(f"database unavailable, using the local store as last synced: {e}")
+        synced = False
+
+    try:
+        data_frame = local_store.read(query, params)
+    except Exception as e:
+        logger.error(f"An error occurred while reading the local store: {e}")
+        return None
+    last_sync = None if synced else local_store.last_sync('SC7010')
+    mark_snapshot(data_frame, last_sync)
     return data_frame
+
+
+def sync_snapshots():
+    """
+    Refresh every snapshot older than the configured max age.
+
+    Runs the stored query of each outdated snapshot again, which rewrites the
+    snapshot. Stops at the first failure, since it means the database is still
+    unreachable.
+
+    Returns:
+    - int: Number of snapshots refreshed.
+    """
+    refreshed = 0
+    now = datetime.datetime.now()
+    for entry in sorted(snapshot_store.entries(), key=lambda item: item['created']):
+        if now - entry['created'] <= snapshot_max_age():
+            continue
+        params = tuple(entry['params']) if entry['params'] else None
+        settings = QUERY_REGISTRY.get(entry['name'], {})
+        if settings.get('codes'):
+            # Batch lookups are stored with their list of codes as parameters.
+            data_frame = download_for_codes(settings['builder'], params, name=entry['name'])
+        else:
+            data_frame = download(entry['query'], params, name=entry['name'])
+        if data_frame is None or data_frame.attrs.get('source') == 'snapshot':
+            logger.info("snapshot sync interrupted, database still unavailable")
+            break
+        refreshed += 1
+
+    logger.info(f"{refreshed} snapshots synchronized")
+    return refreshed
@@ -0,0 +1,274 @@
+import datetime
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+import pandas as pd
+from database_functions.db_connect import app_path, config
+
+# Get a logger
+logger = logging.getLogger(__name__)
+
+# Tables copied to the local store: the columns kept and the columns that may change after
+# the row is written. SC7010 lines change as goods arrive (C7_QUJE, C7_RESIDUO), so they
+# cannot just be appended like sales; SB1010 and SA2010 are the lookups of the order reports.
+SYNC_TABLES = {
+    'SC7010': {
+        'columns': ['C7_NUM', 'C7_FORNECE', 'C7_LOJA', 'C7_ITEM', 'C7_NUMSC', 'C7_PRODUTO', 'C7_DESCRI',
+                    'C7_EMISSAO', 'C7_DATPRF', 'C7_QUANT', 'C7_UM', 'C7_PRECO', 'C7_DESC1', 'C7_DESC2',
+                    'C7_DESC3', 'C7_VALIPI', 'C7_TOTAL', 'C7_QUJE', 'C7_RESIDUO', 'C7_FILIAL', 'D_E_L_E_T_'],
+        'mutable': ['C7_QUJE', 'C7_RESIDUO', 'C7_QUANT', 'C7_PRECO', 'C7_TOTAL', 'C7_DATPRF', 'D_E_L_E_T_'],
+        'indexes': ['C7_FILIAL, C7_EMISSAO', 'C7_PRODUTO'],
+    },
+    'SB1010': {
+        'columns': ['B1_COD', 'B1_ZGRUPO', 'B1_TIPO', 'B1_GRUPO', 'B1_DESC', 'D_E_L_E_T_'],
+        'mutable': ['B1_ZGRUPO', 'B1_TIPO', 'B1_GRUPO', 'B1_DESC', 'D_E_L_E_T_'],
+        'indexes': ['B1_COD', 'TRIM(B1_COD)'],
+    },
+    'SA2010': {
+        'columns': ['A2_COD', 'A2_LOJA', 'A2_NOME', 'A2_TEL', 'D_E_L_E_T_'],
+        'mutable': ['A2_NOME', 'A2_TEL', 'D_E_L_E_T_'],
+        'indexes': ['A2_COD, A2_LOJA'],
+    },
+}
+
+_store_lock = threading.Lock()
+
+
+def local_store_enabled():
+    """
+    Check whether the order reports read the local store ([local_store] enabled in db_config.ini).
+    """
+    return config.getboolean('local_store', 'enabled', fallback=False)
+
+
+def local_store_path():
+    """
+    File of the local store: 'path' in the [local_store] section, or local_store.db next to the app.
+    """
+    return config.get('local_store', 'path', fallback=os.path.join(app_path, 'local_store.db'))
+
+
+def row_hash(*values):
+    """
+    Hash of the mutable columns of a row, as an unsigned 32-bit integer.
+
+    Registered as the ROW_HASH function on SQLite connections, so the range
+    checksums of the stand-in and the hashes kept locally use the same function.
+    """
+    return zlib.crc32(repr(tuple(str(value).rstrip() if value is not None else None
+                                 for value in values)).encode('utf-8'))
+
+
+def range_signatures_query(dialect, table, range_size):
+    """
+    Build the statement returning one checksum per range of R_E_C_N_O_.
+
+    SQL Server aggregates BINARY_CHECKSUM of the mutable columns with
+    CHECKSUM_AGG; SQLite sums the ROW_HASH function registered on its connection.
+    Either way the server reads the rows once and returns one line per range.
+
+    Parameters:
+    - dialect (str): 'mssql' or 'sqlite'.
+    - table (str): Table in SYNC_TABLES.
+    - range_size (int): Rows of R_E_C_N_O_ per range.
+
+    Returns:
+    - str: The statement, with the highest R_E_C_N_O_ to consider as parameter.
+    """
+    mutable = ', '.join(['R_E_C_N_O_'] + SYNC_TABLES[table]['mutable'])
+    if dialect == 'mssql':
+        checksum = f"CHECKSUM_AGG(BINARY_CHECKSUM({mutable}))"
+    else:
+        checksum = f"SUM(ROW_HASH({mutable}))"
+    return f"""
+        SELECT R_E_C_N_O_ / {int(range_size)} AS FAIXA, COUNT(*) AS LINHAS, {checksum} AS SOMA
+        FROM {table}
+        WHERE R_E_C_N_O_ <= ?
+        GROUP BY R_E_C_N_O_ / {int(range_size)}
+        """
+
+
+def _remote_cursor(raw_connection):
+    cursor = raw_connection.cursor()
+    driver_connection = getattr(raw_connection, 'driver_connection', raw_connection)
+    if isinstance(driver_connection, sqlite3.Connection):
+        driver_connection.create_function('ROW_HASH', -1, row_hash, deterministic=True)
+    return cursor
+
+
+class LocalStore:
+    """
+    Local SQLite copy of ERP tables, kept up to date by applying only the changed ranges.
+
+    Each table is split in ranges of 'range_size' R_E_C_N_O_ values. A sync asks
+    the server for one checksum per range of the mutable columns, compares them
+    with the checksums of the previous sync and downloads only the ranges that
+    differ (new rows land in new or changed ranges too). A changed range is
+    replaced as a whole, which also removes rows deleted from the ERP.
+    """
+
+    def __init__(self, path, range_size=5000):
+        """
+        Parameters:
+        - path (str): SQLite file of the store.
+        - range_size (int): R_E_C_N_O_ values per range.
+        """
+        self.path = path
+        self.range_size = range_size
+
+    @contextmanager
+    def session(self):
+        # Connection committed on success, rolled back on error, and always closed.
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.create_function('ROW_HASH', -1, row_hash, deterministic=True)
+        try:
+            with connection:
+                self.create_tables(connection)
+                yield connection
+        finally:
+            connection.close()
+
+    def create_tables(self, connection):
+        connection.execute("CREATE TABLE IF NOT EXISTS SYNC_RANGES (TABELA TEXT, FAIXA INTEGER, LINHAS INTEGER, "
+                           "SOMA TEXT, PRIMARY KEY (TABELA, FAIXA))")
+        connection.execute("CREATE TABLE IF NOT EXISTS SYNC_STATE (TABELA TEXT PRIMARY KEY, ULTIMA_SYNC TEXT)")
+        for table, spec in SYNC_TABLES.items():
+            connection.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(spec['columns'])}, "
+                               f"R_E_C_N_O_ INTEGER PRIMARY KEY, ROW_HASH INTEGER)")
+            for index, columns in enumerate(spec['indexes']):
+                connection.execute(f"CREATE INDEX IF NOT EXISTS {table}_{index} ON {table} ({columns})")
+
+    def last_sync(self, table):
+        """
+        Moment of the last sync of a table, or None if it was never synced.
+        """
+        with self.session() as connection:
+            row = connection.execute("SELECT ULTIMA_SYNC FROM SYNC_STATE WHERE TABELA = ?", (table,)).fetchone()
+        return datetime.datetime.fromisoformat(row[0]) if row else None
+
+    def sync(self, engine, table):
+        """
+        Bring the local copy of a table up to date with the server.
+
+        Parameters:
+        - engine: SQLAlchemy engine of the ERP database.
+        - table (str): Table in SYNC_TABLES.
+
+        Returns:
+        - dict: 'table', 'ranges', 'changed_ranges', 'rows_fetched', 'rows_changed' and 'seconds'.
+        """
+        start = time.perf_counter()
+        spec = SYNC_TABLES[table]
+        columns = spec['columns']
+        select = f"SELECT {', '.join(columns)}, R_E_C_N_O_ FROM {table} WHERE R_E_C_N_O_ >= ? AND R_E_C_N_O_ < ? " \
+                 f"AND R_E_C_N_O_ <= ?"
+
+        with _store_lock, self.session() as connection:
+            stored = {row[0]: (row[1], row[2]) for row in connection.execute(
+                "SELECT FAIXA, LINHAS, SOMA FROM SYNC_RANGES WHERE TABELA = ?", (table,))}
+
+            raw_connection = engine.raw_connection()
+            try:
+                cursor = _remote_cursor(raw_connection)
+                # Rows written after this point are left for the next sync.
+                cursor.execute(f"SELECT MAX(R_E_C_N_O_) FROM {table}")
+                last_row = cursor.fetchone()[0] or 0
+                cursor.execute(range_signatures_query(engine.dialect.name, table, self.range_size), (last_row,))
+                remote = {int(row[0]): (int(row[1]), str(row[2])) for row in cursor.fetchall()}
+
+                changed = sorted(key for key, signature in remote.items() if stored.get(key) != signature)
+                removed = sorted(set(stored) - set(remote))
+                rows_fetched = rows_changed = 0
+                mutable_positions = [columns.index(column) for column in spec['mutable']]
+
+                for key in removed:
+                    rows_changed += connection.execute(
+                        f"DELETE FROM {table} WHERE R_E_C_N_O_ >= ? AND R_E_C_N_O_ < ?",
+                        (key * self.range_size, (key + 1) * self.range_size)).rowcount
+                    connection.execute("DELETE FROM SYNC_RANGES WHERE TABELA = ? AND FAIXA = ?", (table, key))
+
+                for key in changed:
+                    low, high = key * self.range_size, (key + 1) * self.range_size
+                    cursor.execute(select, (low, high, last_row))
+                    rows = cursor.fetchall()
+                    rows_fetched += len(rows)
+                    old_hashes = dict(connection.execute(
+                        f"SELECT R_E_C_N_O_, ROW_HASH FROM {table} WHERE R_E_C_N_O_ >= ? AND R_E_C_N_O_ < ?",
+                        (low, high)).fetchall())
+                    new_rows = []
+                    for row in rows:
+                        recno = row[-1]
+                        hashed = row_hash(recno, *[row[position] for position in mutable_positions])
+                        if old_hashes.pop(recno, None) != hashed:
+                            rows_changed += 1
+                        new_rows.append(tuple(row) + (hashed,))
+                    # Rows left in old_hashes were deleted from the ERP.
+                    rows_changed += len(old_hashes)
+                    connection.execute(f"DELETE FROM {table} WHERE R_E_C_N_O_ >= ? AND R_E_C_N_O_ < ?", (low, high))
+                    connection.executemany(
+                        f"INSERT INTO {table} ({', '.join(columns)}, R_E_C_N_O_, ROW_HASH) "
+                        f"VALUES ({', '.join(['?'] * (len(columns) + 2))})", new_rows)
+                    connection.execute("INSERT OR REPLACE INTO SYNC_RANGES VALUES (?, ?, ?, ?)",
+                                       (table, key, *remote[key]))
+                cursor.close()
+            finally:
+                raw_connection.close()
+
+            connection.execute("INSERT OR REPLACE INTO SYNC_STATE VALUES (?, ?)",
+                               (table, datetime.datetime.now().isoformat(timespec='seconds')))
+
+        result = {
+            'table': table,
+            'ranges': len(remote),
+            'changed_ranges': len(changed) + len(removed),
+            'rows_fetched': rows_fetched,
+            'rows_changed': rows_changed,
+            'seconds': round(time.perf_counter() - start, 2),
+        }
+        logger.info(f"local store sync: {result}")
+        return result
+
+    def read(self, query, params=None):
+        """
+        Run a query on the local store.
+
+        Parameters:
+        - query (str): SQLite query.
+        - params (tuple, optional): Parameters of the query.
+
+        Returns:
+        - pd.DataFrame: The result.
+        """
+        with self.session() as connection:
+            return pd.read_sql(query, connection, params=params)
+
+
+local_store = LocalStore(local_store_path(), config.getint('local_store', 'range_size', fallback=5000))
+
+
+def sync_local_store(engine, tables=None, min_interval_seconds=None):
+    """
+    Sync the tables of the local store that were not synced recently.
+
+    Parameters:
+    - engine: SQLAlchemy engine of the ERP database.
+    - tables (list, optional): Tables to sync. Defaults to every table in SYNC_TABLES.
+    - min_interval_seconds (float, optional): Tables synced less than this long ago are skipped.
+      Defaults to 'min_interval_seconds' in the [local_store] section (60).
+
+    Returns:
+    - list: The results of the tables synced.
+    """
+    if min_interval_seconds is None:
+        min_interval_seconds = config.getfloat('local_store', 'min_interval_seconds', fallback=60)
+    results = []
+    for table in tables or list(SYNC_TABLES):
+        last = local_store.last_sync(table)
+        if last and (datetime.datetime.now() - last).total_seconds() < min_interval_seconds:
+            continue
+        results.append(local_store.sync(engine, table))
+    return results
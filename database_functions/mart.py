@@ -0,0 +1,304 @@
+import argparse
+import datetime
+import logging
+import time
+import pandas as pd
+from sqlalchemy import Column, Float, MetaData, String, Table, text
+from database_functions.admission import admission
+from database_functions.db_connect import config
+from database_functions.funcoes_base import get_engine, run_on_target, target_section
+from database_functions.snapshots import mark_snapshot
+from database_functions.stand_in import STAND_IN_TABLES
+
+# Get a logger
+logger = logging.getLogger(__name__)
+
+# Target of [targets] in db_config.ini holding the mart, e.g. 'mart = mysql'.
+MART_TARGET = 'mart'
+
+# ERP tables copied to the mart, with the columns the application reads.
+MART_TABLES = dict(STAND_IN_TABLES)
+
+NUMERIC_COLUMNS = {'B2_QATU', 'B2_CM1', 'B2_VATU1', 'D2_QUANT', 'D2_TOTAL', 'D2_MARGEM', 'C7_QUANT', 'C7_PRECO',
+                   'C7_DESC1', 'C7_DESC2', 'C7_DESC3', 'C7_VALIPI', 'C7_TOTAL', 'C7_QUJE'}
+LONG_COLUMNS = {'B1_DESC', 'BM_DESC', 'A1_NOME', 'A2_NOME', 'F4_TEXTO', 'C7_DESCRI'}
+
+# Indexes of the copied tables, used by the joins that build the fact tables.
+TABLE_INDEXES = {
+    'SB1010': ['B1_COD'],
+    'SB2010': ['B2_COD, B2_FILIAL'],
+    'SBZ010': ['BZ_COD, BZ_FILIAL'],
+    'SBM010': ['BM_GRUPO'],
+    'SA1010': ['A1_COD, A1_LOJA'],
+    'SA2010': ['A2_COD, A2_LOJA'],
+    'SF4010': ['F4_CODIGO'],
+    'SD2010': ['D2_FILIAL, D2_EMISSAO'],
+    'SC7010': ['C7_FILIAL, C7_EMISSAO'],
+}
+
+# Pre-joined fact tables: the statement that builds each one and its indexes. The joins
+# mirror the report queries; dates stay in the Protheus format (YYYYMMDD), which sorts
+# and compares like a date, so the reports return the same values as from the ERP.
+FACT_TABLES = {
+    'FATO_VENDAS': ("""
+        SELECT SD2.D2_FILIAL, SD2.D2_EMISSAO, SD2.D2_COD, SD2.D2_UM, SD2.D2_TP, SD2.D2_CLIENTE, SD2.D2_LOJA,
+               SD2.D2_LOCAL, SD2.D2_QUANT, SD2.D2_TOTAL, SD2.D2_MARGEM,
+               SB.B1_ZGRUPO, SB.B1_DESC, SB.B1_GRUPO, SB.B1_TIPO, SA.A1_NOME, SF.F4_TEXTO
+        FROM SD2010 AS SD2
+        INNER JOIN SB1010 AS SB ON SB.B1_COD = SD2.D2_COD
+        LEFT JOIN SA1010 AS SA ON SA.A1_COD = SD2.D2_CLIENTE AND SA.A1_LOJA = SD2.D2_LOJA
+        LEFT JOIN SF4010 AS SF ON SF.F4_CODIGO = SD2.D2_TES
+        """, ['D2_FILIAL, D2_EMISSAO', 'B1_ZGRUPO']),
+    'FATO_COMPRAS': ("""
+        SELECT SC7.*, SB.B1_ZGRUPO, SB.B1_GRUPO, SB.B1_TIPO, SA.A2_NOME, SA.A2_TEL
+        FROM SC7010 AS SC7
+        INNER JOIN SB1010 AS SB ON SB.B1_COD = SC7.C7_PRODUTO
+        LEFT JOIN SA2010 AS SA ON SA.A2_COD = SC7.C7_FORNECE AND SA.A2_LOJA = SC7.C7_LOJA
+        """, ['C7_FILIAL, C7_EMISSAO', 'B1_ZGRUPO']),
+    'FATO_ESTOQUE': ("""
+        SELECT SB.B1_ZGRUPO, SB.B1_COD, SB.B1_TIPO, SB.B1_GRUPO, SB.B1_DESC, SB.B1_UM, D.BZ_LOCALI2,
+               S.B2_FILIAL, S.B2_LOCAL, S.B2_QATU, S.B2_CM1, S.B2_VATU1
+        FROM SB2010 AS S
+        INNER JOIN SB1010 AS SB ON SB.B1_COD = S.B2_COD
+        LEFT JOIN SBZ010 AS D ON D.BZ_COD = S.B2_COD AND D.BZ_FILIAL = S.B2_FILIAL
+        """, ['B2_FILIAL, B2_LOCAL', 'B1_ZGRUPO']),
+}
+
+# Parameters per statement of the multi-row inserts; SQLite allows 32766.
+MAX_INSERT_PARAMS = 30000
+
+
+def mart_enabled():
+    """
+    Check whether the reports read the mart ([mart] enabled in db_config.ini).
+    """
+    return config.getboolean('mart', 'enabled', fallback=False) and target_section(MART_TARGET) is not None
+
+
+def mart_table(metadata, table, name=None):
+    """
+    SQLAlchemy definition of the copy of an ERP table in the mart.
+
+    Parameters:
+    - metadata (MetaData): Metadata the table is added to.
+    - table (str): Table of MART_TABLES.
+    - name (str, optional): Name of the table in the mart. Defaults to the ERP name.
+
+    Returns:
+    - Table: Text columns as VARCHAR, so MySQL can index them, and numeric columns as FLOAT.
+    """
+    columns = []
+    for column in MART_TABLES[table]:
+        if column in NUMERIC_COLUMNS:
+            columns.append(Column(column, Float))
+        else:
+            columns.append(Column(column, String(120 if column in LONG_COLUMNS else 40)))
+    return Table(name or table, metadata, *columns)
+
+
+def clean_row(row):
+    """
+    Strip the blank padding of the CHAR columns of a Protheus row.
+    """
+    return tuple(value.strip() if isinstance(value, str) else value for value in row)
+
+
+def extract_table(engine, table, chunk_size=5000):
+    """
+    Read the rows of an ERP table that are not deleted, in chunks.
+
+    Parameters:
+    - engine: SQLAlchemy engine of the ERP database.
+    - table (str): Table of MART_TABLES.
+    - chunk_size (int): Rows per round trip.
+
+    Yields:
+    - list: Up to chunk_size cleaned row tuples, in the column order of MART_TABLES.
+    """
+    raw_connection = engine.raw_connection()
+    try:
+        cursor = raw_connection.cursor()
+        cursor.arraysize = chunk_size
+        cursor.execute(f"SELECT {', '.join(MART_TABLES[table])} FROM {table} WHERE D_E_L_E_T_ <> '*'")
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield [clean_row(row) for row in rows]
+        cursor.close()
+    finally:
+        raw_connection.close()
+
+
+def _replace_table(connection, new, table, indexes):
+    # Swap a freshly loaded table in place of the old one and index it.
+    connection.execute(text(f"DROP TABLE IF EXISTS {table}"))
+    connection.execute(text(f"ALTER TABLE {new} RENAME TO {table}"))
+    for index, columns in enumerate(indexes):
+        connection.execute(text(f"CREATE INDEX {table}_{index} ON {table} ({columns})"))
+
+
+def load_table(source, mart, table, chunk_size=5000):
+    """
+    Copy an ERP table to the mart with multi-row inserts.
+
+    The rows go to a new table that replaces the old one only once complete,
+    so the reports keep reading the previous copy while the load runs.
+
+    Parameters:
+    - source: SQLAlchemy engine of the ERP database.
+    - mart: SQLAlchemy engine of the mart.
+    - table (str): Table of MART_TABLES.
+    - chunk_size (int): Rows read per round trip.
+
+    Returns:
+    - int: Rows loaded.
+    """
+    new = f"{table}_NOVA"
+    metadata = MetaData()
+    definition = mart_table(metadata, table, new)
+    columns = MART_TABLES[table]
+    rows_per_insert = max(1, MAX_INSERT_PARAMS // len(columns))
+    loaded = 0
+    with mart.begin() as connection:
+        connection.execute(text(f"DROP TABLE IF EXISTS {new}"))
+        metadata.create_all(connection)
+        for chunk in extract_table(source, table, chunk_size):
+            for start in range(0, len(chunk), rows_per_insert):
+                values = [dict(zip(columns, row)) for row in chunk[start:start + rows_per_insert]]
+                connection.execute(definition.insert().values(values))
+            loaded += len(chunk)
+        _replace_table(connection, new, table, TABLE_INDEXES.get(table, []))
+    return loaded
+
+
+def build_fact_table(mart, name):
+    """
+    Rebuild a pre-joined fact table of FACT_TABLES from the tables in the mart.
+
+    Returns:
+    - int: Rows of the fact table.
+    """
+    select, indexes = FACT_TABLES[name]
+    new = f"{name}_NOVA"
+    with mart.begin() as connection:
+        connection.execute(text(f"DROP TABLE IF EXISTS {new}"))
+        connection.execute(text(f"CREATE TABLE {new} AS {select}"))
+        _replace_table(connection, new, name, indexes)
+        return connection.execute(text(f"SELECT COUNT(*) FROM {name}")).scalar()
+
+
+def _record_load(mart, table, rows):
+    with mart.begin() as connection:
+        connection.execute(text("CREATE TABLE IF NOT EXISTS MART_CARGA (TABELA VARCHAR(40) PRIMARY KEY, "
+                                "LINHAS INTEGER, CARGA VARCHAR(26))"))
+        connection.execute(text("DELETE FROM MART_CARGA WHERE TABELA = :tabela"), {'tabela': table})
+        connection.execute(text("INSERT INTO MART_CARGA (TABELA, LINHAS, CARGA) VALUES (:tabela, :linhas, :carga)"),
+                           {'tabela': table, 'linhas': rows, 'carga': datetime.datetime.now().isoformat()})
+
+
+def last_load(mart):
+    """
+    Moment of the oldest table load of the mart, or None if it was never loaded.
+    """
+    with mart.connect() as connection:
+        try:
+            value = connection.execute(text("SELECT MIN(CARGA) FROM MART_CARGA")).scalar()
+        except Exception:
+            return None
+    return datetime.datetime.fromisoformat(value) if value else None
+
+
+def download_mart(query, params=None):
+    """
+    Run a query on the mart (see the *_mart queries in queries.py).
+
+    The result is marked with the moment of the last load, since the mart is
+    only as recent as the ETL that filled it.
+
+    Parameters:
+    - query (str): SQL query with named parameters, e.g. ':filial'.
+    - params (dict, optional): Values of the parameters.
+
+    Returns:
+    - DataFrame: DataFrame containing the results or None if an error occurred.
+    """
+    try:
+        mart = get_engine(target_section(MART_TARGET))
+        if mart is None:
+            raise ConnectionError("mart engine unavailable")
+        with admission.slot('bulk'):
+            data_frame = pd.read_sql(text(query), mart, params=params)
+        loaded = last_load(mart)
+    except Exception as e:
+        logger.error(f"An error occurred while reading the mart: {e}")
+        return None
+    mark_snapshot(data_frame, loaded)
+    return data_frame
+
+
+def refresh_mart(source, mart, tables=None, chunk_size=5000):
+    """
+    Run the ETL: copy the ERP tables to the mart and rebuild the fact tables.
+
+    Parameters:
+    - source: SQLAlchemy engine of the ERP database.
+    - mart: SQLAlchemy engine of the mart.
+    - tables (list, optional): Tables of MART_TABLES to copy. Defaults to all of them.
+    - chunk_size (int): Rows read per round trip.
+
+    Returns:
+    - list: One dictionary per table with 'table', 'rows' and 'seconds'.
+    """
+    results = []
+    steps = [(table, load_table) for table in tables or MART_TABLES]
+    steps += [(name, None) for name in FACT_TABLES]
+    for table, loader in steps:
+        start = time.perf_counter()
+        if loader:
+            rows = loader(source, mart, table, chunk_size)
+        else:
+            rows = build_fact_table(mart, table)
+        _record_load(mart, table, rows)
+        seconds = round(time.perf_counter() - start, 2)
+        logger.info(f"mart {table}: {rows} rows in {seconds}s")
+        results.append({'table': table, 'rows': rows, 'seconds': seconds})
+    return results
+
+
+def run_mart_refresh(tables=None):
+    """
+    Refresh the mart configured in [targets] from the ERP, as a bulk job.
+
+    The tables are read from the 'reporting' target, falling back to the primary.
+
+    Returns:
+    - list: The result of refresh_mart.
+    """
+    section = target_section(MART_TARGET)
+    if section is None:
+        raise ValueError("No 'mart' target in the [targets] section of db_config.ini")
+    mart = get_engine(section)
+    chunk_size = config.getint('mart', 'chunk_size', fallback=5000)
+
+    def refresh_from(source):
+        with admission.slot('bulk'):
+            return refresh_mart(source, mart, tables, chunk_size)
+
+    return run_on_target('reporting', refresh_from)
+
+
+def main():
+    """
+    Command line entry point: load the reporting mart, e.g. nightly from cron.
+    """
+    parser = argparse.ArgumentParser(description="Load the reporting mart from the ERP tables.")
+    parser.add_argument('--table', action='append', choices=list(MART_TABLES), default=None,
+                        help="table to copy (repeatable, defaults to all of them)")
+    args = parser.parse_args()
+    for result in run_mart_refresh(args.table):
+        print(f"{result['table']}: {result['rows']} rows in {result['seconds']}s")
+
+
+if __name__ == "__main__":
+    main()
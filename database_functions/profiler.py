@@ -0,0 +1,244 @@
+import argparse
+import datetime
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from logging.handlers import RotatingFileHandler
+import pandas as pd
+from database_functions.db_connect import app_path, config
+
+# Get a logger
+logger = logging.getLogger(__name__)
+
+# Writes one JSON line per slow statement; set up on first use (see _slow_log).
+_slow_logger = None
+_slow_logger_lock = threading.Lock()
+
+# Latest execution of a statement in the plan cache, found by the start of its text.
+SQL_SERVER_STATS = """
+SELECT TOP 1
+    qs.last_elapsed_time / 1000.0 AS elapsed_ms,
+    qs.last_worker_time / 1000.0 AS cpu_ms,
+    qs.last_logical_reads AS logical_reads,
+    qs.last_physical_reads AS physical_reads,
+    qs.last_rows AS rows,
+    qs.execution_count,
+    qp.query_plan
+FROM sys.dm_exec_query_stats AS qs
+CROSS APPLY sys.dm_exec_sql_text(qs.sql_handle) AS st
+CROSS APPLY sys.dm_exec_query_plan(qs.plan_handle) AS qp
+WHERE st.text LIKE ?
+ORDER BY qs.last_execution_time DESC
+"""
+
+
+def profiling_enabled():
+    """
+    Check whether the profiler is turned on in the [profiler] section of db_config.ini.
+    """
+    return config.getboolean('profiler', 'enabled', fallback=False)
+
+
+def slow_query_seconds():
+    """
+    Duration from which a statement is written to the slow-query log.
+
+    Returns:
+    - float: Value of 'slow_seconds' in the [profiler] section (default 2 seconds).
+    """
+    return config.getfloat('profiler', 'slow_seconds', fallback=2.0)
+
+
+def slow_log_path():
+    """
+    Path of the slow-query log: 'log_path' in the [profiler] section, or slow_queries.log next to the app.
+    """
+    return config.get('profiler', 'log_path', fallback=os.path.join(app_path, 'slow_queries.log'))
+
+
+def _slow_log():
+    global _slow_logger
+    with _slow_logger_lock:
+        if _slow_logger is None:
+            _slow_logger = logging.getLogger('slow_queries')
+            _slow_logger.propagate = False
+            _slow_logger.setLevel(logging.INFO)
+            handler = RotatingFileHandler(slow_log_path(), maxBytes=5 * 2 ** 20, backupCount=5, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            _slow_logger.addHandler(handler)
+        return _slow_logger
+
+
+def normalize_query(query):
+    """
+    Reduce a statement to its shape: no comments, literals replaced by '?', single spaces, upper case.
+
+    The generated report queries embed the branch and the dates as literals, so
+    their runs only share a fingerprint once the literals are removed.
+    """
+    text = re.sub(r"--[^\n]*|/\*.*?\*/", " ", query, flags=re.S)
+    text = re.sub(r"'(?:[^']|'')*'", "?", text)
+    text = re.sub(r"\b\d+(?:\.\d+)?\b", "?", text)
+    return " ".join(text.split()).upper()
+
+
+def fingerprint(query):
+    """
+    Stable identifier of the shape of a statement (see normalize_query).
+
+    Returns:
+    - str: The first 16 hex digits of the SHA-1 of the normalized text.
+    """
+    return hashlib.sha1(normalize_query(query).encode('utf-8')).hexdigest()[:16]
+
+
+def _like_pattern(query):
+    # The text stored by SQL Server has the parameters renamed (@P1...), so match the part before the first one.
+    prefix = query.strip().split('?')[0][:200]
+    prefix = re.sub(r"([\[%_])", r"[\1]", prefix)
+    return f"%{prefix}%"
+
+
+def server_statistics(engine, query, params=None):
+    """
+    Read the server statistics and the execution plan of the last run of a statement.
+
+    SQL Server: elapsed and CPU time, logical and physical reads and the XML plan
+    from sys.dm_exec_query_stats (needs VIEW SERVER STATE). SQLite: the output of
+    EXPLAIN QUERY PLAN.
+
+    Parameters:
+    - engine: SQLAlchemy engine the statement ran on.
+    - query (str): The statement.
+    - params (tuple, optional): Its parameters.
+
+    Returns:
+    - dict: The statistics and 'plan', or an 'error' entry if they could not be read.
+    """
+    raw_connection = engine.raw_connection()
+    try:
+        cursor = raw_connection.cursor()
+        if engine.dialect.name == 'mssql':
+            cursor.execute(SQL_SERVER_STATS, (_like_pattern(query),))
+            row = cursor.fetchone()
+            if row is None:
+                return {'error': 'statement not found in the plan cache'}
+            columns = [description[0] for description in cursor.description]
+            return dict(zip(columns, row))
+        if engine.dialect.name == 'sqlite':
+            cursor.execute(f"EXPLAIN QUERY PLAN {query}", tuple(params) if params else ())
+            return {'plan': "\n".join(str(row[-1]) for row in cursor.fetchall())}
+        return {'error': f"no statistics for {engine.dialect.name}"}
+    except Exception as e:
+        return {'error': str(e)}
+    finally:
+        raw_connection.close()
+
+
+def record_slow_query(engine, name, query, params, elapsed, rows):
+    """
+    Write a slow statement to the slow-query log, with its server statistics and plan.
+
+    Parameters:
+    - engine: SQLAlchemy engine the statement ran on.
+    - name (str): Registry name of the query, if any.
+    - query (str): The statement.
+    - params (tuple, optional): Its parameters.
+    - elapsed (float): Seconds measured by the client, including the transfer of the rows.
+    - rows (int): Rows returned.
+
+    Returns:
+    - dict: The record written.
+    """
+    record = {
+        'time': datetime.datetime.now().isoformat(timespec='seconds'),
+        'name': name,
+        'fingerprint': fingerprint(query),
+        'elapsed_seconds': round(elapsed, 3),
+        'rows': rows,
+        'params': list(params) if params else None,
+        'query': " ".join(query.split()),
+        'server': server_statistics(engine, query, params),
+    }
+    _slow_log().info(json.dumps(record, default=str, ensure_ascii=False))
+    logger.warning(f"slow query {name or record['fingerprint']}: {elapsed:.1f}s, {rows} rows")
+    return record
+
+
+def profile_download(engine, name, query, params, elapsed, rows):
+    """
+    Called by 'download' after each statement: log it if the profiler is on and it was slow.
+
+    The statistics are read in a background thread, so the user does not wait for them.
+    """
+    if not profiling_enabled() or elapsed < slow_query_seconds():
+        return
+    threading.Thread(target=record_slow_query, args=(engine, name, query, params, elapsed, rows),
+                     daemon=True).start()
+
+
+def read_slow_log(path=None):
+    """
+    Read the slow-query log and its rotated files.
+
+    Returns:
+    - pd.DataFrame: One row per logged statement.
+    """
+    path = path or slow_log_path()
+    records = []
+    for file_path in sorted(glob.glob(path + '*')):
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    return pd.DataFrame(records)
+
+
+def summarize_slow_queries(path=None, top=10):
+    """
+    Rank the statements of the slow-query log by total time.
+
+    Parameters:
+    - path (str, optional): Log file. Defaults to slow_log_path().
+    - top (int): Number of statements to return.
+
+    Returns:
+    - pd.DataFrame: fingerprint, name, runs, total, mean, p95 and max seconds, mean rows and last run.
+    """
+    log = read_slow_log(path)
+    if log.empty:
+        return log
+    log['name'] = log['name'].fillna('')
+    summary = log.groupby('fingerprint').agg(
+        name=('name', 'last'),
+        runs=('elapsed_seconds', 'size'),
+        total_seconds=('elapsed_seconds', 'sum'),
+        mean_seconds=('elapsed_seconds', 'mean'),
+        p95_seconds=('elapsed_seconds', lambda values: values.quantile(0.95)),
+        max_seconds=('elapsed_seconds', 'max'),
+        mean_rows=('rows', 'mean'),
+        last_run=('time', 'max'),
+    )
+    return summary.sort_values('total_seconds', ascending=False).head(top).round(2).reset_index()
+
+
+def main():
+    """
+    Command line entry point: print the worst statements of the slow-query log.
+    """
+    parser = argparse.ArgumentParser(description="Summarize the slow-query log.")
+    parser.add_argument('--log', default=None, help="log file (defaults to the one in db_config.ini)")
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+    summary = summarize_slow_queries(args.log, args.top)
+    print(summary.to_string(index=False) if not summary.empty else "No slow queries logged.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+# Get a logger
+logger = logging.getLogger(__name__)
+
+# Progress callback of the job running in each thread (see progress_job).
+_job = threading.local()
+
+# Row counts of the last run of each query, keyed by (name, params) and by name.
+_last_rows = {}
+_last_rows_lock = threading.Lock()
+
+
+class ProgressReporter:
+    """
+    Builds the progress events of one download and sends them to the job callback.
+
+    An event is a dictionary with 'step' (query name), 'phase', 'rows' fetched so
+    far, the estimated 'total' (None if unknown), 'rows_per_second',
+    'eta_seconds' and 'percent'. Row updates are sent at most every 'interval'
+    seconds; phase changes are always sent.
+    """
+
+    def __init__(self, callback, step=None, total=None, interval=0.25):
+        """
+        Parameters:
+        - callback (callable): Receives each event dictionary.
+        - step (str, optional): Name of the query being downloaded.
+        - total (int, optional): Estimated number of rows.
+        - interval (float): Minimum seconds between two row updates.
+        """
+        self.callback = callback
+        self.step = step
+        self.total = total
+        self.interval = interval
+        self.phase_name = None
+        self.rows = 0
+        self.started = time.monotonic()
+        self._last_sent = 0.0
+
+    def event(self):
+        """
+        Build the current progress event.
+
+        Returns:
+        - dict: The event.
+        """
+        elapsed = time.monotonic() - self.started
+        rate = self.rows / elapsed if elapsed > 0 and self.rows else None
+        total = self.total
+        if total is not None and self.rows > total:
+            # The estimate was short: keep the bar below 100% until the end.
+            total = None
+        eta = (total - self.rows) / rate if rate and total else None
+        percent = int(100 * self.rows / total) if total else None
+        if self.phase_name == 'concluído':
+            percent, eta = 100, 0
+        return {
+            'step': self.step,
+            'phase': self.phase_name,
+            'rows': self.rows,
+            'total': total,
+            'rows_per_second': round(rate) if rate else None,
+            'eta_seconds': round(eta) if eta is not None else None,
+            'percent': percent,
+        }
+
+    def _send(self):
+        self._last_sent = time.monotonic()
+        try:
+            self.callback(self.event())
+        except Exception as e:
+            logger.error(f"An error occurred while reporting progress: {e}")
+
+    def phase(self, name):
+        """
+        Start a new phase ('aguardando', 'executando', 'lendo', 'concluído') and send it.
+        """
+        self.phase_name = name
+        if name == 'lendo':
+            # Throughput counts from the first row read, not from the start of the statement.
+            self.started = time.monotonic()
+        self._send()
+
+    def add_rows(self, count):
+        """
+        Count rows fetched and send an update if the interval has passed.
+        """
+        self.rows += count
+        if time.monotonic() - self._last_sent >= self.interval:
+            self._send()
+
+    def finish(self):
+        """
+        Send the final event.
+        """
+        self.phase('concluído')
+
+
+@contextmanager
+def progress_job(callback):
+    """
+    Send the progress of every download made by the current thread to a callback.
+
+    DownloadThread wraps its function with this, so the data layer reports
+    progress without every function passing a callback along.
+
+    Parameters:
+    - callback (callable): Receives the event dictionaries of ProgressReporter.
+    """
+    previous = getattr(_job, 'callback', None)
+    _job.callback = callback
+    try:
+        yield
+    finally:
+        _job.callback = previous
+
+
+def job_reporter(step, estimate=None):
+    """
+    Create the progress reporter of a download for the job of the current thread.
+
+    Parameters:
+    - step (str): Name of the query.
+    - estimate (callable, optional): Returns the estimated number of rows; only called
+      when a job listens, since it may query the database.
+
+    Returns:
+    - ProgressReporter: The reporter, or None when no job listens in this thread.
+    """
+    callback = getattr(_job, 'callback', None)
+    if callback is None:
+        return None
+    total = None
+    if estimate:
+        try:
+            total = estimate()
+        except Exception as e:
+            logger.info(f"no row estimate for {step}: {e}")
+    return ProgressReporter(callback, step, total)
+
+
+def record_rows(name, params, rows):
+    """
+    Remember the row count of a query, the first source of its next estimate.
+    """
+    if name is None:
+        return
+    with _last_rows_lock:
+        _last_rows[(name, repr(params))] = rows
+        _last_rows[name] = rows
+
+
+def estimate_rows(name, params=None):
+    """
+    Estimate the rows a query will return from its previous runs.
+
+    The last run of the same query and parameters is the best guess, then the
+    last run of the query with any parameters. A query never run in this
+    session has no estimate: its progress shows the rows read and the
+    throughput only, since the size of a table says little about how many of
+    its rows a filtered query returns.
+
+    Parameters:
+    - name (str): Registry name of the query.
+    - params (tuple, optional): Parameters of the query.
+
+    Returns:
+    - int: The estimate, or None if the query has not run yet.
+    """
+    with _last_rows_lock:
+        return _last_rows.get((name, repr(params)), _last_rows.get(name))
+
+
+def progress_text(event):
+    """
+    Describe a progress event for the status bar.
+
+    Parameters:
+    - event (dict): Event of ProgressReporter.
+
+    Returns:
+    - str: Text such as 'faturamento: lendo 12.000 de ~40.000 linhas (2.300 linhas/s, faltam 0:15)'.
+    """
+    step = f"{event['step']}: " if event.get('step') else ""
+    rows = f"{event['rows']:,}".replace(',', '.')
+    if event['phase'] != 'lendo' and event['phase'] != 'concluído':
+        return f"{step}{event['phase']}..."
+    text = f"{step}{event['phase']} {rows}"
+    if event['total'] and event['phase'] == 'lendo':
+        text += f" de ~{event['total']:,}".replace(',', '.')
+    text += " linhas"
+    details = []
+    if event['rows_per_second']:
+        details.append(f"{event['rows_per_second']:,} linhas/s".replace(',', '.'))
+    if event['eta_seconds'] and event['phase'] == 'lendo':
+        minutes, seconds = divmod(event['eta_seconds'], 60)
+        details.append(f"faltam {minutes}:{seconds:02d}")
+    if details:
+        text += f" ({', '.join(details)})"
+    return text
@@ -67,6 +67,7 @@ faturamento = """
         SELECT
 SD2.D2_EMISSAO,
 SB.B1_ZGRUPO,
+SB.B1_GRUPO,
 SD2.D2_COD,
 SB.B1_DESC,
 SD2.D2_UM,
@@ -123,7 +124,7 @@ historico_faturamento = """
                 SD2.D_E_L_E_T_ <> '*'
                 AND SD2.D2_LOCAL = 'A01'
                 AND SD2.D2_FILIAL = ?
-                AND SD2.D2_EMISSAO >= CONVERT(VARCHAR, DATEADD(MONTH, -4, GETDATE()), 112)
+                AND SD2.D2_EMISSAO >= ?
                 ORDER BY
                 SD2.D2_EMISSAO
 
@@ -185,6 +186,267 @@ WHERE
 P.D_E_L_E_T_ <> '*' AND
 P.B1_COD = ?
 """
+produtos_master = """SELECT
+P.B1_ZGRUPO,
+P.B1_COD,
+P.B1_DESC,
+P.B1_GRUPO,
+SM.BM_DESC
+FROM
+    SB1010 AS P
+LEFT JOIN
+    SBM010 AS SM ON TRIM(P.B1_GRUPO) = TRIM(SM.BM_GRUPO) AND SM.D_E_L_E_T_ <> '*'
+WHERE
+P.D_E_L_E_T_ <> '*'
+"""
+estoque_filiais = """SELECT
+S.B2_COD,
+S.B2_FILIAL,
+S.B2_QATU
+FROM
+    SB2010 AS S
+WHERE
+S.D_E_L_E_T_ <> '*' AND
+S.B2_LOCAL = 'A01'
+"""
+estoque_por_filial = """SELECT
+S.B2_FILIAL,
+S.B2_LOCAL,
+S.B2_QATU
+FROM
+    SB2010 AS S
+WHERE
+S.D_E_L_E_T_ <> '*' AND
+TRIM(S.B2_COD) = ?
+ORDER BY S.B2_FILIAL, S.B2_LOCAL
+"""
+
+# Stock of every product per branch with its change timestamp, and the rows changed since a
+# timestamp. S_T_A_M_P_ needs an index for the second query to cost per change, not per row.
+estoque_monitor = """SELECT
+S.B2_COD,
+S.B2_FILIAL,
+S.B2_QATU,
+S.S_T_A_M_P_
+FROM
+    SB2010 AS S
+WHERE
+S.D_E_L_E_T_ <> '*' AND
+S.B2_LOCAL = 'A01'
+"""
+estoque_alterado = """SELECT
+S.B2_COD,
+S.B2_FILIAL,
+S.B2_QATU,
+S.D_E_L_E_T_,
+S.S_T_A_M_P_
+FROM
+    SB2010 AS S
+WHERE
+S.S_T_A_M_P_ >= ? AND
+S.B2_LOCAL = 'A01'
+"""
+
+# Versions of 'pedidos' and 'quantidade_receber' for the local store (SQLite, see local_store.py).
+# Dates stay in the Protheus format (YYYYMMDD) and are passed in by the caller.
+pedidos_local = """SELECT
+SB.B1_ZGRUPO,
+SC7.C7_NUM,
+SC7.C7_FORNECE,
+SA.A2_LOJA,
+SA.A2_NOME,
+SA.A2_TEL,
+SC7.C7_ITEM,
+SC7.C7_NUMSC,
+SC7.C7_PRODUTO,
+SC7.C7_DESCRI,
+SB.B1_GRUPO,
+SC7.C7_EMISSAO AS EMI,
+SC7.C7_DATPRF AS ENT,
+SC7.C7_QUANT,
+SC7.C7_UM,
+SC7.C7_PRECO,
+COALESCE(SC7.C7_DESC1, 0) + COALESCE(SC7.C7_DESC2, 0) + COALESCE(SC7.C7_DESC3, 0) AS DE,
+SC7.C7_VALIPI,
+SC7.C7_TOTAL,
+SC7.C7_QUJE,
+COALESCE(SC7.C7_QUANT, 0) - COALESCE(SC7.C7_QUJE, 0) AS QRE,
+(COALESCE(SC7.C7_QUANT, 0) - COALESCE(SC7.C7_QUJE, 0)) * COALESCE(SC7.C7_PRECO, 0) AS SRE,
+SC7.C7_RESIDUO
+FROM SC7010 AS SC7
+INNER JOIN
+    SA2010 AS SA ON SC7.C7_FORNECE = SA.A2_COD AND SC7.C7_LOJA = SA.A2_LOJA AND SA.D_E_L_E_T_ <> '*'
+INNER JOIN
+    SB1010 AS SB ON TRIM(SC7.C7_PRODUTO) = TRIM(SB.B1_COD) AND SB.D_E_L_E_T_ <> '*'
+WHERE SC7.D_E_L_E_T_ <> '*'
+AND SB.B1_GRUPO NOT IN ('002', '001', '003')
+AND SB.B1_TIPO IN ('ME', 'MI', 'KT', 'PA')
+AND SC7.C7_EMISSAO >= ?
+AND SC7.C7_FILIAL = ?
+"""
+quantidade_receber_local = """SELECT
+SB.B1_ZGRUPO,
+COALESCE(SC7.C7_QUANT, 0) - COALESCE(SC7.C7_QUJE, 0) AS QRE
+FROM SC7010 AS SC7
+INNER JOIN SB1010 AS SB ON SC7.C7_PRODUTO = SB.B1_COD
+WHERE SC7.D_E_L_E_T_ <> '*'
+AND SC7.C7_EMISSAO BETWEEN ? AND ?
+AND COALESCE(SC7.C7_QUANT, 0) - COALESCE(SC7.C7_QUJE, 0) > 0
+AND SC7.C7_FILIAL = ?
+AND SB.D_E_L_E_T_ <> '*'
+"""
+
+# Purchase prices per product group over a period: last price (by emission date), simple and
+# quantity-weighted average, min/max and number of orders. ROW_NUMBER ranks the lines inside
+# each group, so the server returns one row per group instead of every order line. Runs
+# unchanged on SQL Server and SQLite (the stand-in and the local store, see local_store.py).
+precos_compra = """WITH COMPRAS AS (
+SELECT
+SB.B1_ZGRUPO,
+SC7.C7_NUM,
+SC7.C7_PRECO,
+SC7.C7_QUANT,
+ROW_NUMBER() OVER (PARTITION BY SB.B1_ZGRUPO ORDER BY SC7.C7_EMISSAO DESC, SC7.C7_NUM DESC, SC7.C7_ITEM DESC) AS ORDEM
+FROM SC7010 AS SC7
+INNER JOIN
+    SB1010 AS SB ON TRIM(SC7.C7_PRODUTO) = TRIM(SB.B1_COD) AND SB.D_E_L_E_T_ <> '*'
+WHERE SC7.D_E_L_E_T_ <> '*'
+AND SB.B1_GRUPO NOT IN ('002', '001', '003')
+AND SB.B1_TIPO IN ('ME', 'MI', 'KT', 'PA')
+AND SC7.C7_EMISSAO >= ?
+AND SC7.C7_FILIAL = ?
+)
+SELECT
+B1_ZGRUPO,
+AVG(C7_PRECO) AS PRECO_MEDIO_COMPRA,
+SUM(C7_PRECO * C7_QUANT) / NULLIF(SUM(C7_QUANT), 0) AS PRECO_MEDIO_PONDERADO,
+MAX(CASE WHEN ORDEM = 1 THEN C7_PRECO END) AS ULTIMO_PRECO,
+MIN(C7_PRECO) AS PRECO_MINIMO,
+MAX(C7_PRECO) AS PRECO_MAXIMO,
+COUNT(DISTINCT C7_NUM) AS PEDIDOS_COMPRA
+FROM COMPRAS
+GROUP BY B1_ZGRUPO
+"""
+
+# Promised lead time of the purchase order lines: emission and delivery date (C7_DATPRF) per
+# product group. The days between them are computed in Python, so it runs on every engine.
+prazos_compra = """SELECT
+SB.B1_ZGRUPO,
+SC7.C7_EMISSAO,
+SC7.C7_DATPRF
+FROM SC7010 AS SC7
+INNER JOIN
+    SB1010 AS SB ON TRIM(SC7.C7_PRODUTO) = TRIM(SB.B1_COD) AND SB.D_E_L_E_T_ <> '*'
+WHERE SC7.D_E_L_E_T_ <> '*'
+AND SB.B1_GRUPO NOT IN ('002', '001', '003')
+AND SB.B1_TIPO IN ('ME', 'MI', 'KT', 'PA')
+AND SC7.C7_EMISSAO >= ?
+AND SC7.C7_FILIAL = ?
+"""
+
+# Every purchase order line issued since a date, for the supplier statistics (see
+# main_functions/fornecedores.py). Read in chunks, so it has no branch filter.
+historico_pedidos = """SELECT
+SC7.C7_FILIAL,
+SC7.C7_FORNECE,
+SC7.C7_LOJA,
+SA.A2_NOME,
+SB.B1_ZGRUPO,
+SC7.C7_EMISSAO,
+SC7.C7_DATPRF,
+SC7.C7_QUANT,
+SC7.C7_QUJE,
+SC7.C7_RESIDUO
+FROM SC7010 AS SC7
+INNER JOIN
+    SB1010 AS SB ON TRIM(SC7.C7_PRODUTO) = TRIM(SB.B1_COD) AND SB.D_E_L_E_T_ <> '*'
+LEFT JOIN
+    SA2010 AS SA ON SC7.C7_FORNECE = SA.A2_COD AND SC7.C7_LOJA = SA.A2_LOJA AND SA.D_E_L_E_T_ <> '*'
+WHERE SC7.D_E_L_E_T_ <> '*'
+AND SC7.C7_EMISSAO >= ?
+"""
+
+# Versions of the reports for the reporting mart (see mart.py). The fact tables are already
+# joined and stripped of deleted rows; parameters are named so they run on MySQL and SQLite.
+saldo_analitico_mart = """SELECT
+B1_ZGRUPO,
+B1_COD,
+B1_TIPO,
+B1_GRUPO,
+B1_DESC,
+BZ_LOCALI2,
+B1_UM,
+B2_FILIAL,
+B2_LOCAL,
+B2_QATU AS B2_QATU_COPY,
+B2_QATU,
+B2_CM1,
+B2_VATU1
+FROM FATO_ESTOQUE
+WHERE B2_FILIAL = :filial
+AND B2_LOCAL = 'A01'
+AND B1_GRUPO NOT IN ('002', '001', '003')
+AND B1_TIPO IN ('ME', 'MI', 'KT', 'PA')
+"""
+faturamento_mart = """SELECT
+D2_EMISSAO,
+B1_ZGRUPO,
+B1_GRUPO,
+D2_COD,
+B1_DESC,
+D2_UM,
+D2_TP,
+D2_CLIENTE,
+A1_NOME,
+F4_TEXTO,
+D2_QUANT,
+D2_TOTAL AS VFB,
+D2_MARGEM
+FROM FATO_VENDAS
+WHERE D2_FILIAL = :filial
+AND D2_EMISSAO >= :inicio
+AND B1_GRUPO NOT IN ('002', '001', '003')
+AND B1_TIPO IN ('ME', 'MI', 'KT', 'PA')
+AND A1_NOME IS NOT NULL
+AND F4_TEXTO IS NOT NULL
+"""
+report_query_mart = """SELECT
+B1_ZGRUPO,
+D2_COD,
+B1_DESC,
+D2_QUANT,
+D2_TOTAL,
+D2_EMISSAO
+FROM FATO_VENDAS
+WHERE D2_FILIAL = :filial
+AND D2_EMISSAO >= :inicio
+ORDER BY D2_EMISSAO
+"""
+
+precos_compra_mart = """WITH COMPRAS AS (
+SELECT
+B1_ZGRUPO,
+C7_NUM,
+C7_PRECO,
+C7_QUANT,
+ROW_NUMBER() OVER (PARTITION BY B1_ZGRUPO ORDER BY C7_EMISSAO DESC, C7_NUM DESC, C7_ITEM DESC) AS ORDEM
+FROM FATO_COMPRAS
+WHERE C7_FILIAL = :filial
+AND C7_EMISSAO >= :inicio
+AND B1_GRUPO NOT IN ('002', '001', '003')
+AND B1_TIPO IN ('ME', 'MI', 'KT', 'PA')
+)
+SELECT
+B1_ZGRUPO,
+AVG(C7_PRECO) AS PRECO_MEDIO_COMPRA,
+SUM(C7_PRECO * C7_QUANT) / NULLIF(SUM(C7_QUANT), 0) AS PRECO_MEDIO_PONDERADO,
+MAX(CASE WHEN ORDEM = 1 THEN C7_PRECO END) AS ULTIMO_PRECO,
+MIN(C7_PRECO) AS PRECO_MINIMO,
+MAX(C7_PRECO) AS PRECO_MAXIMO,
+COUNT(DISTINCT C7_NUM) AS PEDIDOS_COMPRA
+FROM COMPRAS
+GROUP BY B1_ZGRUPO
+"""
 
 def report_query(days, filial):
     return f"""
@@ -205,22 +467,6 @@ ORDER BY SD2.D2_EMISSAO
         """
 
 
-def report_query_orders(days, filial):
-    return f"""
-        SELECT
-SB.B1_ZGRUPO,
-SC7.C7_PRECO
-FROM SC7010 AS SC7
-INNER JOIN
-    SB1010 AS SB ON TRIM(SC7.C7_PRODUTO) = TRIM(SB.B1_COD) AND SB.D_E_L_E_T_ <> '*'
-WHERE SC7.D_E_L_E_T_ <> '*' 
-AND SB.B1_GRUPO NOT IN ('002', '001', '003')
-AND SB.B1_TIPO IN ('ME', 'MI', 'KT', 'PA')
-AND SC7.C7_FILIAL = {filial}
-AND CONVERT(DATETIME, STUFF(STUFF(CAST(SC7.C7_EMISSAO AS VARCHAR), 7, 0, '-'), 5, 0, '-')) >= DATEADD(DAY, - {days}, GETDATE())
-        """
-
-
 def search_table(table_name):
     return f"""
         SELECT TOP 1 * from {table_name}
@@ -231,3 +477,44 @@ def table_result(columns_str, table):
     return f"""
         SELECT {columns_str} from {table}
     """
+
+
+def drop_temp_table(table):
+    return f"""
+        DROP TABLE IF EXISTS {table}
+    """
+
+
+def create_codes_table(table):
+    return f"""
+        CREATE TABLE {table} (COD VARCHAR(30) NOT NULL PRIMARY KEY)
+    """
+
+
+def insert_codes(table):
+    return f"""
+        INSERT INTO {table} (COD) VALUES (?)
+    """
+
+
+def query_resultado_lote(table):
+    return f"""SELECT DISTINCT
+P.B1_ZGRUPO,
+P.B1_COD,
+P.B1_DESC,
+S.B2_QATU,
+S.B2_FILIAL,
+P.B1_GRUPO,
+SM.BM_DESC
+FROM
+    {table} AS C
+INNER JOIN
+    SB1010 AS B ON B.B1_COD = C.COD AND B.D_E_L_E_T_ <> '*'
+INNER JOIN
+    SB1010 AS P ON P.D_E_L_E_T_ <> '*' AND
+    (P.B1_COD = B.B1_COD OR (TRIM(B.B1_ZGRUPO) <> '' AND P.B1_ZGRUPO = B.B1_ZGRUPO))
+LEFT JOIN
+    SB2010 AS S ON TRIM(P.B1_COD) = TRIM(S.B2_COD) AND S.B2_LOCAL = 'A01' AND S.D_E_L_E_T_ <> '*'
+LEFT JOIN
+    SBM010 AS SM ON TRIM(P.B1_GRUPO) = TRIM(SM.BM_GRUPO) AND SM.D_E_L_E_T_ <> '*'
+"""
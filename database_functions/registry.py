@@ -0,0 +1,65 @@
+from database_functions import queries
+
+# Execution settings for each query of the catalog in queries.py, keyed by query name.
+# - backend: fetch backend used by 'download' (see fetch_backends.BACKENDS). Every query stays
+#   on 'pandas' until 'python -m database_functions.benchmark' shows 'cursor' is faster for it,
+#   except the batch lookup, which needs the cursor backend to fill its temporary table.
+# - snapshot: keep an on-disk copy of the result for the offline mode (see snapshots.py).
+# - priority: 'interactive' for the lookups a user waits on (searches, stock); everything else is
+#   'bulk' and queues behind them for its own, smaller set of database slots (see admission.py).
+# - target: named connection target of [targets] in db_config.ini. Heavy reads default to the
+#   'reporting' replica and the lookups, plus the stock monitor that polls for fresh changes, use
+#   the 'primary'; an unconfigured or unreachable target falls back to the primary.
+# Queries generated by a function are registered with 'builder' instead of 'sql'; callers pass
+# their name to 'download', since the SQL text changes with the arguments. 'codes' marks the
+# queries run by 'download_for_codes', whose snapshots are keyed by the list of codes.
+QUERY_REGISTRY = {
+    'saldo_analitico': {'sql': queries.saldo_analitico, 'backend': 'pandas', 'snapshot': True},
+    'pedidos': {'sql': queries.pedidos, 'backend': 'pandas', 'snapshot': True},
+    'faturamento': {'sql': queries.faturamento, 'backend': 'pandas', 'snapshot': True},
+    'info_gerais': {'sql': queries.info_gerais, 'backend': 'pandas', 'snapshot': True},
+    'historico_faturamento': {'sql': queries.historico_faturamento, 'backend': 'pandas', 'snapshot': True},
+    'precos_compra': {'sql': queries.precos_compra, 'backend': 'pandas', 'snapshot': True},
+    'prazos_compra': {'sql': queries.prazos_compra, 'backend': 'pandas', 'snapshot': True},
+    'quantidade_receber': {'sql': queries.quantidade_receber, 'backend': 'pandas', 'snapshot': True},
+    'query_busca': {'sql': queries.query_busca, 'backend': 'pandas',
+                    'priority': 'interactive', 'target': 'primary', 'snapshot': True},
+    'query_resultado': {'sql': queries.query_resultado, 'backend': 'pandas',
+                        'priority': 'interactive', 'target': 'primary', 'snapshot': True},
+    'query_resultado_cod_item': {'sql': queries.query_resultado_cod_item, 'backend': 'pandas',
+                                 'priority': 'interactive', 'target': 'primary', 'snapshot': True},
+    'produtos_master': {'sql': queries.produtos_master, 'backend': 'pandas', 'snapshot': True},
+    'estoque_filiais': {'sql': queries.estoque_filiais, 'backend': 'pandas', 'snapshot': True},
+    'estoque_por_filial': {'sql': queries.estoque_por_filial, 'backend': 'pandas',
+                           'priority': 'interactive', 'target': 'primary', 'snapshot': True},
+    'estoque_monitor': {'sql': queries.estoque_monitor, 'backend': 'pandas', 'snapshot': False,
+                        'target': 'primary'},
+    'estoque_alterado': {'sql': queries.estoque_alterado, 'backend': 'pandas',
+                         'priority': 'interactive', 'target': 'primary', 'snapshot': False},
+    'report_query': {'builder': queries.report_query, 'backend': 'pandas', 'snapshot': True},
+    'query_resultado_lote': {'builder': queries.query_resultado_lote, 'backend': 'cursor', 'snapshot': True,
+                             'codes': True, 'priority': 'interactive', 'target': 'primary'},
+}
+
+# Settings used for queries that are not in the registry (generated SQL, table dumps).
+DEFAULT_SETTINGS = {'backend': 'pandas', 'snapshot': False, 'priority': 'bulk', 'target': 'reporting'}
+
+_NAMES_BY_SQL = {settings['sql']: name for name, settings in QUERY_REGISTRY.items() if 'sql' in settings}
+
+
+def find_query(query, name=None):
+    """
+    Look up the registry entry of a SQL query.
+
+    Parameters:
+    - query (str): SQL text, as defined in queries.py.
+    - name (str, optional): Registry name, required for queries generated by a builder.
+
+    Returns:
+    - tuple: (name, settings). The name is None for queries outside the registry.
+    """
+    if name is None or name not in QUERY_REGISTRY:
+        name = _NAMES_BY_SQL.get(query)
+    if name is None:
+        return None, dict(DEFAULT_SETTINGS)
+    return name, {**DEFAULT_SETTINGS, **QUERY_REGISTRY[name]}
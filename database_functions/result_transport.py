@@ -0,0 +1,157 @@
+import atexit
+import logging
+import os
+import tempfile
+import time
+import uuid
+import weakref
+from database_functions.db_connect import config
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow is optional: results are then sent inline.
+    pa = None
+
+# Get a logger
+logger = logging.getLogger(__name__)
+
+# Result files older than this are left over by crashed processes and can be removed.
+STALE_AGE_SECONDS = 6 * 3600
+
+_directory = None
+
+
+def transport_directory():
+    """
+    Folder shared by the processes of this machine for the result files.
+
+    Returns:
+    - str: Value of 'directory' in the [transport] section of db_config.ini, or a
+      'gestao_resultados' folder in the system temporary folder.
+    """
+    global _directory
+    if _directory is None:
+        _directory = config.get('transport', 'directory',
+                                fallback=os.path.join(tempfile.gettempdir(), 'gestao_resultados'))
+        os.makedirs(_directory, exist_ok=True)
+    return _directory
+
+
+def _remove(path):
+    # Windows keeps mapped files locked; those are removed by remove_stale_results later.
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.info(f"result file {path} still in use, left for the next cleanup: {e}")
+
+
+class ResultHandle:
+    """
+    Small picklable reference to a DataFrame published by 'publish_result'.
+
+    With pyarrow the frame lives in an uncompressed Arrow IPC (Feather v2)
+    file that the receiving process memory-maps, so only the path crosses the
+    process boundary. Without pyarrow the frame itself travels in 'frame'.
+    """
+
+    def __init__(self, path=None, rows=0, columns=None, attrs=None, frame=None):
+        self.path = path
+        self.rows = rows
+        self.columns = columns or []
+        self.attrs = attrs or {}
+        self.frame = frame
+        self.pid = os.getpid()
+
+    def __repr__(self):
+        where = self.path or 'inline'
+        return f"ResultHandle({where}, {self.rows} rows)"
+
+    def release(self):
+        """
+        Delete the result file. Called automatically by 'open_result' unless keep=True.
+        """
+        if self.path:
+            _remove(self.path)
+
+
+def publish_result(data_frame):
+    """
+    Write a DataFrame where another process can map it without copying.
+
+    Parameters:
+    - data_frame (pd.DataFrame): Result built by a worker.
+
+    Returns:
+    - ResultHandle: Handle to pass to the receiving process.
+    """
+    attrs = dict(data_frame.attrs)
+    if pa is None:
+        return ResultHandle(rows=len(data_frame), columns=list(data_frame.columns), attrs=attrs, frame=data_frame)
+
+    path = os.path.join(transport_directory(), f"{os.getpid()}_{uuid.uuid4().hex}.arrow")
+    table = pa.Table.from_pandas(data_frame)
+    # No compression, so the columns can be mapped straight from the file.
+    feather.write_feather(table, path + '.tmp', compression='uncompressed')
+    os.replace(path + '.tmp', path)
+    return ResultHandle(path=path, rows=len(data_frame), columns=list(data_frame.columns), attrs=attrs)
+
+
+def open_result(handle, keep=False):
+    """
+    Open a published result in this process.
+
+    The file is memory-mapped: numeric columns point into the mapping, so no
+    copy of the data is made. The file is deleted once the DataFrame is
+    garbage collected, unless keep=True.
+
+    Parameters:
+    - handle (ResultHandle): Handle returned by 'publish_result'.
+    - keep (bool): Leave the file for other readers; call handle.release() when done.
+
+    Returns:
+    - pd.DataFrame: The result.
+    """
+    if handle.frame is not None:
+        return handle.frame
+
+    table = feather.read_table(handle.path, memory_map=True)
+    data_frame = table.to_pandas(split_blocks=True, self_destruct=True)
+    del table
+    data_frame.attrs.update(handle.attrs)
+    if not keep:
+        weakref.finalize(data_frame, _remove, handle.path)
+    return data_frame
+
+
+def remove_stale_results(max_age_seconds=STALE_AGE_SECONDS):
+    """
+    Delete result files left behind by processes that ended without cleaning up.
+
+    Parameters:
+    - max_age_seconds (float): Minimum age of the files to delete.
+
+    Returns:
+    - int: Number of files deleted.
+    """
+    removed = 0
+    now = time.time()
+    for entry in os.scandir(transport_directory()):
+        if entry.is_file() and now - entry.stat().st_mtime > max_age_seconds:
+            _remove(entry.path)
+            removed += 1
+    return removed
+
+
+@atexit.register
+def _cleanup_own_results():
+    # Remove the files this process published and nobody opened. Pool workers end without
+    # running atexit, so their files stay until the receiver opens them (or they go stale).
+    if _directory is None or not os.path.isdir(_directory):
+        return
+    prefix = f"{os.getpid()}_"
+    for file_name in os.listdir(_directory):
+        if file_name.startswith(prefix):
+            _remove(os.path.join(_directory, file_name))
@@ -0,0 +1,185 @@
+import datetime
+import http.client
+import json
+import logging
+import socket
+import urllib.parse
+import pandas as pd
+from database_functions.cancellation import QueryCancelled
+from database_functions.db_connect import config
+
+# Get a logger
+logger = logging.getLogger(__name__)
+
+# Set by the read service itself, which must always query the database directly.
+_backend_override = None
+
+
+def data_backend():
+    """
+    Data backend of this process: 'direct' (query the database) or 'service' (ask the read service).
+
+    Returns:
+    - str: Value of 'backend' in the [data] section of db_config.ini (default 'direct').
+    """
+    return _backend_override or config.get('data', 'backend', fallback='direct')
+
+
+def service_enabled():
+    """
+    Check whether searches and reports go through the read service.
+    """
+    return data_backend() == 'service'
+
+
+def use_direct_backend():
+    """
+    Make this process query the database directly, whatever db_config.ini says.
+    """
+    global _backend_override
+    _backend_override = 'direct'
+
+
+def frame_to_payload(data_frame):
+    """
+    Convert a DataFrame to a JSON-ready dictionary, keeping its dtypes and attrs.
+
+    Parameters:
+    - data_frame (pd.DataFrame): Query or report result.
+
+    Returns:
+    - dict: 'columns', 'data' (list of rows), 'dtypes' and 'attrs'.
+    """
+    values = data_frame.astype(object).where(data_frame.notna(), None)
+    return {
+        'columns': [str(column) for column in data_frame.columns],
+        'data': values.values.tolist(),
+        'dtypes': [str(dtype) for dtype in data_frame.dtypes],
+        'attrs': {key: value.isoformat() if isinstance(value, datetime.datetime) else value
+                  for key, value in data_frame.attrs.items()},
+    }
+
+
+def payload_to_frame(payload):
+    """
+    Rebuild the DataFrame sent by 'frame_to_payload'.
+
+    Parameters:
+    - payload (dict): Decoded JSON payload.
+
+    Returns:
+    - pd.DataFrame: The DataFrame with its dtypes and attrs.
+    """
+    data_frame = pd.DataFrame(payload['data'], columns=payload['columns'])
+    for column, dtype in zip(payload['columns'], payload['dtypes']):
+        if dtype == 'object':
+            continue
+        try:
+            if dtype.startswith('datetime64'):
+                data_frame[column] = pd.to_datetime(data_frame[column])
+            else:
+                data_frame[column] = data_frame[column].astype(dtype)
+        except (TypeError, ValueError):
+            # Integer columns of an empty result come back without values.
+            data_frame[column] = pd.to_numeric(data_frame[column], errors='coerce')
+    attrs = dict(payload.get('attrs', {}))
+    if attrs.get('snapshot_created'):
+        attrs['snapshot_created'] = datetime.datetime.fromisoformat(attrs['snapshot_created'])
+    data_frame.attrs.update(attrs)
+    return data_frame
+
+
+class ServiceClient:
+    """
+    Client of the shared read service (see read_service.py).
+
+    Each call is one HTTP request; the service owns the database connection
+    and a result cache shared by every desktop.
+    """
+
+    def __init__(self, url, timeout=300):
+        """
+        Parameters:
+        - url (str): Base URL of the service, e.g. 'http://servidor:8765'.
+        - timeout (float): Seconds to wait for an answer.
+        """
+        parsed = urllib.parse.urlsplit(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.timeout = timeout
+
+    def request(self, method, path, params=None, body=None, token=None):
+        """
+        Send a request to the service and decode the DataFrame it returns.
+
+        Parameters:
+        - method (str): 'GET' or 'POST'.
+        - path (str): Endpoint, e.g. '/search'.
+        - params (dict, optional): Query string arguments.
+        - body (dict, optional): JSON body.
+        - token (CancellationToken, optional): Closes the connection when cancelled.
+
+        Returns:
+        - pd.DataFrame: The result, or None if the service failed, could not be reached or the request was cancelled.
+        """
+        if params:
+            path = f"{path}?{urllib.parse.urlencode(params)}"
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+        def close_connection():
+            # Unblocks the thread waiting for the answer.
+            if connection.sock is not None:
+                connection.sock.shutdown(socket.SHUT_RDWR)
+
+        if token:
+            token.attach(close_connection)
+        try:
+            if token:
+                token.raise_if_cancelled()
+            data = json.dumps(body).encode('utf-8') if body is not None else None
+            connection.request(method, path, body=data, headers={'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            content = response.read()
+            if response.status != 200:
+                logger.error(f"read service answered {response.status} to {path}: {content[:200]!r}")
+                return None
+            return payload_to_frame(json.loads(content))
+        except QueryCancelled:
+            logger.info(f"service request cancelled ({path})")
+            return None
+        except Exception as e:
+            if token and token.cancelled:
+                logger.info(f"service request cancelled ({path})")
+            else:
+                logger.error(f"An error occurred while calling the read service: {e}")
+            return None
+        finally:
+            if token:
+                token.detach(close_connection)
+            connection.close()
+
+    def search(self, code, token=None):
+        return self.request('GET', '/search', {'code': code}, token=token)
+
+    def search_batch(self, codes, token=None):
+        return self.request('POST', '/search', body={'codes': list(codes)}, token=token)
+
+    def stock(self, code, token=None):
+        return self.request('GET', '/stock', {'code': code}, token=token)
+
+    def report(self, name, filial, days=None, token=None):
+        params = {'name': name, 'filial': filial}
+        if days:
+            params['days'] = days
+        return self.request('GET', '/report', params, token=token)
+
+
+def get_service_client():
+    """
+    Build the client of the service configured in the [data] section of db_config.ini.
+
+    Returns:
+    - ServiceClient: Client for 'service_url' (default 'http://localhost:8765').
+    """
+    return ServiceClient(config.get('data', 'service_url', fallback='http://localhost:8765'),
+                         timeout=config.getfloat('data', 'service_timeout', fallback=300))
@@ -0,0 +1,179 @@
+import datetime
+import hashlib
+import json
+import logging
+import os
+import pandas as pd
+from database_functions.db_connect import app_path, config
+
+# Get a logger
+logger = logging.getLogger(__name__)
+
+
+class SnapshotStore:
+    """
+    On-disk copies of query results, used to keep the screens working offline.
+
+    Each snapshot is a CSV file plus a JSON file with the query, its parameters,
+    the moment it was taken and the column types, so it can be read back with
+    the same dtypes and refreshed later. The snapshot folder can be set in
+    db_config.ini, so the format must not be able to run code when loaded
+    (no pickle).
+    """
+
+    def __init__(self, directory):
+        """
+        Parameters:
+        - directory (str): Folder where the snapshots are written.
+        """
+        self.directory = directory
+
+    @staticmethod
+    def key(query, params=None):
+        """
+        Build the file name of the snapshot of a query and its parameters.
+        """
+        text = " ".join(query.split()) + repr(tuple(params) if params else ())
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def save(self, query, params, data_frame, name=None):
+        """
+        Write a snapshot, replacing the previous one of the same query and parameters.
+
+        Parameters:
+        - query (str): SQL query that produced the data.
+        - params (tuple, optional): Parameters of the SQL query.
+        - data_frame (DataFrame): Query result.
+        - name (str, optional): Registry name of the query.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        key = self.key(query, params)
+        path = os.path.join(self.directory, key)
+        metadata = {
+            'name': name,
+            'query': query,
+            'params': list(params) if params else None,
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'rows': len(data_frame),
+            'dtypes': {str(column): str(dtype) for column, dtype in data_frame.dtypes.items()},
+        }
+        try:
+            # Write to temporary files first so a crash never leaves a half written snapshot.
+            data_frame.to_csv(path + '.csv.tmp', index=False, encoding='utf-8')
+            with open(path + '.json.tmp', 'w', encoding='utf-8') as f:
+                json.dump(metadata, f, default=str)
+            os.replace(path + '.csv.tmp', path + '.csv')
+            os.replace(path + '.json.tmp', path + '.json')
+        except Exception as e:
+            logger.error(f"An error occurred while saving the snapshot of {name or key}: {e}")
+
+    def load(self, query, params=None):
+        """
+        Read the snapshot of a query and its parameters.
+
+        Returns:
+        - tuple: (DataFrame, datetime of the snapshot), or (None, None) if there is no snapshot.
+        """
+        path = os.path.join(self.directory, self.key(query, params))
+        try:
+            with open(path + '.json', 'r', encoding='utf-8') as f:
+                metadata = json.load(f)
+            data_frame = _read_csv(path + '.csv', metadata.get('dtypes', {}))
+        except FileNotFoundError:
+            return None, None
+        except Exception as e:
+            logger.error(f"An error occurred while reading the snapshot {path}: {e}")
+            return None, None
+
+        created = datetime.datetime.fromisoformat(metadata['created'])
+        mark_snapshot(data_frame, created)
+        return data_frame, created
+
+    def entries(self):
+        """
+        List the metadata of every snapshot in the store.
+
+        Returns:
+        - list: Dictionaries with 'name', 'query', 'params', 'created' and 'rows'.
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for file_name in os.listdir(self.directory):
+            if not file_name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, file_name), 'r', encoding='utf-8') as f:
+                    metadata = json.load(f)
+                metadata['created'] = datetime.datetime.fromisoformat(metadata['created'])
+                entries.append(metadata)
+            except Exception as e:
+                logger.error(f"Ignoring unreadable snapshot {file_name}: {e}")
+        return entries
+
+
+def _read_csv(path, dtypes):
+    # Read a snapshot CSV back with the column types recorded when it was saved.
+    # Only empty fields are read as missing values, so codes such as 'NA' stay text.
+    dates = [column for column, dtype in dtypes.items() if dtype.startswith('datetime64')]
+    types = {column: (dtype if dtype != 'object' else str)
+             for column, dtype in dtypes.items() if column not in dates}
+    return pd.read_csv(path, dtype=types, parse_dates=dates, keep_default_na=False, na_values=[''],
+                       encoding='utf-8')
+
+
+def mark_snapshot(data_frame, created=None):
+    """
+    Record in the DataFrame whether it came from the database or from a snapshot.
+
+    Parameters:
+    - data_frame (DataFrame): Query result.
+    - created (datetime, optional): Moment of the snapshot. None for live data.
+    """
+    data_frame.attrs['source'] = 'snapshot' if created else 'database'
+    data_frame.attrs['snapshot_created'] = created
+
+
+def snapshot_age_text(data_frame):
+    """
+    Describe the age of the data in a DataFrame for the user interface.
+
+    Parameters:
+    - data_frame (DataFrame): Result returned by 'download' or by the warm-up searches.
+
+    Returns:
+    - str: Text such as 'Dados salvos há 12 min' (snapshot) or 'Dados carregados há 3 min'
+      (warm-up data), or an empty string for live data.
+    """
+    created = data_frame.attrs.get('snapshot_created') if data_frame is not None else None
+    if not created:
+        return ""
+    prefix = "Dados carregados" if data_frame.attrs.get('source') == 'hot_data' else "Dados salvos"
+    minutes = int((datetime.datetime.now() - created).total_seconds() // 60)
+    if minutes < 1:
+        return f"{prefix} agora"
+    if minutes < 60:
+        return f"{prefix} há {minutes} min"
+    if minutes < 60 * 24:
+        return f"{prefix} há {minutes // 60} h"
+    return f"{prefix} em {created:%d/%m/%Y %H:%M}"
+
+
+def offline_enabled():
+    """
+    Check whether the offline mode is turned on in the [offline] section of db_config.ini.
+    """
+    return config.getboolean('offline', 'enabled', fallback=False)
+
+
+def snapshot_max_age():
+    """
+    Age up to which a snapshot is served instead of querying the database.
+
+    Returns:
+    - timedelta: Value of 'max_age_minutes' in the [offline] section (default 10 minutes).
+    """
+    return datetime.timedelta(minutes=config.getfloat('offline', 'max_age_minutes', fallback=10))
+
+
+snapshot_store = SnapshotStore(config.get('offline', 'directory', fallback=os.path.join(app_path, 'snapshots')))
@@ -0,0 +1,116 @@
+import logging
+import random
+import sqlite3
+import datetime
+
+# Get a logger
+logger = logging.getLogger(__name__)
+
+# Protheus tables read by the application and the columns the queries use.
+STAND_IN_TABLES = {
+    'SB1010': ['B1_COD', 'B1_ZGRUPO', 'B1_TIPO', 'B1_GRUPO', 'B1_DESC', 'B1_UM'],
+    'SB2010': ['B2_COD', 'B2_FILIAL', 'B2_LOCAL', 'B2_QATU', 'B2_CM1', 'B2_VATU1'],
+    'SBZ010': ['BZ_COD', 'BZ_FILIAL', 'BZ_LOCALI2'],
+    'SBM010': ['BM_GRUPO', 'BM_DESC'],
+    'SA1010': ['A1_COD', 'A1_LOJA', 'A1_NOME'],
+    'SA2010': ['A2_COD', 'A2_LOJA', 'A2_NOME', 'A2_TEL'],
+    'SF4010': ['F4_CODIGO', 'F4_TEXTO'],
+    'SD2010': ['D2_EMISSAO', 'D2_COD', 'D2_UM', 'D2_TP', 'D2_CLIENTE', 'D2_LOJA', 'D2_TES', 'D2_QUANT',
+               'D2_TOTAL', 'D2_MARGEM', 'D2_FILIAL', 'D2_LOCAL'],
+    'SC7010': ['C7_NUM', 'C7_FORNECE', 'C7_LOJA', 'C7_ITEM', 'C7_NUMSC', 'C7_PRODUTO', 'C7_DESCRI', 'C7_EMISSAO',
+               'C7_DATPRF', 'C7_QUANT', 'C7_UM', 'C7_PRECO', 'C7_DESC1', 'C7_DESC2', 'C7_DESC3', 'C7_VALIPI',
+               'C7_TOTAL', 'C7_QUJE', 'C7_RESIDUO', 'C7_FILIAL'],
+}
+
+FILIAIS = ['0101', '0103', '0104', '0105']
+
+
+def build_stand_in(path, products=20000, sales=200000, orders=50000, seed=42):
+    """
+    Create a SQLite database with synthetic copies of the Protheus tables.
+
+    Every table gets the 'D_E_L_E_T_' and 'R_E_C_N_O_' control columns, a few
+    deleted rows and the indexes a Protheus installation usually has, so the
+    queries in queries.py that avoid T-SQL specific functions run unchanged.
+
+    Parameters:
+    - path (str): File of the SQLite database. Existing tables are replaced.
+    - products (int): Number of products in SB1010.
+    - sales (int): Number of sales lines in SD2010.
+    - orders (int): Number of purchase order lines in SC7010.
+    - seed (int): Seed of the random generator.
+    """
+    rng = random.Random(seed)
+    today = datetime.date.today()
+
+    def emission(max_days):
+        return (today - datetime.timedelta(days=rng.randint(0, max_days))).strftime('%Y%m%d')
+
+    def deleted():
+        return '*' if rng.random() < 0.01 else ' '
+
+    codes = [f"{index:08d}" for index in range(products)]
+    groups = {code: f"G{index // 3:06d}" for index, code in enumerate(codes)}
+
+    rows = {
+        'SB1010': [(code, groups[code], rng.choice(['ME', 'MI', 'KT', 'PA']), f"{rng.randint(4, 60):03d}",
+                    f"PRODUTO {code}", 'UN', deleted()) for code in codes],
+        'SB2010': [(code, filial, 'A01', float(rng.randint(0, 500)), round(rng.uniform(1, 300), 2),
+                    round(rng.uniform(0, 5000), 2), deleted()) for code in codes for filial in FILIAIS],
+        'SBZ010': [(code, filial, f"R{rng.randint(1, 99):02d}", deleted()) for code in codes for filial in FILIAIS],
+        'SBM010': [(f"{group:03d}", f"GRUPO {group:03d}", ' ') for group in range(1, 61)],
+        'SA1010': [(f"C{index:05d}", '01', f"CLIENTE {index}", ' ') for index in range(2000)],
+        'SA2010': [(f"F{index:05d}", '01', f"FORNECEDOR {index}", '2733330000', ' ') for index in range(300)],
+        'SF4010': [('501', 'VENDA', ' '), ('502', 'BONIFICACAO', ' ')],
+        'SD2010': [],
+        'SC7010': [],
+    }
+    for _ in range(sales):
+        quantity = float(rng.randint(1, 20))
+        rows['SD2010'].append((emission(730), rng.choice(codes), 'UN', 'ME', f"C{rng.randint(0, 1999):05d}", '01',
+                               rng.choice(['501', '502']), quantity, round(quantity * rng.uniform(5, 500), 2),
+                               round(rng.uniform(-5, 40), 2), rng.choice(FILIAIS), 'A01', deleted()))
+    for index in range(orders):
+        code = rng.choice(codes)
+        quantity = float(rng.randint(1, 100))
+        price = round(rng.uniform(1, 300), 2)
+        issued = emission(730)
+        promised = (datetime.datetime.strptime(issued, '%Y%m%d') +
+                    datetime.timedelta(days=rng.randint(5, 60))).strftime('%Y%m%d')
+        rows['SC7010'].append((f"{index // 10:06d}", f"F{rng.randint(0, 299):05d}", '01', f"{index % 10 + 1:04d}",
+                               '', code, f"PRODUTO {code}", issued, promised, quantity, 'UN', price, 0.0, 0.0, 0.0,
+                               0.0, round(quantity * price, 2), float(rng.randint(0, int(quantity))),
+                               rng.choice([' ', ' ', ' ', 'S']), rng.choice(FILIAIS), deleted()))
+
+    connection = sqlite3.connect(path)
+    try:
+        for table, columns in STAND_IN_TABLES.items():
+            connection.execute(f"DROP TABLE IF EXISTS {table}")
+            connection.execute(f"CREATE TABLE {table} ({', '.join(columns)}, D_E_L_E_T_ TEXT DEFAULT ' ', "
+                               f"R_E_C_N_O_ INTEGER PRIMARY KEY AUTOINCREMENT)")
+            placeholders = ', '.join(['?'] * (len(columns) + 1))
+            connection.executemany(f"INSERT INTO {table} ({', '.join(columns)}, D_E_L_E_T_) VALUES ({placeholders})",
+                                   rows[table])
+        connection.execute("CREATE INDEX SB1010_COD ON SB1010 (B1_COD)")
+        connection.execute("CREATE INDEX SB1010_ZGRUPO ON SB1010 (B1_ZGRUPO)")
+        connection.execute("CREATE INDEX SB2010_COD ON SB2010 (B2_COD, B2_LOCAL)")
+        connection.execute("CREATE INDEX SB1010_TRIM_COD ON SB1010 (TRIM(B1_COD))")
+        connection.execute("CREATE INDEX SB2010_TRIM_COD ON SB2010 (TRIM(B2_COD))")
+        connection.execute("CREATE INDEX SBZ010_TRIM_COD ON SBZ010 (TRIM(BZ_COD))")
+        connection.execute("CREATE INDEX SD2010_FILIAL ON SD2010 (D2_FILIAL, D2_EMISSAO)")
+        connection.execute("CREATE INDEX SC7010_FILIAL ON SC7010 (C7_FILIAL, C7_EMISSAO)")
+
+        # S_T_A_M_P_ is the change timestamp Protheus keeps when it is enabled on the table;
+        # the triggers play the database default and the update of the ERP.
+        stamp = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+        connection.execute("ALTER TABLE SB2010 ADD COLUMN S_T_A_M_P_ TEXT")
+        connection.execute(f"UPDATE SB2010 SET S_T_A_M_P_ = {stamp}")
+        connection.execute("CREATE INDEX SB2010_STAMP ON SB2010 (S_T_A_M_P_)")
+        for event in ('INSERT', 'UPDATE OF B2_QATU, D_E_L_E_T_'):
+            connection.execute(f"CREATE TRIGGER SB2010_STAMP_{event.split()[0]} AFTER {event} ON SB2010 "
+                               f"BEGIN UPDATE SB2010 SET S_T_A_M_P_ = {stamp} WHERE R_E_C_N_O_ = NEW.R_E_C_N_O_; END")
+        connection.commit()
+    finally:
+        connection.close()
+
+    logger.info(f"stand-in database created at {path}")
@@ -1,6 +1,7 @@
 import logging
 import os
 from user_interface.main_ui import MainWindowLogic
+from database_functions.result_transport import remove_stale_results
 from PyQt5.QtWidgets import QApplication
 
 # Set up logging configurations.
@@ -20,6 +21,9 @@ def main():
     Any unexpected errors during this process are logged and then raised.
     """
     try:
+        # Delete result files left behind by a previous session that crashed.
+        remove_stale_results()
+
         # Create a PyQt application instance.
         app = QApplication([])
 
@@ -27,6 +31,9 @@ def main():
         window = MainWindowLogic()
         window.show()
 
+        # Connect and load the hot datasets while the user looks at the window.
+        window.start_warm_up()
+
         # Start the PyQt event loop.
         app.exec_()
 
@@ -0,0 +1,179 @@
+import csv
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+import time
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from database_functions.funcoes_base import limit_db_concurrency
+from main_functions.compute import ComputeExecutor, set_compute_executor
+from main_functions.relatorios import PREPARE, REPORTS, run_report
+
+# Get a logger
+logger = logging.getLogger(__name__)
+
+
+def load_manifest(path):
+    """
+    Read a batch manifest and expand it into report tasks.
+
+    The manifest is a JSON file such as:
+
+        {
+            "output_dir": "relatorios",
+            "format": "xlsx",
+            "workers": 4,
+            "db_concurrency": 2,
+            "reports": ["saldo_analitico", "faturamento", "sugestao_compra"],
+            "filiais": ["0101", "0103", "0104", "0105"],
+            "periodos": [90, 180]
+        }
+
+    Every report runs for every branch; reports that take a period also run for
+    every period, the others run once per branch. A manifest with a report that
+    takes a period must list 'periodos' (positive numbers of days), otherwise
+    a ValueError is raised before any task runs.
+
+    Parameters:
+    - path (str): Path of the manifest file.
+
+    Returns:
+    - tuple: (manifest dictionary, list of task dictionaries with 'report', 'filial' and 'days').
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    periodos = manifest.get('periodos') or []
+    for report in manifest['reports']:
+        if report not in REPORTS:
+            raise ValueError(f"Unknown report in manifest: {report}")
+        if REPORTS[report][1] and not periodos:
+            raise ValueError(f"Report {report} takes a period, but the manifest has no 'periodos'")
+    invalid = [days for days in periodos if isinstance(days, bool) or not isinstance(days, int) or days <= 0]
+    if invalid:
+        raise ValueError(f"Invalid 'periodos' in manifest, expected positive numbers of days: {invalid}")
+
+    tasks = []
+    for report in manifest['reports']:
+        takes_period = REPORTS[report][1]
+        for filial in manifest['filiais']:
+            for days in periodos if takes_period else [None]:
+                tasks.append({'report': report, 'filial': filial, 'days': days})
+    return manifest, tasks
+
+
+def _init_worker(db_slots):
+    # Share the database concurrency cap with every worker process.
+    limit_db_concurrency(db_slots)
+    # The workers are processes already, so they compute in place.
+    set_compute_executor(ComputeExecutor(workers=0))
+
+
+def _write_frame(data_frame, path, file_format):
+    if file_format == 'csv':
+        data_frame.to_csv(path, index=False, sep=';', decimal=',')
+    else:
+        data_frame.to_excel(path, index=False)
+
+
+def run_task(task, output_dir, file_format='xlsx'):
+    """
+    Run one report task and write its output file.
+
+    When the report lists the weeks of sales it capped (attrs['ajustes'], see
+    sugestao_compra.calcular_sugestao), they go to a companion '_ajustes' file.
+
+    Parameters:
+    - task (dict): 'report', 'filial' and 'days' of the task.
+    - output_dir (str): Folder of the output files.
+    - file_format (str): 'xlsx' or 'csv'.
+
+    Returns:
+    - dict: The task with 'status', 'rows', 'seconds' and 'file' added.
+    """
+    start = time.perf_counter()
+    result = dict(task, status='ok', rows=0, file=None)
+    try:
+        data_frame = run_report(task['report'], task['filial'], task['days'])
+        if data_frame is None:
+            result['status'] = 'failed'
+        else:
+            suffix = f"_{task['days']}d" if task['days'] else ""
+            file_name = f"{task['report']}_{task['filial']}{suffix}.{file_format}"
+            _write_frame(data_frame, os.path.join(output_dir, file_name), file_format)
+            if data_frame.attrs.get('ajustes'):
+                # The weeks of sales the report capped, next to it for review.
+                _write_frame(pd.DataFrame(data_frame.attrs['ajustes']),
+                             os.path.join(output_dir, file_name.replace('.', '_ajustes.', 1)), file_format)
+            result['rows'] = len(data_frame)
+            result['file'] = file_name
+    except Exception as e:
+        logger.error(f"An error occurred while running {task}: {e}")
+        result['status'] = f"error: {e}"
+    result['seconds'] = round(time.perf_counter() - start, 2)
+    return result
+
+
+def prepare_reports(reports):
+    """
+    Run the PREPARE steps of the reports once, in this process, before the tasks start.
+
+    A failed step is logged and its reports use what the last successful one saved.
+
+    Parameters:
+    - reports (list): Report names of the manifest.
+    """
+    steps = []
+    for report in reports:
+        if report in PREPARE and PREPARE[report] not in steps:
+            steps.append(PREPARE[report])
+    for step in steps:
+        try:
+            step()
+        except Exception as e:
+            logger.error(f"An error occurred while preparing the reports ({step.__name__}): {e}")
+
+
+def run_batch(manifest_path):
+    """
+    Run every task of a manifest across a process pool and write a timing summary.
+
+    Parameters:
+    - manifest_path (str): Path of the manifest file.
+
+    Returns:
+    - list: The result dictionaries of all tasks.
+    """
+    manifest, tasks = load_manifest(manifest_path)
+    run_dir = os.path.join(manifest.get('output_dir', 'relatorios'), datetime.datetime.now().strftime('%Y%m%d_%H%M%S'))
+    os.makedirs(run_dir, exist_ok=True)
+    file_format = manifest.get('format', 'xlsx')
+    workers = manifest.get('workers', os.cpu_count())
+
+    start = time.perf_counter()
+    prepare_reports(manifest['reports'])
+    logger.info(f"Running {len(tasks)} report tasks with {workers} workers into {run_dir}")
+    db_slots = multiprocessing.BoundedSemaphore(manifest.get('db_concurrency', 2))
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(db_slots,)) as executor:
+        futures = [executor.submit(run_task, task, run_dir, file_format) for task in tasks]
+        for future in as_completed(futures):
+            result = future.result()
+            logger.info(f"{result['report']} {result['filial']} {result['days'] or ''}: "
+                        f"{result['status']} in {result['seconds']}s")
+            results.append(result)
+    total = round(time.perf_counter() - start, 2)
+
+    # Timing summary, one line per task plus the total.
+    with open(os.path.join(run_dir, 'resumo.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=['report', 'filial', 'days', 'status', 'rows', 'seconds', 'file'],
+                                delimiter=';')
+        writer.writeheader()
+        writer.writerows(sorted(results, key=lambda item: (item['report'], item['filial'], item['days'] or 0)))
+        writer.writerow({'report': 'TOTAL', 'rows': sum(item['rows'] for item in results), 'seconds': total})
+
+    failed = [item for item in results if item['status'] != 'ok']
+    logger.info(f"Batch finished in {total}s, {len(failed)} of {len(results)} tasks failed")
+    return results
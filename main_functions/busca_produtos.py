@@ -1,11 +1,19 @@
 import logging
 import os
+import re
 import pandas as pd
-from database_functions.funcoes_base import download
-from database_functions.queries import query_busca, query_resultado, query_resultado_cod_item
+from database_functions.funcoes_base import download, download_for_codes
+from database_functions.queries import (query_busca, query_resultado, query_resultado_cod_item, query_resultado_lote,
+                                        estoque_por_filial)
+from database_functions.service_client import service_enabled, get_service_client
+from main_functions.compute import run_compute
+from main_functions.warm_up import RESULT_COLUMNS, search_hot_data, search_hot_data_batch
 
+# Width of B1_COD (and of the COD column of the temporary codes table).
+CODE_MAX_LENGTH = 30
 
-def search_function(user_search):
+
+def search_function(user_search, token=None):
     """
     Execute a search based on the user's input.
     
@@ -15,6 +23,7 @@ def search_function(user_search):
     
     Parameters:
     - user_search (str): The user's inputted search term or product ID.
+    - token (CancellationToken, optional): Token used to cancel the search queries.
 
     Returns:
     - pd.DataFrame: A dataframe containing the search results.
@@ -26,19 +35,142 @@ def search_function(user_search):
     # Log the start of the search process
     logger.info("Starting the search process.")
 
+    # Let the shared read service answer when this desktop is configured to use it
+    if service_enabled():
+        return get_service_client().search(user_search, token=token)
+
+    # Answer from the data loaded by the warm-up while it is fresh
+    data_frame = search_hot_data(user_search)
+    if data_frame is not None:
+        return data_frame
+
     # Use the 'download' function to execute the initial search query
-    search_results = download(query_busca, (user_search,))
+    search_results = download(query_busca, (user_search,), token=token)
+
+    # Stop here if the search was superseded by a newer one
+    if token and token.cancelled:
+        return None
 
     # Check if search results are valid and the required column exists
-    if (search_results.empty or 'B1_ZGRUPO' not in search_results.columns or
+    if (search_results is None or search_results.empty or 'B1_ZGRUPO' not in search_results.columns or
             not search_results.iloc[0]['B1_ZGRUPO'].strip()):
-        data_frame = download(query_resultado_cod_item, (user_search,))
+        data_frame = download(query_resultado_cod_item, (user_search,), token=token)
         return data_frame
 
     # Extract the group ID from the initial search results
     group_id = search_results.iloc[0]['B1_ZGRUPO']
 
     # Use the 'download' function to retrieve the final data set based on the group ID
-    data_frame = download(query_resultado, (group_id,))
+    data_frame = download(query_resultado, (group_id,), token=token)
 
     return data_frame
+
+
+def parse_codes(text):
+    """
+    Extract the product codes from text pasted by the user.
+
+    Codes may be separated by line breaks (a spreadsheet column), tabs,
+    spaces, commas or semicolons. Codes are upper-cased, like the database
+    collation compares them, and duplicates are removed, keeping the order.
+
+    Parameters:
+    - text (str): The pasted text.
+
+    Returns:
+    - list: The product codes.
+    """
+    codes = [code.upper() for code in re.split(r"[\s,;]+", text) if code]
+    return list(dict.fromkeys(codes))
+
+
+def batch_search_function(codes, token=None):
+    """
+    Execute a search for a list of product codes at once.
+
+    The codes are uploaded once and their groups and per-branch stock are
+    resolved in a single query, instead of one 'search_function' call per code.
+
+    Parameters:
+    - codes (list): Product codes, e.g. from 'parse_codes'.
+    - token (CancellationToken, optional): Token used to cancel the search query.
+
+    Returns:
+    - pd.DataFrame: A dataframe with the results of all codes. The codes that were not
+      found, including those longer than CODE_MAX_LENGTH, are listed in its 'not_found' attribute.
+    """
+
+    # Get a logger
+    logger = logging.getLogger(__name__)
+    logger.info(f"Starting the batch search process for {len(codes)} codes.")
+
+    # Let the shared read service answer when this desktop is configured to use it
+    if service_enabled():
+        return get_service_client().search_batch(codes, token=token)
+
+    # Codes longer than B1_COD cannot exist and would make the bulk insert fail
+    codes = [code.upper() for code in codes]
+    valid_codes = [code for code in codes if len(code) <= CODE_MAX_LENGTH]
+    if len(valid_codes) < len(codes):
+        logger.warning(f"{len(codes) - len(valid_codes)} codes longer than {CODE_MAX_LENGTH} characters ignored.")
+
+    if valid_codes:
+        # Answer from the data loaded by the warm-up while it is fresh
+        data_frame = search_hot_data_batch(valid_codes)
+        if data_frame is None:
+            data_frame = download_for_codes(query_resultado_lote, valid_codes, token=token)
+        if data_frame is None:
+            return None
+    else:
+        data_frame = pd.DataFrame(columns=RESULT_COLUMNS)
+
+    found = set(data_frame['B1_COD'].str.strip().str.upper())
+    data_frame.attrs['not_found'] = [code for code in codes if code not in found]
+    return data_frame
+
+
+def stock_by_branch(code, token=None):
+    """
+    Stock of a product in every branch and location.
+
+    Parameters:
+    - code (str): Product code.
+    - token (CancellationToken, optional): Token used to cancel the query.
+
+    Returns:
+    - pd.DataFrame: B2_FILIAL, B2_LOCAL and B2_QATU, or None if the query failed.
+    """
+    if service_enabled():
+        return get_service_client().stock(code, token=token)
+    return download(estoque_por_filial, (code.strip(),), token=token)
+
+
+def pivot_estoque(data_frame):
+    """
+    Quantity of each code per branch, as shown in the search table.
+
+    Parameters:
+    - data_frame (pd.DataFrame): Search result with B1_COD, B2_FILIAL and B2_QATU.
+
+    Returns:
+    - pd.DataFrame: One row per code, one column per branch.
+    """
+    return data_frame.pivot_table(index='B1_COD', columns='B2_FILIAL', values='B2_QATU', aggfunc='sum', fill_value=0)
+
+
+def search_with_pivot(func, search, token=None):
+    """
+    Run a search and build its table outside the GUI thread.
+
+    Parameters:
+    - func (callable): search_function or batch_search_function.
+    - search: The code or list of codes to search.
+    - token (CancellationToken, optional): Token used to cancel the search.
+
+    Returns:
+    - tuple: (search result, pivot of pivot_estoque). The pivot is None when there is no result.
+    """
+    data_frame = func(search, token=token)
+    if data_frame is None or data_frame.empty:
+        return data_frame, None
+    return data_frame, run_compute(pivot_estoque, data_frame)
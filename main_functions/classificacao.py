@@ -0,0 +1,113 @@
+import datetime
+import logging
+import numpy as np
+import pandas as pd
+from database_functions.db_connect import config
+from main_functions.series import day_index
+
+# Get a logger
+logger = logging.getLogger(__name__)
+
+# Thresholds used when none are given.
+DEFAULT_THRESHOLDS = {'a_share': 0.8, 'b_share': 0.95, 'x_cv': 0.5, 'y_cv': 1.0, 'period_days': 30}
+
+
+def classification_thresholds():
+    """
+    Thresholds of the ABC/XYZ classification, from the [classificacao] section of db_config.ini.
+
+    Returns:
+    - dict: 'a_share' and 'b_share' (cumulative revenue share closing the A and B classes),
+      'x_cv' and 'y_cv' (coefficient of variation closing the X and Y classes) and
+      'period_days' (days per demand bucket).
+    """
+    return {
+        'a_share': config.getfloat('classificacao', 'a_share', fallback=DEFAULT_THRESHOLDS['a_share']),
+        'b_share': config.getfloat('classificacao', 'b_share', fallback=DEFAULT_THRESHOLDS['b_share']),
+        'x_cv': config.getfloat('classificacao', 'x_cv', fallback=DEFAULT_THRESHOLDS['x_cv']),
+        'y_cv': config.getfloat('classificacao', 'y_cv', fallback=DEFAULT_THRESHOLDS['y_cv']),
+        'period_days': config.getint('classificacao', 'period_days', fallback=DEFAULT_THRESHOLDS['period_days']),
+    }
+
+
+def classify_abc_xyz(vendas, days, thresholds=None, end=None, value='D2_TOTAL'):
+    """
+    Classify every B1_ZGRUPO of every branch by revenue (ABC) and demand variability (XYZ).
+
+    All groups are classified in one pass over the sales lines:
+    - ABC: groups sorted by revenue inside their branch; a group is A while the
+      revenue share of the groups before it is below 'a_share', B below 'b_share',
+      C otherwise (groups without revenue are always C).
+    - XYZ: the quantity sold is bucketed in periods of 'period_days' days over the
+      analysed window, empty periods included; the coefficient of variation
+      (standard deviation over mean) of the buckets is X up to 'x_cv', Y up to
+      'y_cv' and Z above it or without sales.
+
+    Parameters:
+    - vendas (pd.DataFrame): Sales lines with B1_ZGRUPO, D2_EMISSAO, D2_QUANT, the revenue
+      column and, for several branches, FILIAL.
+    - days (int): Days of the analysed window, ending on 'end'.
+    - thresholds (dict, optional): Thresholds, see classification_thresholds. Missing keys
+      take the values of DEFAULT_THRESHOLDS.
+    - end (datetime.date, optional): Last day of the window. Defaults to today.
+    - value (str): Revenue column, 'D2_TOTAL' (report_query) or 'VFB' (faturamento).
+
+    Returns:
+    - pd.DataFrame: FILIAL (when given), B1_ZGRUPO, RECEITA, PARTICIPACAO_ACUM, CLASSE_ABC,
+      CV_DEMANDA, CLASSE_XYZ and CLASSE (e.g. 'AX'), sorted by branch and revenue.
+    """
+    thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+    period_days = thresholds['period_days']
+    end = end or datetime.date.today()
+    by_branch = 'FILIAL' in vendas.columns
+    branch_codes, branches = pd.factorize(vendas['FILIAL'] if by_branch else np.zeros(len(vendas)), sort=True)
+    group_codes, groups = pd.factorize(vendas['B1_ZGRUPO'].fillna(''), sort=True)
+
+    # One key per (branch, group) present in the sales.
+    keys, inverse = np.unique(branch_codes.astype(np.int64) * len(groups) + group_codes, return_inverse=True)
+    count = len(keys)
+    receita = np.bincount(inverse, weights=vendas[value].to_numpy(dtype=float), minlength=count)
+
+    # Demand buckets: (key, period) matrix of the quantities, empty periods stay at zero.
+    periods = max(1, -(-days // period_days))
+    age = np.datetime64(end, 'D').astype(np.int64) - day_index(vendas['D2_EMISSAO'])
+    inside = (age >= 0) & (age < periods * period_days)
+    bucket = age[inside] // period_days
+    quantities = vendas['D2_QUANT'].to_numpy(dtype=float)[inside]
+    demand = np.bincount(inverse[inside] * periods + bucket, weights=quantities,
+                         minlength=count * periods).reshape(count, periods)
+    mean = demand.mean(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cv = np.where(mean > 0, demand.std(axis=1) / mean, np.inf)
+
+    # Cumulative revenue share inside each branch, largest groups first.
+    branch_of_key = keys // len(groups)
+    order = np.lexsort((-receita, branch_of_key))
+    sorted_branch = branch_of_key[order]
+    sorted_revenue = receita[order]
+    cumulative = np.cumsum(sorted_revenue)
+    first = np.r_[0, np.flatnonzero(np.diff(sorted_branch)) + 1]
+    starts = np.repeat(first, np.diff(np.r_[first, count]))
+    before = cumulative - sorted_revenue - np.r_[0, cumulative][starts]
+    totals = np.bincount(sorted_branch, weights=sorted_revenue)[sorted_branch]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        share_before = np.where(totals > 0, before / totals, 1.0)
+        share = np.where(totals > 0, (before + sorted_revenue) / totals, 1.0)
+
+    abc = np.where(share_before < thresholds['a_share'], 'A', np.where(share_before < thresholds['b_share'], 'B', 'C'))
+    abc = np.where(sorted_revenue > 0, abc, 'C')
+    sorted_cv = cv[order]
+    xyz = np.where(sorted_cv <= thresholds['x_cv'], 'X', np.where(sorted_cv <= thresholds['y_cv'], 'Y', 'Z'))
+
+    result = pd.DataFrame({
+        'B1_ZGRUPO': np.asarray(groups, dtype=object)[keys[order] % len(groups)],
+        'RECEITA': sorted_revenue,
+        'PARTICIPACAO_ACUM': share,
+        'CLASSE_ABC': abc,
+        'CV_DEMANDA': np.where(np.isinf(sorted_cv), np.nan, sorted_cv),
+        'CLASSE_XYZ': xyz,
+    })
+    result['CLASSE'] = result['CLASSE_ABC'] + result['CLASSE_XYZ']
+    if by_branch:
+        result.insert(0, 'FILIAL', np.asarray(branches, dtype=object)[sorted_branch])
+    return result
@@ -0,0 +1,153 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+import pandas as pd
+from database_functions.db_connect import config
+from database_functions.result_transport import ResultHandle, publish_result, open_result
+
+# Get a logger
+logger = logging.getLogger(__name__)
+
+
+def _run_task(func, args):
+    # Runs in the worker process: map the inputs, compute, publish the result.
+    args = [open_result(arg, keep=True) if isinstance(arg, ResultHandle) else arg for arg in args]
+    result = func(*args)
+    if isinstance(result, pd.DataFrame):
+        return publish_result(result)
+    return result
+
+
+class ComputeExecutor:
+    """
+    Runs CPU-heavy pandas functions in a pool of worker processes.
+
+    pandas code holds the GIL, so running it in a DownloadThread still freezes
+    the Qt event loop. The functions submitted here run in other processes;
+    DataFrames go both ways through result_transport (memory-mapped Arrow files)
+    instead of being pickled. Small inputs are computed in the calling thread,
+    where starting a task would cost more than it saves.
+    """
+
+    def __init__(self, workers=2, timeout=300, min_rows=50000):
+        """
+        Parameters:
+        - workers (int): Worker processes. 0 computes everything in the calling thread.
+        - timeout (float): Default seconds a task may run before its worker is stopped.
+        - min_rows (int): Inputs with fewer DataFrame rows in total are computed in the calling thread.
+        """
+        self.workers = workers
+        self.timeout = timeout
+        self.min_rows = min_rows
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                # 'spawn' everywhere: forking a process that runs Qt and database threads is unsafe.
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+    def _stop_pool(self):
+        # A task that timed out keeps its worker busy; stop the workers and start over on the next task.
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is None:
+            return
+        for process in list((executor._processes or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, func, *args, timeout=None):
+        """
+        Compute func(*args) in a worker process and wait for the result.
+
+        Parameters:
+        - func (callable): Module-level function, so the workers can import it.
+        - args: Arguments of the function; DataFrames are sent memory-mapped.
+        - timeout (float, optional): Seconds to wait. Defaults to the executor timeout.
+
+        Returns:
+        - The result of the function, or None if it failed or timed out.
+        """
+        rows = sum(len(arg) for arg in args if isinstance(arg, pd.DataFrame))
+        if self.workers == 0 or rows < self.min_rows:
+            try:
+                return func(*args)
+            except Exception as e:
+                logger.error(f"An error occurred while computing {func.__name__}: {e}")
+                return None
+
+        handles = [publish_result(arg) if isinstance(arg, pd.DataFrame) else arg for arg in args]
+        try:
+            future = self._pool().submit(_run_task, func, handles)
+            result = future.result(timeout=timeout or self.timeout)
+        except FuturesTimeout:
+            logger.error(f"{func.__name__} did not finish in {timeout or self.timeout}s, stopping the workers")
+            self._stop_pool()
+            return None
+        except BrokenProcessPool as e:
+            logger.error(f"A compute worker died while running {func.__name__}: {e}")
+            self._stop_pool()
+            return None
+        except Exception as e:
+            logger.error(f"An error occurred while computing {func.__name__}: {e}")
+            return None
+        finally:
+            for handle in handles:
+                if isinstance(handle, ResultHandle):
+                    handle.release()
+
+        if isinstance(result, ResultHandle):
+            return open_result(result)
+        return result
+
+    def shutdown(self):
+        """
+        Stop the worker processes.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+_compute_executor = None
+
+
+def get_compute_executor():
+    """
+    Return the compute executor of this process, configured in the [compute] section of db_config.ini.
+
+    Settings: 'workers' (default 2, 0 to compute inline), 'timeout_seconds' (default 300)
+    and 'min_rows' (default 50000).
+    """
+    global _compute_executor
+    if _compute_executor is None:
+        _compute_executor = ComputeExecutor(
+            workers=config.getint('compute', 'workers', fallback=min(2, os.cpu_count() or 1)),
+            timeout=config.getfloat('compute', 'timeout_seconds', fallback=300),
+            min_rows=config.getint('compute', 'min_rows', fallback=50000),
+        )
+    return _compute_executor
+
+
+def set_compute_executor(executor):
+    """
+    Replace the compute executor of this process, e.g. with ComputeExecutor(workers=0) in processes
+    that are already workers of a pool.
+    """
+    global _compute_executor
+    _compute_executor = executor
+
+
+def run_compute(func, *args, timeout=None):
+    """
+    Shortcut for get_compute_executor().run(func, *args, timeout=timeout).
+    """
+    return get_compute_executor().run(func, *args, timeout=timeout)
@@ -0,0 +1,183 @@
+import datetime
+import logging
+import numpy as np
+import pandas as pd
+from main_functions.compute import run_compute
+from main_functions.relatorios import faturamento_report, saldo_report
+
+# Get a logger
+logger = logging.getLogger(__name__)
+
+# Dimensions and measures of the sales cube.
+DIMENSIONS = ('FILIAL', 'B1_GRUPO', 'B1_ZGRUPO', 'MES')
+MEASURES = ('QUANTIDADE', 'RECEITA', 'MARGEM', 'VALOR_ESTOQUE')
+
+# Results with fewer possible cells than this are reduced with one bincount over the dense
+# key space; larger ones first compact the keys with np.unique.
+DENSE_CELLS = 1_000_000
+
+
+def month_labels(values):
+    """
+    Month (YYYYMM) of Protheus dates, given as YYYYMMDD strings or as datetimes.
+    """
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.dt.strftime('%Y%m').to_numpy()
+    return values.astype(str).str.strip().str[:6].to_numpy()
+
+
+class SalesCube:
+    """
+    In-memory cube of sales, margin and stock value by branch, B1_GRUPO, B1_ZGRUPO and month.
+
+    Each dimension is stored as an integer code array plus the sorted array of
+    its labels, each measure as a float array, one entry per cell of the base
+    grain (the combinations that have data). Roll-ups and slices reduce these
+    arrays with NumPy, so a new pivot never goes back to the database.
+    """
+
+    def __init__(self, codes, labels, measures):
+        """
+        Parameters:
+        - codes (dict): Dimension -> int array with the label position of each cell.
+        - labels (dict): Dimension -> array of labels.
+        - measures (dict): Measure -> float array with the value of each cell.
+        """
+        self.codes = codes
+        self.labels = labels
+        self.measures = measures
+
+    def __len__(self):
+        return len(self.measures[MEASURES[0]])
+
+    @classmethod
+    def from_frames(cls, vendas, estoque, stock_month=None):
+        """
+        Build the cube, pre-aggregated at the base grain.
+
+        D2_MARGEM is the margin percentage of the line, so the cube keeps the
+        margin value (VFB * D2_MARGEM / 100) and the percentage of any slice is
+        recomputed from the sums. Stock is a position, not a flow: its value
+        is placed in the month the stock was read.
+
+        Parameters:
+        - vendas (pd.DataFrame): Lines of the faturamento report with a FILIAL column.
+        - estoque (pd.DataFrame): Lines of the saldo_analitico report.
+        - stock_month (str, optional): Month of the stock, YYYYMM. Defaults to the current month.
+
+        Returns:
+        - SalesCube: The cube.
+        """
+        stock_month = stock_month or datetime.date.today().strftime('%Y%m')
+        dimensions = {
+            'FILIAL': [vendas['FILIAL'], estoque['B2_FILIAL']],
+            'B1_GRUPO': [vendas['B1_GRUPO'], estoque['B1_GRUPO']],
+            'B1_ZGRUPO': [vendas['B1_ZGRUPO'], estoque['B1_ZGRUPO']],
+            'MES': [month_labels(vendas['D2_EMISSAO']), np.full(len(estoque), stock_month, dtype=object)],
+        }
+        codes, labels = {}, {}
+        for dimension, parts in dimensions.items():
+            values = pd.Series(np.concatenate([np.asarray(part, dtype=object) for part in parts]))
+            values = values.fillna('').astype(str).str.strip()
+            codes[dimension], labels[dimension] = pd.factorize(values, sort=True)
+            labels[dimension] = np.asarray(labels[dimension], dtype=object)
+
+        sales, stock = len(vendas), len(estoque)
+        receita = vendas['VFB'].to_numpy(dtype=float)
+        measures = {
+            'QUANTIDADE': np.concatenate([vendas['D2_QUANT'].to_numpy(dtype=float), np.zeros(stock)]),
+            'RECEITA': np.concatenate([receita, np.zeros(stock)]),
+            'MARGEM': np.concatenate([receita * vendas['D2_MARGEM'].to_numpy(dtype=float) / 100, np.zeros(stock)]),
+            'VALOR_ESTOQUE': np.concatenate([np.zeros(sales), estoque['B2_VATU1'].to_numpy(dtype=float)]),
+        }
+        for name in MEASURES:
+            measures[name] = np.nan_to_num(measures[name])
+
+        # Collapse the lines into one cell per combination of the dimensions.
+        shape = tuple(len(labels[dimension]) for dimension in DIMENSIONS)
+        keys = np.ravel_multi_index(tuple(codes[dimension] for dimension in DIMENSIONS), shape)
+        cells, inverse = np.unique(keys, return_inverse=True)
+        base_codes = dict(zip(DIMENSIONS, np.unravel_index(cells, shape)))
+        base_measures = {name: np.bincount(inverse, weights=values, minlength=len(cells))
+                         for name, values in measures.items()}
+        return cls(base_codes, labels, base_measures)
+
+    def _mask(self, where):
+        # Cells inside the slice: every dimension of 'where' must hold one of its values.
+        mask = np.ones(len(self), dtype=bool)
+        for dimension, values in (where or {}).items():
+            if isinstance(values, str) or not np.iterable(values):
+                values = [values]
+            wanted = np.flatnonzero(np.isin(self.labels[dimension], list(values)))
+            mask &= np.isin(self.codes[dimension], wanted)
+        return mask
+
+    def query(self, by=(), where=None):
+        """
+        Roll the cube up to some dimensions, optionally inside a slice.
+
+        Parameters:
+        - by (tuple): Dimensions kept in the result, e.g. ('FILIAL', 'MES'). Empty for the totals.
+        - where (dict, optional): Dimension -> label or list of labels, e.g. {'B1_GRUPO': ['010', '020']}.
+
+        Returns:
+        - pd.DataFrame: One row per combination with data: the dimensions of 'by', the measures
+          and MARGEM_PCT (margin over revenue, in percent).
+        """
+        by = list(by)
+        mask = self._mask(where)
+        shape = tuple(len(self.labels[dimension]) for dimension in by)
+        if by:
+            keys = np.ravel_multi_index(tuple(self.codes[dimension][mask] for dimension in by), shape)
+        else:
+            keys = np.zeros(int(mask.sum()), dtype=np.int64)
+
+        cells = int(np.prod(shape)) if by else 1
+        if cells <= DENSE_CELLS:
+            present = np.flatnonzero(np.bincount(keys, minlength=cells))
+            inverse = np.searchsorted(present, keys)
+        else:
+            present, inverse = np.unique(keys, return_inverse=True)
+
+        result = {}
+        if by:
+            for dimension, positions in zip(by, np.unravel_index(present, shape)):
+                result[dimension] = self.labels[dimension][positions]
+        for name in MEASURES:
+            result[name] = np.bincount(inverse, weights=self.measures[name][mask], minlength=len(present))
+        data_frame = pd.DataFrame(result)
+        data_frame['MARGEM_PCT'] = data_frame['MARGEM'] / data_frame['RECEITA'].where(data_frame['RECEITA'] != 0) * 100
+        return data_frame
+
+
+def build_cube(vendas, estoque):
+    """
+    Build a SalesCube; module-level so it can run in the compute pool.
+    """
+    return SalesCube.from_frames(vendas, estoque)
+
+
+def sales_cube(days, filiais):
+    """
+    Download the sales and stock of some branches and build the sales cube.
+
+    Parameters:
+    - days (int): Period of the sales, in days.
+    - filiais (list): Branch codes.
+
+    Returns:
+    - SalesCube: The cube, or None if a download failed.
+    """
+    vendas, estoque = [], []
+    for filial in filiais:
+        faturamento = faturamento_report(days, filial)
+        saldo = saldo_report(filial)
+        if faturamento is None or saldo is None:
+            return None
+        vendas.append(faturamento.assign(FILIAL=filial))
+        estoque.append(saldo)
+    cube = run_compute(build_cube, pd.concat(vendas, ignore_index=True), pd.concat(estoque, ignore_index=True))
+    if cube is not None:
+        logger.info(f"sales cube built: {len(cube)} cells for {len(filiais)} branches")
+    return cube
@@ -0,0 +1,448 @@
+import argparse
+import datetime
+import json
+import logging
+import os
+import threading
+import uuid
+import numpy as np
+import pandas as pd
+from database_functions.admission import admission
+from database_functions.db_connect import app_path, config
+from database_functions.funcoes_base import run_on_target
+from database_functions.queries import historico_pedidos
+from main_functions.series import day_index
+
+# Get a logger
+logger = logging.getLogger(__name__)
+
+# Lead times are counted in whole days up to this value; longer ones fall in the last bin.
+MAX_LEAD_DAYS = 365
+BINS = MAX_LEAD_DAYS + 1
+
+# Dimensions of the statistics and the columns of their keys (the branch comes first).
+DIMENSIONS = {'FORNECEDOR': ('C7_FORNECE', 'C7_LOJA'), 'GRUPO': ('B1_ZGRUPO',)}
+
+# Orders are read from this day on the first run.
+FIRST_DAY = '20000101'
+
+_state_lock = threading.Lock()
+
+
+class LeadTimeStats:
+    """
+    Mergeable lead-time and fill-rate counters, one row per key.
+
+    Each key keeps the closed order lines, the quantities ordered and received,
+    the lines received in full and a histogram of the lead time in days. The
+    histogram is sparse, only the (key, days) pairs seen are stored, and the
+    memory depends on the keys and their distinct lead times, never on the
+    number of order lines, so the statistics of the whole SC7010 history can be
+    built chunk by chunk.
+    """
+
+    COUNTERS = ('LINHAS', 'QUANT_PEDIDA', 'QUANT_RECEBIDA', 'LINHAS_COMPLETAS')
+
+    # Cells added since the last compaction of the histogram, at least.
+    PENDING_CELLS = 65536
+
+    def __init__(self):
+        self.index = {}
+        self._counts = np.zeros((0, len(self.COUNTERS)))
+        # Histogram cells (row * BINS + days), sorted and unique, and the lines of each.
+        self._cells = np.zeros(0, dtype=np.int64)
+        self._lines = np.zeros(0, dtype=np.int64)
+        self._pending = []
+        self._pending_size = 0
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def keys(self):
+        return np.array(list(self.index), dtype=object)
+
+    @property
+    def counts(self):
+        return self._counts[:len(self.index)]
+
+    def _rows(self, keys):
+        # Row of each key, adding the keys seen for the first time.
+        unique, inverse = np.unique(np.asarray(keys, dtype=object), return_inverse=True)
+        new = [key for key in unique if key not in self.index]
+        if new:
+            for key in new:
+                self.index[key] = len(self.index)
+            if len(self.index) > len(self._counts):
+                # Grow geometrically, so adding keys chunk by chunk copies the counters O(log n) times.
+                counts = np.zeros((max(len(self.index), 2 * len(self._counts), 64), len(self.COUNTERS)))
+                counts[:len(self._counts)] = self._counts
+                self._counts = counts
+        return np.array([self.index[key] for key in unique], dtype=np.int64)[inverse]
+
+    def _add_cells(self, cells, lines):
+        # Queue histogram cells; they are summed once the queue outgrows the histogram.
+        self._pending.append((cells, lines))
+        self._pending_size += len(cells)
+        if self._pending_size > max(len(self._cells), self.PENDING_CELLS):
+            self._compact()
+
+    def _compact(self):
+        if not self._pending:
+            return
+        cells = np.concatenate([self._cells, *(cells for cells, _ in self._pending)])
+        lines = np.concatenate([self._lines, *(lines for _, lines in self._pending)])
+        self._cells, inverse = np.unique(cells, return_inverse=True)
+        self._lines = np.bincount(inverse.ravel(), weights=lines, minlength=len(self._cells)).astype(np.int64)
+        self._pending = []
+        self._pending_size = 0
+
+    def histogram(self):
+        """
+        The lead-time histogram as three arrays, sorted by row and days: row, days and lines of each cell.
+        """
+        self._compact()
+        return self._cells // BINS, self._cells % BINS, self._lines
+
+    def add(self, keys, lead, ordered, received):
+        """
+        Count closed order lines.
+
+        Parameters:
+        - keys (np.ndarray): Key of each line.
+        - lead (np.ndarray): Lead time of each line, in days.
+        - ordered, received (np.ndarray): C7_QUANT and C7_QUJE of each line.
+        """
+        if not len(keys):
+            return
+        rows = self._rows(keys)
+        size = len(self.index)
+        values = (np.ones(len(rows)), ordered, received, (received >= ordered).astype(float))
+        for column, weights in enumerate(values):
+            self._counts[:size, column] += np.bincount(rows, weights=weights, minlength=size)
+        bins = np.clip(np.asarray(lead, dtype=np.int64), 0, MAX_LEAD_DAYS)
+        self._add_cells(rows * BINS + bins, np.ones(len(rows), dtype=np.int64))
+
+    def merge(self, other, keys=None):
+        """
+        Add the counters of another LeadTimeStats, optionally under other keys (several may share one).
+        """
+        if not len(other):
+            return
+        rows = self._rows(other.keys if keys is None else keys)
+        np.add.at(self._counts, rows, other.counts)
+        other_rows, days, lines = other.histogram()
+        self._add_cells(rows[other_rows] * BINS + days, lines)
+
+    def subset(self, mask):
+        """
+        New LeadTimeStats with the keys selected by a boolean mask over self.keys.
+        """
+        rows = np.flatnonzero(mask)
+        stats = LeadTimeStats()
+        stats.index = {key: position for position, key in enumerate(self.keys[rows])}
+        stats._counts = self.counts[rows]
+        position = np.full(len(self.index), -1, dtype=np.int64)
+        position[rows] = np.arange(len(rows))
+        cell_rows, days, lines = self.histogram()
+        kept = position[cell_rows] >= 0
+        # The rows keep their order, so the cells stay sorted.
+        stats._cells = position[cell_rows[kept]] * BINS + days[kept]
+        stats._lines = lines[kept]
+        return stats
+
+    def to_frame(self):
+        """
+        The statistics per key.
+
+        Returns:
+        - pd.DataFrame: Indexed by CHAVE: LINHAS, QUANT_PEDIDA, QUANT_RECEBIDA, LINHAS_COMPLETAS,
+          TAXA_ATENDIMENTO (received over ordered), TAXA_COMPLETAS (share of lines received in
+          full), PRAZO_MEDIO, PRAZO_P50 and PRAZO_P90 (days).
+        """
+        size = len(self.index)
+        rows, days, lines = self.histogram()
+        frame = pd.DataFrame(self.counts, columns=self.COUNTERS, index=pd.Index(self.keys, name='CHAVE'))
+        total = np.bincount(rows, weights=lines, minlength=size)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            frame['TAXA_ATENDIMENTO'] = np.clip(frame['QUANT_RECEBIDA'] / frame['QUANT_PEDIDA'], 0, 1)
+            frame['TAXA_COMPLETAS'] = frame['LINHAS_COMPLETAS'] / frame['LINHAS']
+            frame['PRAZO_MEDIO'] = np.bincount(rows, weights=lines * days, minlength=size) / total
+        # Lines of each row up to each of its cells.
+        cumulative = np.cumsum(lines) - (np.cumsum(total) - total)[rows]
+        for name, share in (('PRAZO_P50', 0.5), ('PRAZO_P90', 0.9)):
+            reached = cumulative >= np.ceil(share * total)[rows]
+            first_rows, first = np.unique(rows[reached], return_index=True)
+            percentile = np.full(size, np.nan)
+            percentile[first_rows] = days[reached][first]
+            frame[name] = percentile
+        return frame
+
+    def to_dict(self):
+        """
+        JSON-friendly copy: key -> [counters..., [[days, lines], ...]], the histogram kept sparse.
+        """
+        rows, days, lines = self.histogram()
+        bounds = np.searchsorted(rows, np.arange(len(self.index) + 1))
+        result = {}
+        for row, (key, counts) in enumerate(zip(self.index, self.counts)):
+            cells = slice(bounds[row], bounds[row + 1])
+            result[key] = [*counts.tolist(), np.column_stack([days[cells], lines[cells]]).tolist()]
+        return result
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Rebuild the statistics saved by to_dict.
+        """
+        stats = cls()
+        stats._rows(list(data))
+        cells, lines = [], []
+        for key, values in data.items():
+            row = stats.index[key]
+            stats._counts[row] = values[:len(cls.COUNTERS)]
+            for day, count in values[len(cls.COUNTERS)]:
+                cells.append(row * BINS + day)
+                lines.append(count)
+        stats._add_cells(np.array(cells, dtype=np.int64), np.array(lines, dtype=np.int64))
+        return stats
+
+
+def _keys(chunk, columns):
+    # Key of each line: the branch and the columns of the dimension, separated by '|'.
+    key = chunk['C7_FILIAL']
+    for column in columns:
+        key = key + '|' + chunk[column]
+    return key.to_numpy(dtype=object)
+
+
+def update_statistics(chunks, state, today=None, max_open_days=365):
+    """
+    Fold chunks of historico_pedidos into the saved statistics.
+
+    Lines issued before state['watermark'] were all closed and counted by an
+    earlier run ('settled'). Lines open for more than 'max_open_days' days do
+    not hold the watermark back, so the closed lines issued before the month of
+    that cutoff go straight into settled. The later ones are counted per month
+    of issue; at the end, the months before the oldest line still open become
+    settled and the watermark moves to that month, so the next run only reads
+    orders that may still change. Only the months after the cutoff are ever
+    kept apart, however old the watermark is.
+
+    A line is closed when it was received in full (C7_QUJE >= C7_QUANT) or its
+    remainder was eliminated (C7_RESIDUO = 'S'). SC7010 has no receipt date, so
+    the lead time of a closed line is its promised one, C7_DATPRF - C7_EMISSAO.
+
+    Parameters:
+    - chunks (iterable): DataFrames with the columns of historico_pedidos, C7_EMISSAO >= watermark.
+    - state (dict): Saved state, see load_state.
+    - today (datetime.date, optional): Defaults to today.
+    - max_open_days (int): Age after which open lines are ignored.
+
+    Returns:
+    - tuple: (new state, statistics) where statistics maps each dimension to the LeadTimeStats
+      of all closed lines, settled and recent.
+    """
+    today = today or datetime.date.today()
+    cutoff = (today - datetime.timedelta(days=max_open_days)).strftime('%Y%m%d')
+    settled = {dimension: LeadTimeStats.from_dict(state[dimension]) for dimension in DIMENSIONS}
+    recent = {dimension: LeadTimeStats() for dimension in DIMENSIONS}
+    names = dict(state['names'])
+    oldest_open = today.strftime('%Y%m01')
+
+    for chunk in chunks:
+        chunk = chunk.copy()
+        for column in ('C7_FILIAL', 'C7_FORNECE', 'C7_LOJA', 'A2_NOME', 'B1_ZGRUPO', 'C7_RESIDUO'):
+            chunk[column] = chunk[column].fillna('').astype(str).str.strip()
+        for column in ('C7_EMISSAO', 'C7_DATPRF'):
+            chunk[column] = chunk[column].astype(str).str.strip()
+        ordered = chunk['C7_QUANT'].to_numpy(dtype=float)
+        received = chunk['C7_QUJE'].fillna(0).to_numpy(dtype=float)
+        issued = day_index(chunk['C7_EMISSAO'])
+        promised = day_index(chunk['C7_DATPRF'])
+        closed = (received >= ordered) | (chunk['C7_RESIDUO'] == 'S').to_numpy()
+
+        still_open = chunk['C7_EMISSAO'][~closed & (chunk['C7_EMISSAO'] >= cutoff).to_numpy()]
+        if len(still_open):
+            oldest_open = min(oldest_open, still_open.min()[:6] + '01')
+
+        counted = closed & (issued >= 0) & (promised >= 0)
+        # The watermark never goes back before the month of the cutoff, so older lines are final.
+        final = counted & (chunk['C7_EMISSAO'].str[:6] < cutoff[:6]).to_numpy()
+        later = counted & ~final
+        lead = promised - issued
+        month = chunk['C7_EMISSAO'][later].str[:6] + '|'
+        for dimension, columns in DIMENSIONS.items():
+            settled[dimension].add(_keys(chunk[final], columns), lead[final], ordered[final], received[final])
+            recent[dimension].add(month.to_numpy(dtype=object) + _keys(chunk[later], columns), lead[later],
+                                  ordered[later], received[later])
+        lines = chunk[counted]
+        suppliers = _keys(lines, DIMENSIONS['FORNECEDOR'])
+        names.update(zip(suppliers, lines['A2_NOME']))
+
+    watermark = max(state['watermark'], oldest_open)
+    statistics = {}
+    for dimension in DIMENSIONS:
+        keys = recent[dimension].keys
+        months = np.array([key[:6] for key in keys], dtype=object)
+        stripped = np.array([key[7:] for key in keys], dtype=object)
+        old = months < watermark[:6]
+        settled[dimension].merge(recent[dimension].subset(old), stripped[old])
+        statistics[dimension] = LeadTimeStats()
+        statistics[dimension].merge(settled[dimension])
+        statistics[dimension].merge(recent[dimension].subset(~old), stripped[~old])
+
+    new_state = {'watermark': watermark, 'names': names,
+                 **{dimension: settled[dimension].to_dict() for dimension in DIMENSIONS}}
+    return new_state, statistics
+
+
+def state_path():
+    """
+    File of the saved statistics: 'path' in the [fornecedores] section, or fornecedores.json next to the app.
+    """
+    return config.get('fornecedores', 'path', fallback=os.path.join(app_path, 'fornecedores.json'))
+
+
+def load_state(path):
+    """
+    Read the saved statistics, or an empty state that reads the orders from FIRST_DAY.
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.error(f"An error occurred while reading the supplier statistics, rebuilding them: {e}")
+    return {'watermark': FIRST_DAY, 'names': {}, **{dimension: {} for dimension in DIMENSIONS}}
+
+
+def save_state(path, state):
+    """
+    Write the statistics through a temporary file, so a crash never leaves half of them.
+
+    The temporary file has a name of its own, so two processes refreshing at
+    once never write into the same file; the last one to finish wins.
+    """
+    temporary = f"{path}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def statistics_frames(state):
+    """
+    The statistics of all closed lines saved by refresh_statistics, or None before its first run.
+
+    Returns:
+    - dict: Dimension -> pd.DataFrame of LeadTimeStats.to_frame, with the supplier names in A2_NOME.
+    """
+    if 'statistics' not in state:
+        return None
+    frames = {dimension: LeadTimeStats.from_dict(state['statistics'][dimension]).to_frame()
+              for dimension in DIMENSIONS}
+    frames['FORNECEDOR']['A2_NOME'] = frames['FORNECEDOR'].index.map(state['names'])
+    return frames
+
+
+def refresh_statistics():
+    """
+    Read the orders issued since the watermark in chunks and update the saved statistics.
+
+    Runs once per batch, nightly from the command line (see main) or before the
+    workers of batch_runner start; the reports only read what it saved. The
+    orders are read from the 'reporting' target, as a bulk job, in chunks of
+    [fornecedores] chunk_size rows (5000), so memory stays constant however long
+    the history is.
+
+    Returns:
+    - dict: The frames of statistics_frames.
+    """
+    chunk_size = config.getint('fornecedores', 'chunk_size', fallback=5000)
+    max_open_days = config.getint('fornecedores', 'max_aberto_dias', fallback=365)
+    path = state_path()
+    with _state_lock:
+        state = load_state(path)
+
+        def read_from(engine):
+            with admission.slot('bulk'):
+                chunks = pd.read_sql(historico_pedidos, engine, params=(state['watermark'],), chunksize=chunk_size)
+                return update_statistics(chunks, state, max_open_days=max_open_days)
+
+        state, statistics = run_on_target('reporting', read_from)
+        state['statistics'] = {dimension: stats.to_dict() for dimension, stats in statistics.items()}
+        save_state(path, state)
+    return statistics_frames(state)
+
+
+def saved_statistics():
+    """
+    The frames of statistics_frames from the saved state, or None (logged) if it was never refreshed.
+    """
+    frames = statistics_frames(load_state(state_path()))
+    if frames is None:
+        logger.error("The supplier statistics were never computed, run 'python -m main_functions.fornecedores'")
+    return frames
+
+
+def _branch_frame(frame, filial, columns):
+    # Rows of one branch, with the key split back into its columns.
+    frame = frame[frame.index.str.startswith(filial + '|')].reset_index()
+    parts = frame.pop('CHAVE').str.split('|', expand=True)
+    for position, column in enumerate(columns):
+        frame.insert(position, column, parts[position + 1] if len(frame) else [])
+    return frame.sort_values('LINHAS', ascending=False, ignore_index=True)
+
+
+def fornecedores_report(filial):
+    """
+    Lead time and fill rate of the suppliers of a branch, over the closed order lines of the last refresh.
+
+    Parameters:
+    - filial (str): Branch code.
+
+    Returns:
+    - pd.DataFrame: C7_FORNECE, C7_LOJA, A2_NOME and the columns of LeadTimeStats.to_frame,
+      or None if the statistics were never computed.
+    """
+    frames = saved_statistics()
+    if frames is None:
+        return None
+    frame = _branch_frame(frames['FORNECEDOR'], filial, DIMENSIONS['FORNECEDOR'])
+    return frame[['C7_FORNECE', 'C7_LOJA', 'A2_NOME', *frame.columns[2:].drop('A2_NOME')]]
+
+
+def prazos_grupos_report(filial):
+    """
+    Lead time and fill rate per product group of a branch, e.g. for the purchase suggestion.
+
+    Parameters:
+    - filial (str): Branch code.
+
+    Returns:
+    - pd.DataFrame: B1_ZGRUPO and the columns of LeadTimeStats.to_frame, or None if the
+      statistics were never computed.
+    """
+    frames = saved_statistics()
+    if frames is None:
+        return None
+    return _branch_frame(frames['GRUPO'], filial, DIMENSIONS['GRUPO'])
+
+
+def main():
+    """
+    Command line entry point: update the supplier statistics, e.g. nightly from cron.
+    """
+    argparse.ArgumentParser(description="Update the supplier lead time and fill rate statistics.").parse_args()
+    frames = refresh_statistics()
+    for dimension, frame in frames.items():
+        print(f"{dimension}: {len(frame)} keys, {int(frame['LINHAS'].sum())} closed lines")
+
+
+if __name__ == "__main__":
+    main()
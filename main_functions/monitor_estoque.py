@@ -0,0 +1,98 @@
+import logging
+import threading
+import pandas as pd
+from database_functions.db_connect import config
+from database_functions.funcoes_base import download
+from database_functions.queries import estoque_monitor, estoque_alterado
+
+# Get a logger
+logger = logging.getLogger(__name__)
+
+
+def monitor_interval_seconds():
+    """
+    Seconds between two polls of the live stock mode ('interval_seconds' in [monitor], default 15).
+    """
+    return config.getfloat('monitor', 'interval_seconds', fallback=15)
+
+
+def _stamp_param(stamp):
+    # pyodbc takes datetime objects, not pandas Timestamps.
+    return stamp.to_pydatetime() if isinstance(stamp, pd.Timestamp) else stamp
+
+
+class StockMonitor:
+    """
+    In-memory stock matrix (code x branch) kept up to date by delta polling SB2010.
+
+    'load' reads the stock once; each 'poll' only reads the rows whose
+    S_T_A_M_P_ is not older than the newest one seen, so a refresh costs in
+    proportion to the changes. Rows are read again from the newest timestamp
+    inclusive, because several rows can share it; values that did not change
+    are ignored.
+    """
+
+    def __init__(self):
+        self.matrix = None
+        self.last_stamp = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """
+        Read the stock of every product and branch.
+
+        Returns:
+        - bool: True if the stock was loaded.
+        """
+        estoque = download(estoque_monitor)
+        if estoque is None:
+            return False
+        estoque = estoque.assign(COD_KEY=estoque['B2_COD'].str.strip().str.upper())
+        with self._lock:
+            self.matrix = estoque.pivot_table(index='COD_KEY', columns='B2_FILIAL', values='B2_QATU', aggfunc='sum')
+            self.last_stamp = estoque['S_T_A_M_P_'].max() if not estoque.empty else None
+        logger.info(f"stock monitor loaded {len(estoque)} rows")
+        return True
+
+    def poll(self, token=None):
+        """
+        Read the rows changed since the last poll and apply them to the matrix.
+
+        Parameters:
+        - token (CancellationToken, optional): Token used to cancel the query.
+
+        Returns:
+        - list: (code, branch, old quantity, new quantity) of each cell that changed, or None if the poll failed.
+        """
+        if self.matrix is None and not self.load():
+            return None
+        if self.last_stamp is None:
+            return []
+
+        changed_rows = download(estoque_alterado, (_stamp_param(self.last_stamp),), token=token)
+        if changed_rows is None:
+            return None
+
+        changes = []
+        with self._lock:
+            for row in changed_rows.itertuples(index=False):
+                code = row.B2_COD.strip().upper()
+                deleted = row.D_E_L_E_T_ == '*'
+                quantity = 0.0 if deleted else float(row.B2_QATU)
+                old = self.matrix.at[code, row.B2_FILIAL] if (code in self.matrix.index and
+                                                             row.B2_FILIAL in self.matrix.columns) else None
+                if old is None or pd.isna(old):
+                    old = None
+                    if deleted:
+                        # Deleted before it was ever seen.
+                        continue
+                elif float(old) == quantity:
+                    continue
+                self.matrix.loc[code, row.B2_FILIAL] = quantity
+                changes.append((code, row.B2_FILIAL, None if old is None else float(old), quantity))
+            if not changed_rows.empty:
+                self.last_stamp = max(self.last_stamp, changed_rows['S_T_A_M_P_'].max())
+
+        if changes:
+            logger.info(f"stock monitor: {len(changes)} cells changed")
+        return changes
@@ -0,0 +1,213 @@
+import datetime
+import itertools
+import logging
+import numpy as np
+import pandas as pd
+from database_functions.db_connect import config
+from database_functions.funcoes_base import download
+from database_functions.queries import historico_faturamento
+from main_functions.compute import run_compute
+from main_functions.series import bucket_series
+
+# Get a logger
+logger = logging.getLogger(__name__)
+
+# Smoothing parameters tried for every group: (alpha, beta, gamma). Every combination of a
+# model is fitted to all groups at once and each group keeps the one with the smallest error.
+PARAMETER_GRIDS = {
+    'SES': [(alpha, 0.0, 0.0) for alpha in (0.05, 0.1, 0.2, 0.3, 0.5, 0.7, 0.9)],
+    'HOLT': list(itertools.product((0.1, 0.3, 0.5, 0.8), (0.01, 0.05, 0.1, 0.3), (0.0,))),
+    'SAZONAL': list(itertools.product((0.1, 0.3, 0.6), (0.01, 0.1), (0.05, 0.2, 0.5))),
+}
+
+# Rows fitted together; bounds the memory of the (parameters x groups x season) arrays.
+CHUNK_ROWS = 5000
+
+# Two-sided normal quantiles of the supported interval levels.
+Z_SCORES = {0.8: 1.2816, 0.9: 1.6449, 0.95: 1.9600, 0.99: 2.5758}
+
+
+def _fit(values, grid, trend, season, score_from):
+    # Run one smoothing model over every (parameter, group) pair at once.
+    # values: (groups, periods). Returns the squared one-step errors from period 'score_from' on
+    # and the final states, shaped (parameters, groups, ...).
+    groups, periods = values.shape
+    alpha, beta, gamma = (np.array(column, dtype=float)[:, None] for column in zip(*grid))
+    shape = (len(grid), groups)
+    m = season or 1
+
+    if season:
+        first = values[:, :m].mean(axis=1)
+        level = np.broadcast_to(first, shape).copy()
+        slope = np.broadcast_to((values[:, m:2 * m].mean(axis=1) - first) / m, shape).copy()
+        seasonal = np.broadcast_to((values[:, :m] - first[:, None]), shape + (m,)).copy()
+        start = m
+    else:
+        level = np.broadcast_to(values[:, 0], shape).copy()
+        slope = np.broadcast_to(values[:, 1] - values[:, 0] if trend else np.zeros(groups), shape).copy()
+        seasonal = np.zeros(shape + (1,))
+        start = 1
+
+    sse = np.zeros(shape)
+    for t in range(start, periods):
+        position = t % m
+        observed = values[:, t]
+        error = observed - (level + slope + seasonal[:, :, position])
+        if t >= score_from:
+            sse += error ** 2
+        new_level = alpha * (observed - seasonal[:, :, position]) + (1 - alpha) * (level + slope)
+        if trend:
+            slope = beta * (new_level - level) + (1 - beta) * slope
+        if season:
+            seasonal[:, :, position] = gamma * (observed - new_level) + (1 - gamma) * seasonal[:, :, position]
+        level = new_level
+    return sse, level, slope, seasonal
+
+
+def _forecast_chunk(values, horizon, season, z):
+    # Fit every model to a block of groups and keep, per group, the model with the lowest AIC.
+    groups, periods = values.shape
+    models = ['SES']
+    if periods >= 3:
+        models.append('HOLT')
+    if season and periods >= 2 * season + 2:
+        models.append('SAZONAL')
+
+    # Every model is scored on the same periods, after the first season when it is fitted.
+    score_from = season if 'SAZONAL' in models else 1
+    fitted = periods - score_from
+    best = {'aic': np.full(groups, np.inf)}
+    for model in models:
+        grid = PARAMETER_GRIDS[model]
+        trend, model_season = model != 'SES', season if model == 'SAZONAL' else 0
+        sse, level, slope, seasonal = _fit(values, grid, trend, model_season, score_from)
+        choice = sse.argmin(axis=0)
+        columns = np.arange(groups)
+        sse = sse[choice, columns]
+        # Parameters: the smoothing constants plus the initial states.
+        k = {'SES': 2, 'HOLT': 4, 'SAZONAL': 4 + season}[model]
+        aic = fitted * np.log(sse / fitted + 1e-12) + 2 * k
+        better = aic < best['aic']
+        parameters = np.array(grid)[choice]
+        steps = np.arange(1, horizon + 1)
+        seasonal_part = np.zeros((groups, horizon))
+        if model_season:
+            seasonal_part = seasonal[choice, columns][:, (periods + steps - 1) % season]
+        forecast = level[choice, columns][:, None] + steps * slope[choice, columns][:, None] + seasonal_part
+
+        # Variance of the h-step error of the additive models: sigma^2 * (1 + sum of c_j^2).
+        alpha, beta, gamma = (parameters[:, index][:, None] for index in range(3))
+        lags = np.arange(1, horizon)
+        c = alpha + lags * alpha * beta
+        if model_season:
+            c = c + gamma * (lags % season == 0)
+        spread = np.sqrt(1 + np.concatenate([np.zeros((groups, 1)), np.cumsum(c ** 2, axis=1)], axis=1))
+        sigma = np.sqrt(sse / fitted)[:, None]
+
+        candidate = {'aic': aic, 'forecast': forecast, 'half_width': z * sigma * spread, 'model': model,
+                     'alpha': alpha[:, 0], 'beta': beta[:, 0], 'gamma': gamma[:, 0]}
+        for key, value in candidate.items():
+            if key == 'model':
+                best.setdefault(key, np.full(groups, model, dtype=object))[better] = model
+            elif key != 'aic':
+                best.setdefault(key, np.zeros_like(value))[better] = value[better]
+        best['aic'] = np.where(better, aic, best['aic'])
+    return best
+
+
+def forecast_matrix(values, horizon=3, season=12, level=0.95):
+    """
+    Forecast every row of a series matrix with exponential smoothing, all rows at once.
+
+    Simple exponential smoothing, Holt's linear trend and additive Holt-Winters
+    (when there are at least two seasons of history) are fitted as matrix
+    operations over all groups and all parameter combinations of
+    PARAMETER_GRIDS. Each group keeps the parameters with the smallest
+    one-step error of each model and the model with the smallest AIC.
+
+    Parameters:
+    - values (np.ndarray): Matrix (groups x periods), oldest period first, e.g. SeriesMatrix.values.
+    - horizon (int): Periods to forecast.
+    - season (int): Periods per season, 0 to skip the seasonal model.
+    - level (float): Coverage of the prediction intervals, one of Z_SCORES.
+
+    Returns:
+    - dict: 'forecast', 'lower' and 'upper' (groups x horizon, never below zero), and per
+      group 'model', 'alpha', 'beta' and 'gamma'.
+    """
+    values = np.asarray(values, dtype=float)
+    groups, periods = values.shape
+    z = Z_SCORES[level]
+    if periods < 2:
+        raise ValueError("At least two periods of history are needed to forecast")
+
+    parts = [_forecast_chunk(values[start:start + CHUNK_ROWS], horizon, season, z)
+             for start in range(0, groups, CHUNK_ROWS)]
+    if not parts:
+        empty = np.zeros((0, horizon))
+        return {'forecast': empty, 'lower': empty, 'upper': empty, 'model': np.array([], dtype=object),
+                'alpha': np.zeros(0), 'beta': np.zeros(0), 'gamma': np.zeros(0)}
+    joined = {key: np.concatenate([part[key] for part in parts]) for key in parts[0] if key != 'aic'}
+    forecast = joined.pop('forecast')
+    half_width = joined.pop('half_width')
+    return {
+        'forecast': np.clip(forecast, 0, None),
+        'lower': np.clip(forecast - half_width, 0, None),
+        'upper': np.clip(forecast + half_width, 0, None),
+        **joined,
+    }
+
+
+def calcular_previsao(historico, inicio, fim, horizonte=3, level=0.95):
+    """
+    Forecast the monthly sales of every product group.
+
+    Parameters:
+    - historico (pd.DataFrame): Result of historico_faturamento.
+    - inicio, fim (str): First and last day of the history (YYYYMMDD), whole months.
+    - horizonte (int): Months to forecast.
+    - level (float): Coverage of the prediction intervals.
+
+    Returns:
+    - pd.DataFrame: One row per B1_ZGRUPO and month with PREVISAO, LIMITE_INFERIOR,
+      LIMITE_SUPERIOR and the MODELO chosen for the group.
+    """
+    series = bucket_series(historico['B1_ZGRUPO'], historico['D2_EMISSAO'], historico['D2_QUANT'], 'M', inicio, fim)
+    result = forecast_matrix(series.values, horizonte, level=level)
+    months = pd.date_range(pd.Timestamp(series.dates[-1]) + pd.DateOffset(months=1), periods=horizonte, freq='MS')
+    groups = len(series.groups)
+    return pd.DataFrame({
+        'B1_ZGRUPO': np.repeat(series.groups, horizonte),
+        'MES': np.tile(months, groups),
+        'PREVISAO': result['forecast'].ravel(),
+        'LIMITE_INFERIOR': result['lower'].ravel(),
+        'LIMITE_SUPERIOR': result['upper'].ravel(),
+        'MODELO': np.repeat(result['model'], horizonte),
+    })
+
+
+def previsao_demanda(filial, horizonte=None):
+    """
+    Forecast of the monthly sales of the product groups of a branch (Previsão de Demanda).
+
+    The history covers the last whole months ([previsao] historico_meses, 24 by
+    default); the current month is left out since it is still open.
+
+    Parameters:
+    - filial (str): Branch code.
+    - horizonte (int, optional): Months to forecast. Defaults to [previsao] horizonte, 3.
+
+    Returns:
+    - pd.DataFrame: The result of calcular_previsao, or None if the download failed.
+    """
+    meses = config.getint('previsao', 'historico_meses', fallback=24)
+    horizonte = horizonte or config.getint('previsao', 'horizonte', fallback=3)
+    first_of_month = datetime.date.today().replace(day=1)
+    fim = (first_of_month - datetime.timedelta(days=1)).strftime('%Y%m%d')
+    inicio = (pd.Timestamp(first_of_month) - pd.DateOffset(months=meses)).strftime('%Y%m%d')
+
+    historico = download(historico_faturamento, (filial, inicio))
+    if historico is None:
+        logger.error(f"Demand forecast of {filial} aborted, missing data")
+        return None
+    return run_compute(calcular_previsao, historico, inicio, fim, horizonte)
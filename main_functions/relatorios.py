@@ -0,0 +1,258 @@
+import datetime
+import logging
+import pandas as pd
+from database_functions.funcoes_base import download, download_local
+from database_functions.local_store import local_store_enabled
+from database_functions.mart import mart_enabled, download_mart
+from database_functions.service_client import service_enabled, get_service_client
+from database_functions.queries import (saldo_analitico, pedidos, pedidos_local, faturamento, report_query,
+                                        precos_compra, saldo_analitico_mart, faturamento_mart,
+                                        report_query_mart, precos_compra_mart)
+from main_functions.classificacao import classification_thresholds, classify_abc_xyz
+from main_functions.compute import run_compute
+from main_functions.fornecedores import fornecedores_report, prazos_grupos_report, refresh_statistics
+from main_functions.previsao import previsao_demanda
+from main_functions.simulacao import estoque_seguranca
+from main_functions.transferencias import transferencias_report
+from main_functions.sugestao_compra import sugestao_compra
+
+# Get a logger
+logger = logging.getLogger(__name__)
+
+
+def start_date(days):
+    """
+    Date 'days' days ago in the Protheus format (YYYYMMDD).
+    """
+    return (datetime.date.today() - datetime.timedelta(days=days)).strftime('%Y%m%d')
+
+
+def from_mart(query, params):
+    """
+    Run a report query on the mart when it is enabled (see mart.py).
+
+    Returns:
+    - pd.DataFrame: The result, or None if the mart is disabled or failed, in which
+      case the report runs on the ERP.
+    """
+    if not mart_enabled():
+        return None
+    return download_mart(query, params)
+
+
+def saldo_report(filial):
+    """
+    Stock balance of every product of a branch (Saldo Analítico).
+
+    Parameters:
+    - filial (str): Branch code, e.g. '0101'.
+
+    Returns:
+    - pd.DataFrame: The report, or None if the download failed.
+    """
+    data_frame = from_mart(saldo_analitico_mart, {'filial': filial})
+    if data_frame is not None:
+        return data_frame
+    return download(saldo_analitico, (filial, filial))
+
+
+def pedidos_report(days, filial):
+    """
+    Purchase order lines issued in the last days (Pedidos).
+
+    With the local store enabled, only the order lines that changed since the
+    last report are downloaded (see local_store.py).
+
+    Parameters:
+    - days (int): Period of the report, in days.
+    - filial (str): Branch code.
+
+    Returns:
+    - pd.DataFrame: The report, or None if the download failed.
+    """
+    if local_store_enabled():
+        data_frame = download_local(pedidos_local, (start_date(days), filial))
+        if data_frame is not None:
+            for column in ('EMI', 'ENT'):
+                data_frame[column] = pd.to_datetime(data_frame[column], format='%Y%m%d', errors='coerce')
+        return data_frame
+    return download(pedidos, (start_date(days), filial))
+
+
+def faturamento_report(days, filial):
+    """
+    Sales lines invoiced in the last days (Faturamento).
+
+    Parameters:
+    - days (int): Period of the report, in days.
+    - filial (str): Branch code.
+
+    Returns:
+    - pd.DataFrame: The report, or None if the download failed.
+    """
+    data_frame = from_mart(faturamento_mart, {'filial': filial, 'inicio': start_date(days)})
+    if data_frame is not None:
+        return data_frame
+    return download(faturamento, (start_date(days), filial))
+
+
+# Columns of precos_compra added to the inventory analysis.
+PRICE_COLUMNS = ['PRECO_MEDIO_COMPRA', 'PRECO_MEDIO_PONDERADO', 'ULTIMO_PRECO', 'PRECO_MINIMO', 'PRECO_MAXIMO',
+                 'PEDIDOS_COMPRA']
+
+
+def precos_report(days, filial):
+    """
+    Purchase prices per product group in the last days (see queries.precos_compra).
+
+    The server aggregates the order lines, so one row per group is transferred.
+    The mart or the local store answer the query when enabled.
+
+    Parameters:
+    - days (int): Period, in days.
+    - filial (str): Branch code.
+
+    Returns:
+    - pd.DataFrame: Prices and number of orders per B1_ZGRUPO, or None if the download failed.
+    """
+    data_frame = from_mart(precos_compra_mart, {'filial': filial, 'inicio': start_date(days)})
+    if data_frame is None and local_store_enabled():
+        data_frame = download_local(precos_compra, (start_date(days), filial))
+    if data_frame is None:
+        data_frame = download(precos_compra, (start_date(days), filial))
+    return data_frame
+
+
+def vendas_report(days, filial):
+    """
+    Sales lines of the last days with their product group (see queries.report_query).
+
+    Parameters:
+    - days (int): Period, in days.
+    - filial (str): Branch code.
+
+    Returns:
+    - pd.DataFrame: The sales lines, or None if the download failed.
+    """
+    data_frame = from_mart(report_query_mart, {'filial': filial, 'inicio': start_date(days)})
+    if data_frame is None:
+        data_frame = download(report_query(days, filial), name='report_query')
+    return data_frame
+
+
+def classificacao_report(days, filial):
+    """
+    ABC/XYZ classification of the product groups of a branch (see classificacao.py).
+
+    Parameters:
+    - days (int): Period of the sales analysed, in days.
+    - filial (str): Branch code.
+
+    Returns:
+    - pd.DataFrame: One row per B1_ZGRUPO, or None if the download failed.
+    """
+    vendas = vendas_report(days, filial)
+    if vendas is None:
+        return None
+    return run_compute(classify_abc_xyz, vendas.assign(FILIAL=filial), days, classification_thresholds())
+
+
+def analise_inventario(days, filial):
+    """
+    Inventory analysis per product group (Análise de Inventário).
+
+    Parameters:
+    - days (int): Period of the analysis, in days.
+    - filial (str): Branch code.
+
+    Returns:
+    - pd.DataFrame: One row per B1_ZGRUPO, or None if a download failed.
+    """
+    vendas = vendas_report(days, filial)
+    precos = precos_report(days, filial)
+    saldo = saldo_report(filial)
+    if vendas is None or precos is None or saldo is None:
+        return None
+    return run_compute(calcular_analise_inventario, vendas, precos, saldo, days, classification_thresholds())
+
+
+def calcular_analise_inventario(vendas, precos, saldo, days, thresholds=None):
+    """
+    Aggregate sales, purchase prices and stock per product group.
+
+    MEDIA_MENSAL is the quantity sold in the period over its length in 30-day
+    months (days / 30) and COBERTURA_MESES the stock over MEDIA_MENSAL, empty
+    for groups that did not sell.
+
+    Parameters:
+    - vendas (pd.DataFrame): Result of report_query.
+    - precos (pd.DataFrame): Result of precos_report, one row per B1_ZGRUPO.
+    - saldo (pd.DataFrame): Result of saldo_analitico.
+    - days (int): Period covered by the sales, in days.
+    - thresholds (dict, optional): Thresholds of the ABC/XYZ classification. Defaults to
+      those of classify_abc_xyz.
+
+    Returns:
+    - pd.DataFrame: Quantity and value sold, monthly average, purchase prices, stock,
+      months of coverage and ABC/XYZ class per B1_ZGRUPO.
+    """
+    analise = vendas.groupby('B1_ZGRUPO').agg(
+        B1_DESC=('B1_DESC', 'first'),
+        QTD_VENDIDA=('D2_QUANT', 'sum'),
+        VALOR_VENDIDO=('D2_TOTAL', 'sum'),
+    )
+    analise['MEDIA_MENSAL'] = analise['QTD_VENDIDA'] / (days / 30)
+    analise = analise.join(precos.set_index('B1_ZGRUPO')[PRICE_COLUMNS])
+    analise['ESTOQUE'] = saldo.groupby('B1_ZGRUPO')['B2_QATU'].sum()
+    analise['ESTOQUE'] = analise['ESTOQUE'].fillna(0)
+    analise['COBERTURA_MESES'] = analise['ESTOQUE'] / analise['MEDIA_MENSAL'].where(analise['MEDIA_MENSAL'] > 0)
+    classes = classify_abc_xyz(vendas, days, thresholds).set_index('B1_ZGRUPO')
+    analise = analise.join(classes[['CLASSE_ABC', 'CLASSE_XYZ']])
+    return analise.reset_index().sort_values('VALOR_VENDIDO', ascending=False)
+
+
+# Reports available outside the GUI: name -> (function, whether it takes a period in days).
+# Functions are called as function(filial) or function(days, filial).
+REPORTS = {
+    'saldo_analitico': (saldo_report, False),
+    'pedidos': (pedidos_report, True),
+    'faturamento': (faturamento_report, True),
+    'analise_inventario': (analise_inventario, True),
+    'classificacao_abc': (classificacao_report, True),
+    'sugestao_compra': (sugestao_compra, False),
+    'previsao_demanda': (previsao_demanda, False),
+    'estoque_seguranca': (estoque_seguranca, False),
+    'transferencias': (transferencias_report, True),
+    'fornecedores': (fornecedores_report, False),
+    'prazos_grupos': (prazos_grupos_report, False),
+}
+
+# Steps some reports need before they run, e.g. refreshing the statistics they read. A batch runs each
+# step once, before its workers start, for the reports of its manifest.
+PREPARE = {
+    'fornecedores': refresh_statistics,
+    'prazos_grupos': refresh_statistics,
+}
+
+
+def run_report(name, filial, days=None):
+    """
+    Run a report of the REPORTS catalog.
+
+    Parameters:
+    - name (str): Report name.
+    - filial (str): Branch code.
+    - days (int, optional): Period in days, for the reports that take one.
+
+    Returns:
+    - pd.DataFrame: The report, or None if it failed.
+    """
+    if name not in REPORTS:
+        logger.error(f"Unknown report: {name}")
+        raise ValueError(f"Unknown report: {name}")
+    if service_enabled():
+        return get_service_client().report(name, filial, days)
+    function, takes_period = REPORTS[name]
+    if takes_period:
+        return function(days, filial)
+    return function(filial)
@@ -0,0 +1,268 @@
+import logging
+import numpy as np
+import pandas as pd
+
+# Get a logger
+logger = logging.getLogger(__name__)
+
+# Bucket sizes of bucket_index: day, week (starting on Monday) and calendar month.
+FREQUENCIES = ('D', 'W', 'M')
+
+# Cells of the (groups x buckets x window) arrays built at once by rolling_median_mad.
+WINDOW_CELLS = 4_000_000
+
+# Scale factors that make the MAD and the mean absolute deviation estimate a standard deviation.
+MAD_SCALE = 1.4826
+MEAN_AD_SCALE = 1.2533
+
+
+def day_index(values):
+    """
+    Encode dates as days since 1970-01-01.
+
+    Parameters:
+    - values: Protheus dates (YYYYMMDD strings) or datetimes.
+
+    Returns:
+    - np.ndarray: int32 day indices; missing or invalid dates become -1.
+    """
+    dates = pd.to_datetime(pd.Series(values), format='%Y%m%d', errors='coerce')
+    days = dates.to_numpy(dtype='datetime64[D]').astype(np.int64)
+    days[dates.isna().to_numpy()] = -1
+    return days.astype(np.int32)
+
+
+def bucket_index(days, freq='M'):
+    """
+    Bucket of each day index: the day itself, its week or its month since 1970.
+
+    Parameters:
+    - days (np.ndarray): Day indices from day_index.
+    - freq (str): 'D', 'W' or 'M'.
+
+    Returns:
+    - np.ndarray: int64 bucket indices.
+    """
+    days = np.asarray(days, dtype=np.int64)
+    if freq == 'D':
+        return days
+    if freq == 'W':
+        # 1970-01-01 was a Thursday: shifting by 3 days starts the weeks on Monday.
+        return (days + 3) // 7
+    if freq == 'M':
+        return days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    raise ValueError(f"Unknown frequency: {freq}")
+
+
+def bucket_start(buckets, freq='M'):
+    """
+    First day of each bucket, as datetime64[D].
+    """
+    buckets = np.asarray(buckets, dtype=np.int64)
+    if freq == 'D':
+        return buckets.astype('datetime64[D]')
+    if freq == 'W':
+        return (buckets * 7 - 3).astype('datetime64[D]')
+    if freq == 'M':
+        return buckets.astype('datetime64[M]').astype('datetime64[D]')
+    raise ValueError(f"Unknown frequency: {freq}")
+
+
+class SeriesMatrix:
+    """
+    Dense group x bucket matrix of a measure, e.g. the quantity sold per B1_ZGRUPO and month.
+
+    Row i holds the series of groups[i]; column j the bucket first + j, so
+    buckets without sales are present as zeros.
+    """
+
+    def __init__(self, groups, values, first, freq='M'):
+        """
+        Parameters:
+        - groups (np.ndarray): Label of each row.
+        - values (np.ndarray): Matrix of shape (groups, buckets).
+        - first (int): Bucket index of the first column.
+        - freq (str): Bucket size, see bucket_index.
+        """
+        self.groups = groups
+        self.values = values
+        self.first = first
+        self.freq = freq
+
+    @property
+    def dates(self):
+        """
+        First day of the bucket of each column.
+        """
+        return bucket_start(np.arange(self.first, self.first + self.values.shape[1]), self.freq)
+
+    def to_frame(self):
+        """
+        The matrix as a DataFrame indexed by group, with one column per bucket start date.
+        """
+        return pd.DataFrame(self.values, index=pd.Index(self.groups, name='GRUPO'),
+                            columns=pd.DatetimeIndex(self.dates))
+
+
+def bucket_series(groups, dates, values, freq='M', start=None, end=None):
+    """
+    Aggregate dated values into a dense group x bucket matrix with one bincount.
+
+    Parameters:
+    - groups: Group of each line, e.g. the B1_ZGRUPO column.
+    - dates: Date of each line (YYYYMMDD strings or datetimes).
+    - values: Value of each line, e.g. D2_QUANT.
+    - freq (str): 'D', 'W' or 'M'.
+    - start, end (optional): First and last date covered (date, datetime or YYYYMMDD).
+      Default to the first and last date of the lines; lines outside are ignored.
+
+    Returns:
+    - SeriesMatrix: The sums per group and bucket.
+    """
+    codes, labels = pd.factorize(pd.Series(groups).fillna(''), sort=True)
+    days = day_index(dates)
+    valid = days >= 0
+    buckets = bucket_index(days, freq)
+    present = buckets[valid]
+    first = bucket_index(day_index([start]), freq)[0] if start is not None else (present.min() if len(present) else 0)
+    last = bucket_index(day_index([end]), freq)[0] if end is not None else (present.max() if len(present) else -1)
+    periods = max(0, int(last - first + 1))
+
+    keep = valid & (buckets >= first) & (buckets <= last)
+    cells = codes[keep].astype(np.int64) * periods + (buckets[keep] - first)
+    weights = np.asarray(values, dtype=float)[keep]
+    matrix = np.bincount(cells, weights=weights, minlength=len(labels) * periods).reshape(len(labels), periods)
+    return SeriesMatrix(np.asarray(labels, dtype=object), matrix, int(first), freq)
+
+
+def rolling_sum(matrix, window):
+    """
+    Trailing sums over 'window' columns of every row, from one cumulative sum.
+
+    Returns:
+    - np.ndarray: Same shape as matrix; column j sums columns j - window + 1 to j.
+    """
+    cumulative = np.cumsum(matrix, axis=1)
+    result = cumulative.copy()
+    result[:, window:] -= cumulative[:, :-window]
+    return result
+
+
+def rolling_median_mad(matrix, window):
+    """
+    Centered rolling median and median absolute deviation of every row, from strided windows.
+
+    The rows are mirrored at both ends so every column has a full window.
+    sliding_window_view gives the (rows x columns x window) view without
+    copying; rows are processed in blocks of WINDOW_CELLS cells.
+
+    Parameters:
+    - matrix (np.ndarray): Matrix (groups x buckets).
+    - window (int): Odd number of buckets per window, at most the number of columns.
+
+    Returns:
+    - tuple: (median, mad, loo_mean_ad), each shaped like matrix. loo_mean_ad is the mean absolute
+      deviation from the median of the other buckets of the window, leaving the center one out.
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    rows, columns = matrix.shape
+    half = window // 2
+    median, mad, loo_mean_ad = (np.zeros(matrix.shape) for _ in range(3))
+    step = max(1, WINDOW_CELLS // max(1, columns * window))
+    for start in range(0, rows, step):
+        block = matrix[start:start + step]
+        padded = np.pad(block, ((0, 0), (half, half)), mode='reflect')
+        windows = np.lib.stride_tricks.sliding_window_view(padded, window, axis=1)
+        block_median = np.median(windows, axis=2)
+        deviation = np.abs(windows - block_median[:, :, None])
+        median[start:start + step] = block_median
+        mad[start:start + step] = np.median(deviation, axis=2)
+        center = np.abs(block - block_median)
+        loo_mean_ad[start:start + step] = (deviation.sum(axis=2) - center) / max(1, window - 1)
+    return median, mad, loo_mean_ad
+
+
+def cap_outliers(matrix, window=9, threshold=3.5):
+    """
+    Cap the buckets far above the rolling median of their row, for all rows at once.
+
+    A bucket is an outlier when it exceeds median + threshold * scale, where the
+    scale is 1.4826 * MAD. Intermittent rows have a MAD of zero (most buckets
+    are empty), so they use 1.2533 times the mean absolute deviation of the other
+    buckets of the window instead. Buckets whose window has no spread at all are
+    left alone, and only the high side is capped: empty buckets are normal.
+
+    Parameters:
+    - matrix (np.ndarray): Matrix (groups x buckets), e.g. SeriesMatrix.values.
+    - window (int): Buckets per window; even values are rounded down to odd, and it is
+      shortened to the number of buckets. Fewer than three buckets are never capped.
+    - threshold (float): Number of scales above the median at which a bucket is capped.
+
+    Returns:
+    - tuple: (capped, adjusted, limit): the capped matrix, the boolean matrix of the capped
+      buckets and the limit of every bucket.
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    window = min(window, matrix.shape[1])
+    window -= 1 - window % 2
+    if window < 3:
+        return matrix.copy(), np.zeros(matrix.shape, dtype=bool), np.full(matrix.shape, np.inf)
+    median, mad, loo_mean_ad = rolling_median_mad(matrix, window)
+    scale = np.where(mad > 0, MAD_SCALE * mad, MEAN_AD_SCALE * loo_mean_ad)
+    limit = np.where(scale > 0, median + threshold * scale, np.inf)
+    adjusted = matrix > limit
+    return np.where(adjusted, limit, matrix), adjusted, limit
+
+
+class RollingWindow:
+    """
+    Trailing window of daily values for every group, updated one day at a time.
+
+    The last 'window' days are kept in a circular buffer next to the running
+    sum of each group. Adding a day replaces the oldest column and adjusts the
+    sums, which costs O(groups) instead of re-aggregating the history. The sums
+    are recomputed from the buffer once per full turn so rounding never builds up.
+    """
+
+    def __init__(self, history, window):
+        """
+        Parameters:
+        - history (np.ndarray): Daily matrix (groups x days), oldest day first, e.g.
+          bucket_series(..., freq='D').values. Fewer days than the window are padded with zeros.
+        - window (int): Days in the window.
+        """
+        history = np.asarray(history, dtype=float)
+        self.window = window
+        self.buffer = np.zeros((history.shape[0], window))
+        recent = history[:, -window:]
+        if recent.shape[1]:
+            self.buffer[:, -recent.shape[1]:] = recent
+        self.position = 0
+        self.pushed = 0
+        self.total = self.buffer.sum(axis=1)
+
+    def push(self, day_values):
+        """
+        Add the values of a new day, one per group, dropping the oldest day.
+        """
+        day_values = np.asarray(day_values, dtype=float)
+        self.total += day_values - self.buffer[:, self.position]
+        self.buffer[:, self.position] = day_values
+        self.position = (self.position + 1) % self.window
+        self.pushed += 1
+        if self.pushed % self.window == 0:
+            self.total = self.buffer.sum(axis=1)
+
+    def add_groups(self, count):
+        """
+        Append 'count' groups without history, for groups that sold for the first time.
+        """
+        self.buffer = np.vstack([self.buffer, np.zeros((count, self.window))])
+        self.total = np.concatenate([self.total, np.zeros(count)])
+
+    @property
+    def mean(self):
+        """
+        Daily average of each group over the window.
+        """
+        return self.total / self.window
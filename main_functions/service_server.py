@@ -0,0 +1,190 @@
+import json
+import logging
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from database_functions.admission import admission
+from database_functions.service_client import frame_to_payload, use_direct_backend
+from main_functions.busca_produtos import search_function, batch_search_function, stock_by_branch, parse_codes
+from main_functions.relatorios import REPORTS, run_report
+from main_functions.warm_up import warm_up, hot_data_refresh_interval
+
+# Get a logger
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """
+    Results shared by every client of the read service.
+
+    A result is computed once per key: concurrent requests for the same key
+    wait for the first one instead of running the same query again.
+    """
+
+    def __init__(self, ttl_seconds=60, max_entries=500):
+        """
+        Parameters:
+        - ttl_seconds (float): Seconds a result is served from the cache.
+        - max_entries (int): Results kept at most; the oldest are dropped first.
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def _fresh(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] <= self.ttl_seconds:
+            return entry[1]
+        return None
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached result of a key, computing it if missing or expired.
+
+        Parameters:
+        - key (tuple): Endpoint and arguments of the request.
+        - compute (callable): Function without arguments returning the result. None results are not cached.
+
+        Returns:
+        - The result.
+        """
+        with self._lock:
+            result = self._fresh(key)
+            if result is not None:
+                return result
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                result = self._fresh(key)
+            if result is not None:
+                return result
+            try:
+                result = compute()
+                if result is None:
+                    return None
+                with self._lock:
+                    self._entries[key] = (time.monotonic(), result)
+                    while len(self._entries) > self.max_entries:
+                        oldest = min(self._entries, key=lambda item: self._entries[item][0])
+                        del self._entries[oldest]
+                        self._key_locks.pop(oldest, None)
+                return result
+            finally:
+                # Keys that cached nothing (None result or error) must not keep their lock forever.
+                with self._lock:
+                    if key not in self._entries and self._key_locks.get(key) is key_lock:
+                        del self._key_locks[key]
+
+
+class ReadServiceHandler(BaseHTTPRequestHandler):
+    """
+    HTTP/JSON endpoints of the read service:
+
+    - GET /search?code=X: same result as search_function.
+    - POST /search with {"codes": [...]}: same result as batch_search_function.
+    - GET /stock?code=X: stock of a product in every branch and location.
+    - GET /report?name=N&filial=F&days=D: a report of the REPORTS catalog.
+    - GET /health: answers 'ok'.
+    - GET /metrics: queue times and slots in use of each admission class (see admission.py).
+
+    Only these operations are exposed; clients never send SQL.
+    """
+
+    def log_message(self, format, *args):
+        logger.info(f"{self.address_string()} - {format % args}")
+
+    def send_json(self, status, content):
+        body = json.dumps(content, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_frame(self, data_frame):
+        if data_frame is None:
+            self.send_json(503, {'error': 'Falha na consulta ao banco de dados'})
+        else:
+            self.send_json(200, frame_to_payload(data_frame))
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        args = {key: values[0] for key, values in urllib.parse.parse_qs(url.query).items()}
+        cache = self.server.cache
+        try:
+            if url.path == '/health':
+                self.send_json(200, {'status': 'ok'})
+            elif url.path == '/metrics':
+                self.send_json(200, admission.metrics())
+            elif url.path == '/search' and args.get('code'):
+                code = args['code'].strip().upper()
+                self.send_frame(cache.get_or_compute(('search', code), lambda: search_function(code)))
+            elif url.path == '/stock' and args.get('code'):
+                code = args['code'].strip().upper()
+                self.send_frame(cache.get_or_compute(('stock', code), lambda: stock_by_branch(code)))
+            elif url.path == '/report' and args.get('name') in REPORTS and args.get('filial'):
+                name, filial = args['name'], args['filial']
+                days = int(args['days']) if args.get('days') else None
+                self.send_frame(cache.get_or_compute(('report', name, filial, days),
+                                                     lambda: run_report(name, filial, days)))
+            else:
+                self.send_json(404, {'error': f"Endpoint ou parâmetros inválidos: {self.path}"})
+        except ValueError as e:
+            self.send_json(400, {'error': str(e)})
+        except Exception as e:
+            logger.error(f"An error occurred while answering {self.path}: {e}")
+            self.send_json(500, {'error': str(e)})
+
+    def do_POST(self):
+        url = urllib.parse.urlsplit(self.path)
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length) or b'{}')
+            if url.path == '/search' and isinstance(body.get('codes'), list):
+                codes = parse_codes(" ".join(str(code) for code in body['codes']))
+                key = ('search_batch', tuple(sorted(codes)))
+                self.send_frame(self.server.cache.get_or_compute(key, lambda: batch_search_function(codes)))
+            else:
+                self.send_json(404, {'error': f"Endpoint ou parâmetros inválidos: {self.path}"})
+        except ValueError as e:
+            self.send_json(400, {'error': str(e)})
+        except Exception as e:
+            logger.error(f"An error occurred while answering {self.path}: {e}")
+            self.send_json(500, {'error': str(e)})
+
+
+def keep_hot_data_fresh(stop_event):
+    """
+    Load the search data into the service memory and reload it before it expires.
+
+    Parameters:
+    - stop_event (threading.Event): Set to stop the refresh loop.
+    """
+    while True:
+        warm_up()
+        if stop_event.wait(hot_data_refresh_interval().total_seconds()):
+            break
+
+
+def create_server(host='0.0.0.0', port=8765, cache_seconds=60):
+    """
+    Create the read service, one thread per request.
+
+    Parameters:
+    - host (str): Interface to listen on.
+    - port (int): TCP port.
+    - cache_seconds (float): Seconds a result is shared between clients.
+
+    Returns:
+    - ThreadingHTTPServer: The server, not yet serving.
+    """
+    # The service is the one process that talks to the database.
+    use_direct_backend()
+    server = ThreadingHTTPServer((host, port), ReadServiceHandler)
+    server.daemon_threads = True
+    server.cache = ResultCache(ttl_seconds=cache_seconds)
+    return server
@@ -0,0 +1,183 @@
+import datetime
+import logging
+import numpy as np
+import pandas as pd
+from database_functions.db_connect import config
+from database_functions.funcoes_base import download
+from database_functions.queries import historico_faturamento, prazos_compra
+from main_functions.compute import run_compute
+from main_functions.series import bucket_series, day_index
+
+# Get a logger
+logger = logging.getLogger(__name__)
+
+# Cells (groups x scenarios) simulated together; bounds the memory of a chunk to a few arrays
+# of this size, whatever the number of groups or the longest lead time.
+CHUNK_CELLS = 2_000_000
+
+# Lead time, in days, of the groups when no purchase order has a valid delivery date.
+DEFAULT_LEAD_TIME = 30
+
+
+def lead_time_days(prazos):
+    """
+    Promised lead time, in days, of each line of prazos_compra; invalid dates become -1.
+    """
+    emissao = day_index(prazos['C7_EMISSAO'])
+    entrega = day_index(prazos['C7_DATPRF'])
+    return np.where((emissao >= 0) & (entrega >= emissao), entrega - emissao, -1)
+
+
+def _lead_time_table(groups, lead_groups, lead_days):
+    # Empirical lead times of every group as one flat array plus the offset and count of each
+    # group; groups without orders draw from the lead times of all groups.
+    lead_groups = np.asarray(lead_groups, dtype=object)
+    lead_days = np.asarray(lead_days, dtype=np.int64)
+    valid = lead_days >= 0
+    lead_groups, lead_days = lead_groups[valid], lead_days[valid]
+    pooled = lead_days if len(lead_days) else np.array([DEFAULT_LEAD_TIME])
+
+    position = pd.Index(groups).get_indexer(lead_groups)
+    known = position >= 0
+    order = np.argsort(position[known], kind='stable')
+    values = lead_days[known][order]
+    counts = np.bincount(position[known], minlength=len(groups))
+    offsets = np.r_[0, np.cumsum(counts)[:-1]]
+
+    missing = counts == 0
+    offsets[missing] = len(values)
+    counts[missing] = len(pooled)
+    return np.concatenate([values, pooled]), offsets, counts
+
+
+def _simulate_chunk(daily, lead_values, offsets, counts, scenarios, rng):
+    # Demand over the lead time of 'scenarios' replenishment cycles per group: a lead time is
+    # drawn from the group's orders and every day of it gets the demand of a random past day.
+    groups, days = daily.shape
+    draws = (rng.random((groups, scenarios)) * counts[:, None]).astype(np.int64)
+    lead = lead_values[offsets[:, None] + draws]
+    rows = np.arange(groups)[:, None]
+    demand = np.zeros((groups, scenarios))
+    for day in range(int(lead.max(initial=0))):
+        sold = daily[rows, rng.integers(0, days, (groups, scenarios))]
+        demand += np.where(day < lead, sold, 0.0)
+    return demand, lead
+
+
+def simulate_reorder_points(daily, groups, lead_groups, lead_days, service_level=0.95, scenarios=2000,
+                            candidates=None, seed=None):
+    """
+    Monte Carlo estimate of the reorder point of every group for a target service level.
+
+    For each group, 'scenarios' replenishment cycles are simulated as NumPy
+    arrays: the lead time is drawn from the group's purchase orders and the
+    demand of each of its days from the group's daily sales, zero days
+    included. The reorder point is the smallest stock that covers the lead-time
+    demand in at least 'service_level' of the cycles. Groups are processed in
+    chunks of CHUNK_CELLS cells so the peak memory does not grow with their number.
+
+    Parameters:
+    - daily (np.ndarray): Daily quantities sold (groups x days), e.g. bucket_series(..., 'D').values.
+    - groups (np.ndarray): Group of each row of 'daily'.
+    - lead_groups, lead_days: Group and lead time (days, -1 when unknown) of each order line.
+    - service_level (float): Share of the cycles without shortage the reorder point must reach.
+    - scenarios (int): Cycles simulated per group.
+    - candidates (np.ndarray, optional): Reorder points to evaluate, shared (k,) or per group (groups x k).
+    - seed (int, optional): Seed of the random generator.
+
+    Returns:
+    - dict: Per group 'reorder_point', 'mean_demand' (mean lead-time demand), 'mean_lead_time',
+      'service_level' and 'expected_shortage' (mean units missing per cycle) at the reorder point
+      and, with candidates, 'candidate_service' and 'candidate_shortage' (groups x k).
+    """
+    daily = np.asarray(daily, dtype=float)
+    count = daily.shape[0]
+    rng = np.random.default_rng(seed)
+    lead_values, offsets, counts = _lead_time_table(groups, lead_groups, lead_days)
+    if candidates is not None:
+        candidates = np.broadcast_to(np.asarray(candidates, dtype=float), (count, np.shape(candidates)[-1]))
+    # Index of the order statistic that reaches the service level.
+    rank = min(scenarios - 1, max(0, int(np.ceil(service_level * scenarios)) - 1))
+
+    keys = ('reorder_point', 'mean_demand', 'mean_lead_time', 'service_level', 'expected_shortage')
+    result = {key: np.zeros(count) for key in keys}
+    if candidates is not None:
+        result['candidate_service'] = np.zeros(candidates.shape)
+        result['candidate_shortage'] = np.zeros(candidates.shape)
+
+    step = max(1, CHUNK_CELLS // scenarios)
+    for start in range(0, count, step):
+        rows = slice(start, start + step)
+        demand, lead = _simulate_chunk(daily[rows], lead_values, offsets[rows], counts[rows], scenarios, rng)
+        point = np.partition(demand, rank, axis=1)[:, rank]
+        result['reorder_point'][rows] = point
+        result['mean_demand'][rows] = demand.mean(axis=1)
+        result['mean_lead_time'][rows] = lead.mean(axis=1)
+        result['service_level'][rows] = (demand <= point[:, None]).mean(axis=1)
+        result['expected_shortage'][rows] = np.clip(demand - point[:, None], 0, None).mean(axis=1)
+        if candidates is not None:
+            # One candidate at a time keeps the chunk at (groups x scenarios) cells.
+            for column in range(candidates.shape[1]):
+                level = candidates[rows, column][:, None]
+                result['candidate_service'][rows, column] = (demand <= level).mean(axis=1)
+                result['candidate_shortage'][rows, column] = np.clip(demand - level, 0, None).mean(axis=1)
+    return result
+
+
+def calcular_estoque_seguranca(historico, prazos, inicio, fim, service_level=0.95, scenarios=2000, seed=None):
+    """
+    Reorder point and safety stock of every product group from simulated replenishment cycles.
+
+    Parameters:
+    - historico (pd.DataFrame): Result of historico_faturamento.
+    - prazos (pd.DataFrame): Result of prazos_compra.
+    - inicio, fim (str): First and last day of the sales history (YYYYMMDD).
+    - service_level (float): Target share of cycles without shortage.
+    - scenarios (int): Cycles simulated per group.
+    - seed (int, optional): Seed of the random generator.
+
+    Returns:
+    - pd.DataFrame: B1_ZGRUPO, PRAZO_MEDIO, DEMANDA_PRAZO (mean demand over the lead time),
+      PONTO_PEDIDO, ESTOQUE_SEGURANCA, NIVEL_SERVICO and FALTA_ESPERADA.
+    """
+    series = bucket_series(historico['B1_ZGRUPO'], historico['D2_EMISSAO'], historico['D2_QUANT'], 'D', inicio, fim)
+    result = simulate_reorder_points(series.values, series.groups, prazos['B1_ZGRUPO'].to_numpy(),
+                                     lead_time_days(prazos), service_level, scenarios, seed=seed)
+    estoque = pd.DataFrame({
+        'B1_ZGRUPO': series.groups,
+        'PRAZO_MEDIO': result['mean_lead_time'],
+        'DEMANDA_PRAZO': result['mean_demand'],
+        'PONTO_PEDIDO': np.ceil(result['reorder_point']),
+        'ESTOQUE_SEGURANCA': np.ceil(np.clip(result['reorder_point'] - result['mean_demand'], 0, None)),
+        'NIVEL_SERVICO': result['service_level'],
+        'FALTA_ESPERADA': result['expected_shortage'],
+    })
+    return estoque.sort_values('ESTOQUE_SEGURANCA', ascending=False, ignore_index=True)
+
+
+def estoque_seguranca(filial):
+    """
+    Safety stock per product group of a branch (Estoque de Segurança).
+
+    Reads the [simulacao] section of db_config.ini: nivel_servico (0.95),
+    cenarios (2000) and historico_dias (365), the days of sales and orders sampled.
+
+    Parameters:
+    - filial (str): Branch code.
+
+    Returns:
+    - pd.DataFrame: The result of calcular_estoque_seguranca, or None if a download failed.
+    """
+    service_level = config.getfloat('simulacao', 'nivel_servico', fallback=0.95)
+    scenarios = config.getint('simulacao', 'cenarios', fallback=2000)
+    days = config.getint('simulacao', 'historico_dias', fallback=365)
+    today = datetime.date.today()
+    inicio = (today - datetime.timedelta(days=days)).strftime('%Y%m%d')
+    fim = (today - datetime.timedelta(days=1)).strftime('%Y%m%d')
+
+    historico = download(historico_faturamento, (filial, inicio))
+    prazos = download(prazos_compra, (inicio, filial))
+    if historico is None or prazos is None:
+        logger.error(f"Safety stock of {filial} aborted, missing data")
+        return None
+    return run_compute(calcular_estoque_seguranca, historico, prazos, inicio, fim, service_level, scenarios)
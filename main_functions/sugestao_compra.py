@@ -0,0 +1,134 @@
+import datetime
+import logging
+import numpy as np
+import pandas as pd
+from database_functions.db_connect import config
+from database_functions.funcoes_base import download, download_local
+from database_functions.local_store import local_store_enabled
+from database_functions.queries import (historico_faturamento, saldo_analitico, quantidade_receber,
+                                        quantidade_receber_local)
+from main_functions.compute import run_compute
+from main_functions.series import bucket_series, cap_outliers
+
+# Get a logger
+logger = logging.getLogger(__name__)
+
+# Months of sales read from historico_faturamento.
+HISTORICO_MESES = 4
+
+# Weeks per rolling window and number of scales above the median at which a week of sales is capped.
+OUTLIER_WINDOW = 9
+OUTLIER_THRESHOLD = 3.5
+
+
+def historico_inicio(meses=HISTORICO_MESES):
+    """
+    First day of the sales history, 'meses' months before today, in the Protheus format (YYYYMMDD).
+    """
+    return (pd.Timestamp.today() - pd.DateOffset(months=meses)).strftime('%Y%m%d')
+
+
+def sugestao_compra(filial, meses_cobertura=2):
+    """
+    Build the purchase suggestion of a branch (Sugestão de Compra).
+
+    Parameters:
+    - filial (str): Branch code, e.g. '0101'.
+    - meses_cobertura (float): Months of average sales the stock should cover.
+
+    Returns:
+    - pd.DataFrame: One row per B1_ZGRUPO, or None if a download failed.
+    """
+    historico = download(historico_faturamento, (filial, historico_inicio()))
+    saldo = download(saldo_analitico, (filial, filial))
+    if local_store_enabled():
+        # Same window as quantidade_receber: orders issued in the last 59 days.
+        today = datetime.date.today()
+        receber = download_local(quantidade_receber_local, ((today - datetime.timedelta(days=59)).strftime('%Y%m%d'),
+                                                            today.strftime('%Y%m%d'), filial))
+    else:
+        receber = download(quantidade_receber, (filial,))
+    if historico is None or saldo is None or receber is None:
+        logger.error(f"Purchase suggestion of {filial} aborted, missing data")
+        return None
+    window = config.getint('sugestao', 'janela_outliers', fallback=OUTLIER_WINDOW)
+    threshold = config.getfloat('sugestao', 'limite_outliers', fallback=OUTLIER_THRESHOLD)
+    return run_compute(calcular_sugestao, historico, saldo, receber, meses_cobertura, window, threshold)
+
+
+def ajustar_outliers(historico, window=OUTLIER_WINDOW, threshold=OUTLIER_THRESHOLD):
+    """
+    Cap the weeks of abnormal sales of every product group (see series.cap_outliers).
+
+    The sales are summed per B1_ZGRUPO and week, then each week is compared with
+    the rolling median and MAD of the weeks around it. Weeks are used instead of
+    days because most groups do not sell every day, which leaves a daily window
+    without spread. All groups are handled in one pass over the matrix.
+
+    Parameters:
+    - historico (pd.DataFrame): Result of historico_faturamento.
+    - window (int): Weeks per window.
+    - threshold (float): Scales above the rolling median at which a week is capped.
+
+    Returns:
+    - tuple: (vendido, ajustes). vendido is the capped quantity sold per B1_ZGRUPO (pd.Series);
+      ajustes has one row per capped week: B1_ZGRUPO, SEMANA (Monday, YYYYMMDD), QUANTIDADE and LIMITE.
+    """
+    series = bucket_series(historico['B1_ZGRUPO'], historico['D2_EMISSAO'], historico['D2_QUANT'], 'W')
+    capped, adjusted, limit = cap_outliers(series.values, window, threshold)
+    vendido = pd.Series(capped.sum(axis=1), index=pd.Index(series.groups, name='B1_ZGRUPO'))
+    group, week = np.nonzero(adjusted)
+    ajustes = pd.DataFrame({
+        'B1_ZGRUPO': series.groups[group],
+        'SEMANA': pd.DatetimeIndex(series.dates[week]).strftime('%Y%m%d'),
+        'QUANTIDADE': series.values[group, week],
+        'LIMITE': limit[group, week],
+    })
+    if len(ajustes):
+        logger.info(f"{len(ajustes)} weeks of abnormal sales capped in {ajustes['B1_ZGRUPO'].nunique()} groups")
+    return vendido, ajustes
+
+
+def calcular_sugestao(historico, saldo, receber, meses_cobertura=2, window=OUTLIER_WINDOW,
+                      threshold=OUTLIER_THRESHOLD):
+    """
+    Compute the quantity to buy per product group from past sales.
+
+    The suggestion covers 'meses_cobertura' months of the average monthly sales,
+    minus what is in stock and what is still to be received, rounded up. Weeks
+    of abnormal sales, such as a single large one-off sale, are capped before the
+    average is taken (see ajustar_outliers). The average is the capped quantity
+    sold over the HISTORICO_MESES months read by sugestao_compra:
+
+        SUGESTAO = ceil(max(0, MEDIA_MENSAL * meses_cobertura - ESTOQUE - A_RECEBER))
+
+    Parameters:
+    - historico (pd.DataFrame): Result of historico_faturamento.
+    - saldo (pd.DataFrame): Result of saldo_analitico.
+    - receber (pd.DataFrame): Result of quantidade_receber.
+    - meses_cobertura (float): Months of average sales the stock should cover.
+    - window, threshold: Outlier window (weeks) and threshold, see ajustar_outliers.
+
+    Returns:
+    - pd.DataFrame: B1_ZGRUPO, B1_DESC, MEDIA_MENSAL, ESTOQUE, A_RECEBER, SUGESTAO and
+      AJUSTE_OUTLIERS (quantity removed from the history by the capping). attrs['ajustes'] lists
+      the capped weeks, one record per row of the ajustes of ajustar_outliers.
+    """
+    sugestao = historico.groupby('B1_ZGRUPO').agg(B1_DESC=('B1_DESC', 'first'), VENDIDO=('D2_QUANT', 'sum'))
+    vendido, ajustes = ajustar_outliers(historico, window, threshold)
+    sugestao['AJUSTE_OUTLIERS'] = sugestao['VENDIDO'] - vendido
+    sugestao['VENDIDO'] = vendido
+    sugestao['MEDIA_MENSAL'] = sugestao['VENDIDO'] / HISTORICO_MESES
+    sugestao['ESTOQUE'] = saldo.groupby('B1_ZGRUPO')['B2_QATU'].sum()
+    sugestao['A_RECEBER'] = receber.groupby('B1_ZGRUPO')['QRE'].sum()
+    sugestao[['ESTOQUE', 'A_RECEBER']] = sugestao[['ESTOQUE', 'A_RECEBER']].fillna(0)
+
+    necessidade = sugestao['MEDIA_MENSAL'] * meses_cobertura - sugestao['ESTOQUE'] - sugestao['A_RECEBER']
+    sugestao['SUGESTAO'] = np.ceil(necessidade.clip(lower=0))
+    sugestao['AJUSTE_OUTLIERS'] = sugestao.pop('AJUSTE_OUTLIERS')
+
+    sugestao = sugestao.drop(columns='VENDIDO').reset_index()
+    sugestao = sugestao.sort_values('SUGESTAO', ascending=False)
+    # Plain records, so the capped weeks survive the compute workers and the read service.
+    sugestao.attrs['ajustes'] = ajustes.to_dict('records')
+    return sugestao
@@ -0,0 +1,146 @@
+import datetime
+import logging
+import numpy as np
+import pandas as pd
+from database_functions.db_connect import config
+from database_functions.funcoes_base import download
+from database_functions.queries import estoque_filiais, historico_faturamento
+from main_functions.compute import run_compute
+
+# Get a logger
+logger = logging.getLogger(__name__)
+
+# Branches that share stock, in the order of the search table: Matriz, Cariacica, Poconé and Parauapebas.
+FILIAIS = ('0101', '0104', '0103', '0105')
+
+
+def transfer_branches():
+    """
+    Branches considered for transfers, from [transferencias] filiais in db_config.ini (comma-separated).
+    """
+    value = config.get('transferencias', 'filiais', fallback=','.join(FILIAIS))
+    return tuple(filial.strip() for filial in value.split(',') if filial.strip())
+
+
+def match_transfers(stock, rate, cover_days):
+    """
+    Move the surplus of some branches to the deficits of the others, for every product at once.
+
+    Each branch needs 'cover_days' days of its daily demand. Below that it has a
+    deficit (the projected stockout over the period), above it a surplus it can
+    give away without falling short itself. For each product the surpluses and
+    deficits are sorted from the largest and laid on two cumulative scales; a
+    transfer from source i to destination j is the overlap of their intervals.
+    The whole catalog is solved with array operations on (products x branches x
+    branches), and every product covers min(total surplus, total deficit), the
+    most stockout units transfers can avoid.
+
+    Parameters:
+    - stock (np.ndarray): Stock on hand (products x branches).
+    - rate (np.ndarray): Daily demand (products x branches).
+    - cover_days (float): Days of demand each branch keeps.
+
+    Returns:
+    - tuple: (transfers, deficit, surplus). transfers[p, i, j] is the quantity product p sends from
+      branch i to branch j; deficit and surplus are whole units (products x branches).
+    """
+    stock = np.nan_to_num(np.asarray(stock, dtype=float))
+    need = np.ceil(np.asarray(rate, dtype=float) * cover_days)
+    # Fractional stock (units sold by weight or length) is rounded so only whole units move.
+    deficit = np.ceil(np.clip(need - stock, 0, None))
+    surplus = np.floor(np.clip(stock - need, 0, None))
+    products, branches = stock.shape
+    rows = np.arange(products)[:, None]
+
+    sources = np.argsort(-surplus, axis=1, kind='stable')
+    targets = np.argsort(-deficit, axis=1, kind='stable')
+    given = np.cumsum(surplus[rows, sources], axis=1)
+    taken = np.cumsum(deficit[rows, targets], axis=1)
+    given_before = given - surplus[rows, sources]
+    taken_before = taken - deficit[rows, targets]
+
+    # Overlap of [given_before, given) of each source with [taken_before, taken) of each destination.
+    overlap = (np.minimum(given[:, :, None], taken[:, None, :]) -
+               np.maximum(given_before[:, :, None], taken_before[:, None, :]))
+    transfers = np.zeros((products, branches, branches))
+    transfers[rows[:, :, None], sources[:, :, None], targets[:, None, :]] = np.clip(overlap, 0, None)
+    return transfers, deficit, surplus
+
+
+def calcular_transferencias(estoque, vendas, filiais, days, cover_days=30):
+    """
+    Transfer suggestions between branches before any purchase.
+
+    Parameters:
+    - estoque (pd.DataFrame): Result of estoque_filiais (B2_COD, B2_FILIAL, B2_QATU).
+    - vendas (pd.DataFrame): historico_faturamento lines of the branches with a FILIAL column.
+    - filiais (tuple): Branches that share stock.
+    - days (int): Days of sales the daily demand is computed from.
+    - cover_days (float): Days of demand each branch keeps.
+
+    Returns:
+    - pd.DataFrame: One row per transfer: COD, FILIAL_ORIGEM, FILIAL_DESTINO, QUANTIDADE,
+      SALDO_ORIGEM, SALDO_DESTINO, DEMANDA_DIARIA_DESTINO and FALTA_PROJETADA (the deficit
+      of the destination before the transfer), largest transfers first.
+    """
+    estoque = estoque[estoque['B2_FILIAL'].isin(filiais)]
+    vendas = vendas[vendas['FILIAL'].isin(filiais)]
+    codes = pd.Series(np.concatenate([estoque['B2_COD'].to_numpy(dtype=object),
+                                      vendas['D2_COD'].to_numpy(dtype=object)])).astype(str).str.strip()
+    codes, labels = pd.factorize(codes, sort=True)
+    branch_index = pd.Index(filiais)
+    shape = (len(labels), len(filiais))
+
+    def matrix(code_positions, branch_values, weights):
+        cells = code_positions * len(filiais) + branch_index.get_indexer(branch_values)
+        return np.bincount(cells, weights=weights, minlength=shape[0] * shape[1]).reshape(shape)
+
+    stock = matrix(codes[:len(estoque)], estoque['B2_FILIAL'], estoque['B2_QATU'].to_numpy(dtype=float))
+    rate = matrix(codes[len(estoque):], vendas['FILIAL'], vendas['D2_QUANT'].to_numpy(dtype=float)) / days
+    transfers, deficit, _ = match_transfers(stock, rate, cover_days)
+
+    product, origem, destino = np.nonzero(transfers)
+    result = pd.DataFrame({
+        'COD': np.asarray(labels, dtype=object)[product],
+        'FILIAL_ORIGEM': np.asarray(filiais, dtype=object)[origem],
+        'FILIAL_DESTINO': np.asarray(filiais, dtype=object)[destino],
+        'QUANTIDADE': transfers[product, origem, destino],
+        'SALDO_ORIGEM': stock[product, origem],
+        'SALDO_DESTINO': stock[product, destino],
+        'DEMANDA_DIARIA_DESTINO': rate[product, destino],
+        'FALTA_PROJETADA': deficit[product, destino],
+    })
+    return result.sort_values('QUANTIDADE', ascending=False, ignore_index=True)
+
+
+def transferencias_report(days, filial):
+    """
+    Transfers that would cover the projected stockouts of a branch with the surplus of the others.
+
+    Every branch of transfer_branches is balanced; the report keeps the transfers
+    to 'filial'. Each branch keeps [transferencias] cobertura_dias (30 by default)
+    of its average daily sales over the last 'days' days.
+
+    Parameters:
+    - days (int): Period of the sales used for the demand, in days.
+    - filial (str): Destination branch.
+
+    Returns:
+    - pd.DataFrame: The transfers to the branch, see calcular_transferencias, or None if a download failed.
+    """
+    filiais = transfer_branches()
+    cover_days = config.getfloat('transferencias', 'cobertura_dias', fallback=30)
+    inicio = (datetime.date.today() - datetime.timedelta(days=days)).strftime('%Y%m%d')
+
+    estoque = download(estoque_filiais)
+    vendas = [download(historico_faturamento, (branch, inicio)) for branch in filiais]
+    if estoque is None or any(historico is None for historico in vendas):
+        logger.error(f"Transfer suggestion of {filial} aborted, missing data")
+        return None
+    vendas = pd.concat([historico.assign(FILIAL=branch) for branch, historico in zip(filiais, vendas)],
+                       ignore_index=True)
+
+    transferencias = run_compute(calcular_transferencias, estoque, vendas, filiais, days, cover_days)
+    if transferencias is None:
+        return None
+    return transferencias[transferencias['FILIAL_DESTINO'] == filial].reset_index(drop=True)
@@ -0,0 +1,171 @@
+import datetime
+import logging
+import threading
+import pandas as pd
+from database_functions.db_connect import config
+from database_functions.funcoes_base import PRIMARY, download, get_engine, target_section
+from database_functions.service_client import service_enabled
+from database_functions.queries import produtos_master, estoque_filiais
+
+# Get a logger
+logger = logging.getLogger(__name__)
+
+# Columns returned by the search queries (query_resultado and query_resultado_cod_item).
+RESULT_COLUMNS = ['B1_ZGRUPO', 'B1_COD', 'B1_DESC', 'B2_QATU', 'B2_FILIAL', 'B1_GRUPO', 'BM_DESC']
+
+# Product master and branch stock kept in memory after the warm-up.
+_hot_data = {}
+_hot_data_lock = threading.Lock()
+
+
+def warm_up(progress=None):
+    """
+    Prepare the application for the first search.
+
+    Opens the pooled database connection, then loads the product master and the
+    branch stock into memory, so searches are answered without a round trip.
+    Nothing is loaded when the desktop uses the read service, which keeps its
+    own copy for every client.
+
+    Parameters:
+    - progress (callable, optional): Receives a short status text after each step.
+
+    Returns:
+    - bool: True if both datasets were loaded.
+    """
+    def report(message):
+        logger.info(message)
+        if progress:
+            progress(message)
+
+    if service_enabled():
+        report("Usando o serviço de dados compartilhado")
+        return False
+
+    # Pay for the driver load and the login now, not on the first search.
+    report("Conectando ao banco de dados...")
+    try:
+        engine = get_engine(target_section(PRIMARY))
+        with engine.connect():
+            pass
+    except Exception as e:
+        logger.error(f"An error occurred while opening the connection: {e}")
+        report("Sem conexão com o banco de dados")
+        return False
+
+    report("Carregando cadastro de produtos...")
+    produtos = download(produtos_master)
+    report("Carregando estoque das filiais...")
+    estoque = download(estoque_filiais)
+    if produtos is None or estoque is None:
+        report("Não foi possível carregar os dados iniciais")
+        return False
+
+    # Trimmed codes are the join key used by the search queries; upper-cased, since the
+    # SQL Server collation compares them without case.
+    produtos = produtos.assign(COD_KEY=produtos['B1_COD'].str.strip().str.upper())
+    estoque = estoque.assign(COD_KEY=estoque['B2_COD'].str.strip().str.upper())
+
+    with _hot_data_lock:
+        _hot_data['produtos'] = produtos
+        _hot_data['estoque'] = estoque
+        _hot_data['codigos'] = produtos.groupby('COD_KEY').indices
+        _hot_data['grupos'] = produtos.groupby('B1_ZGRUPO').indices
+        _hot_data['loaded'] = datetime.datetime.now()
+
+    report(f"Pronto: {len(produtos)} produtos em memória")
+    return True
+
+
+def hot_data_max_age():
+    """
+    Age up to which the data loaded by the warm-up answers searches.
+
+    Returns:
+    - timedelta: Value of 'max_age_minutes' in the [warm_up] section of db_config.ini (default 5 minutes).
+    """
+    return datetime.timedelta(minutes=config.getfloat('warm_up', 'max_age_minutes', fallback=5))
+
+
+def hot_data_refresh_interval():
+    """
+    Interval between the background refreshes of the warm-up data.
+
+    Half of the max age, so a refresh lands before the data expires even if one
+    attempt fails.
+
+    Returns:
+    - timedelta: The refresh interval.
+    """
+    return hot_data_max_age() / 2
+
+
+def _mark_hot_data(result, loaded):
+    # Label the result with the moment the data was loaded, so the interface shows its age.
+    result.attrs['source'] = 'hot_data'
+    result.attrs['snapshot_created'] = loaded
+    return result
+
+
+def search_hot_data(user_search):
+    """
+    Answer a search from the data loaded by the warm-up.
+
+    Reproduces query_busca followed by query_resultado (or query_resultado_cod_item
+    when the product has no group) over the in-memory product master and stock.
+
+    Parameters:
+    - user_search (str): The user's inputted product ID.
+
+    Returns:
+    - pd.DataFrame: The search results, with the load time in attrs['snapshot_created'], or None if the
+      warm-up data is missing or too old.
+    """
+    with _hot_data_lock:
+        if not _hot_data or datetime.datetime.now() - _hot_data['loaded'] > hot_data_max_age():
+            return None
+        produtos = _hot_data['produtos']
+        estoque = _hot_data['estoque']
+        codigos = _hot_data['codigos']
+        grupos = _hot_data['grupos']
+        loaded = _hot_data['loaded']
+
+    positions = codigos.get(user_search.strip().upper())
+    if positions is None:
+        return _mark_hot_data(pd.DataFrame(columns=RESULT_COLUMNS), loaded)
+
+    group_id = produtos.iloc[positions[0]]['B1_ZGRUPO']
+    if group_id.strip():
+        positions = grupos[group_id]
+
+    result = produtos.iloc[positions].merge(estoque[['COD_KEY', 'B2_QATU', 'B2_FILIAL']], on='COD_KEY', how='left')
+    return _mark_hot_data(result[RESULT_COLUMNS], loaded)
+
+
+def search_hot_data_batch(codes):
+    """
+    Answer a batch search from the data loaded by the warm-up.
+
+    Same result as query_resultado_lote: every product that shares the group of
+    one of the codes (or the code itself when it has no group), with its stock.
+
+    Parameters:
+    - codes (list): Product codes.
+
+    Returns:
+    - pd.DataFrame: The search results, with the load time in attrs['snapshot_created'], or None if the
+      warm-up data is missing or too old.
+    """
+    with _hot_data_lock:
+        if not _hot_data or datetime.datetime.now() - _hot_data['loaded'] > hot_data_max_age():
+            return None
+        produtos = _hot_data['produtos']
+        estoque = _hot_data['estoque']
+        loaded = _hot_data['loaded']
+
+    found = produtos[produtos['COD_KEY'].isin([code.strip().upper() for code in codes])]
+    groups = found.loc[found['B1_ZGRUPO'].str.strip() != '', 'B1_ZGRUPO'].unique()
+    selected = produtos[produtos['B1_ZGRUPO'].isin(groups) | produtos['COD_KEY'].isin(found['COD_KEY'])]
+
+    result = selected.merge(estoque[['COD_KEY', 'B2_QATU', 'B2_FILIAL']], on='COD_KEY', how='left')
+    return _mark_hot_data(result[RESULT_COLUMNS], loaded)
@@ -0,0 +1,51 @@
+import argparse
+import logging
+import threading
+from database_functions.db_connect import config
+from main_functions.service_server import create_server, keep_hot_data_fresh
+
+# Set up logging configurations.
+logging.basicConfig(
+    filename='read_service.log',
+    filemode='a',
+    format='%(asctime)s - %(threadName)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+
+
+def main():
+    """
+    Entry point for the shared read service.
+
+    Runs on one machine of the network and answers searches, stock and reports
+    for every desktop configured with 'backend = service' in the [data] section
+    of db_config.ini, so the ERP sees one connection pool and one query per
+    distinct request instead of one per desktop.
+    """
+    parser = argparse.ArgumentParser(description="Shared read service for the desktops.")
+    parser.add_argument('--host', default=config.get('service', 'host', fallback='0.0.0.0'))
+    parser.add_argument('--port', type=int, default=config.getint('service', 'port', fallback=8765))
+    parser.add_argument('--cache-seconds', type=float,
+                        default=config.getfloat('service', 'cache_seconds', fallback=60))
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port, args.cache_seconds)
+    stop_event = threading.Event()
+    threading.Thread(target=keep_hot_data_fresh, args=(stop_event,), daemon=True).start()
+    logging.info(f"Read service listening on {args.host}:{args.port}")
+    print(f"Read service listening on {args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        logging.error(f"An unexpected error occurred in the read service: {e}")
+        raise
+    finally:
+        stop_event.set()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    # If the script is executed as the main module, call the main function.
+    main()
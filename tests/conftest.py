@@ -0,0 +1,30 @@
+import datetime
+import pytest
+
+
+@pytest.fixture
+def hot_data():
+    # In-memory search data, as loaded by warm_up(), loaded three minutes ago.
+    pd = pytest.importorskip("pandas")
+    pytest.importorskip("sqlalchemy")
+    from main_functions import warm_up
+
+    produtos = pd.DataFrame({
+        'B1_ZGRUPO': ['G1', 'G1', ' '],
+        'B1_COD': ['A1 ', 'A2 ', 'B1 '],
+        'B1_DESC': ['ITEM A1', 'ITEM A2', 'ITEM B1'],
+        'B1_GRUPO': ['01', '01', '02'],
+        'BM_DESC': ['GRUPO 01', 'GRUPO 01', 'GRUPO 02'],
+    })
+    produtos['COD_KEY'] = produtos['B1_COD'].str.strip()
+    estoque = pd.DataFrame({'COD_KEY': ['A1', 'B1'], 'B2_QATU': [5.0, 2.0], 'B2_FILIAL': ['0101', '0101']})
+    loaded = datetime.datetime.now() - datetime.timedelta(minutes=3)
+    warm_up._hot_data.update({
+        'produtos': produtos,
+        'estoque': estoque,
+        'codigos': produtos.groupby('COD_KEY').indices,
+        'grupos': produtos.groupby('B1_ZGRUPO').indices,
+        'loaded': loaded,
+    })
+    yield loaded
+    warm_up._hot_data.clear()
@@ -0,0 +1,72 @@
+import threading
+import time
+
+import pytest
+
+from database_functions.admission import AdmissionController
+from database_functions.cancellation import CancellationToken, QueryCancelled
+
+
+def test_interactive_is_admitted_while_bulk_work_holds_its_slots():
+    controller = AdmissionController(interactive_slots=1, bulk_slots=1)
+    release = threading.Event()
+
+    def bulk_job():
+        with controller.slot('bulk'):
+            release.wait(5)
+
+    jobs = [threading.Thread(target=bulk_job) for _ in range(3)]
+    for job in jobs:
+        job.start()
+    time.sleep(0.1)
+
+    start = time.monotonic()
+    with controller.slot('interactive'):
+        assert time.monotonic() - start < 0.1
+    metrics = controller.metrics()
+    assert metrics['bulk']['running'] == 1
+    assert metrics['bulk']['waiting'] == 2
+
+    release.set()
+    for job in jobs:
+        job.join(5)
+    metrics = controller.metrics()
+    assert metrics['bulk']['requests'] == 3
+    assert metrics['bulk']['running'] == 0
+    assert metrics['interactive']['queue_p95'] == 0.0
+
+
+def test_freed_slot_goes_to_the_interactive_queue_first():
+    controller = AdmissionController(interactive_slots=0, bulk_slots=1)
+    order = []
+    pool = controller.acquire('bulk')
+
+    def request(priority):
+        with controller.slot(priority):
+            order.append(priority)
+
+    bulk = threading.Thread(target=request, args=('bulk',))
+    bulk.start()
+    time.sleep(0.05)
+    interactive = threading.Thread(target=request, args=('interactive',))
+    interactive.start()
+    time.sleep(0.05)
+
+    controller.release(pool)
+    bulk.join(5)
+    interactive.join(5)
+    assert order == ['interactive', 'bulk']
+
+
+def test_cancelled_request_leaves_the_queue():
+    controller = AdmissionController(interactive_slots=0, bulk_slots=1)
+    pool = controller.acquire('bulk')
+    token = CancellationToken()
+    threading.Timer(0.1, token.cancel).start()
+
+    with pytest.raises(QueryCancelled):
+        controller.acquire('bulk', token=token)
+
+    assert controller.metrics()['bulk']['waiting'] == 0
+    controller.release(pool)
+    assert controller.metrics()['bulk']['running'] == 0
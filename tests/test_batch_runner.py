@@ -0,0 +1,52 @@
+import json
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from main_functions import batch_runner
+from main_functions.batch_runner import load_manifest, prepare_reports, run_task
+
+
+def write_manifest(tmp_path, **manifest):
+    path = tmp_path / 'manifest.json'
+    path.write_text(json.dumps({'filiais': ['0101', '0103'], **manifest}), encoding='utf-8')
+    return str(path)
+
+
+def test_manifest_expands_periods_only_for_the_reports_that_take_one(tmp_path):
+    _, tasks = load_manifest(write_manifest(tmp_path, reports=['saldo_analitico', 'faturamento'], periodos=[30, 90]))
+
+    assert len(tasks) == 2 + 4
+    assert {task['days'] for task in tasks if task['report'] == 'saldo_analitico'} == {None}
+
+
+def test_manifest_without_periods_is_rejected_up_front(tmp_path):
+    with pytest.raises(ValueError, match="faturamento takes a period"):
+        load_manifest(write_manifest(tmp_path, reports=['saldo_analitico', 'faturamento']))
+    with pytest.raises(ValueError, match="Invalid 'periodos'"):
+        load_manifest(write_manifest(tmp_path, reports=['faturamento'], periodos=[30, '90']))
+    # Reports without a period do not need any.
+    assert len(load_manifest(write_manifest(tmp_path, reports=['saldo_analitico']))[1]) == 2
+
+
+def test_shared_preparation_runs_once_per_batch(monkeypatch):
+    calls = []
+
+    def refresh():
+        calls.append('refresh')
+
+    monkeypatch.setattr(batch_runner, 'PREPARE', {'fornecedores': refresh, 'prazos_grupos': refresh})
+    prepare_reports(['saldo_analitico', 'fornecedores', 'prazos_grupos'])
+    assert calls == ['refresh']
+
+
+def test_capped_weeks_go_to_a_companion_file(tmp_path, monkeypatch):
+    report = pd.DataFrame({'B1_ZGRUPO': ['G1'], 'SUGESTAO': [12.0]})
+    report.attrs['ajustes'] = [{'B1_ZGRUPO': 'G1', 'SEMANA': '20250210', 'QUANTIDADE': 400.0, 'LIMITE': 20.0}]
+    monkeypatch.setattr(batch_runner, 'run_report', lambda name, filial, days: report)
+
+    result = run_task({'report': 'sugestao_compra', 'filial': '0101', 'days': None}, str(tmp_path), 'csv')
+
+    assert result['file'] == 'sugestao_compra_0101.csv'
+    ajustes = pd.read_csv(tmp_path / 'sugestao_compra_0101_ajustes.csv', sep=';', decimal=',', dtype={'SEMANA': str})
+    assert ajustes[['B1_ZGRUPO', 'SEMANA', 'QUANTIDADE']].values.tolist() == [['G1', '20250210', 400.0]]
@@ -0,0 +1,32 @@
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("sqlalchemy")
+
+from main_functions.busca_produtos import parse_codes, batch_search_function
+
+
+def test_parse_codes_upper_cases_and_removes_duplicates():
+    assert parse_codes("a1\nA1; b1,\tc1  a1") == ['A1', 'B1', 'C1']
+
+
+def test_batch_search_is_case_insensitive(hot_data):
+    result = batch_search_function(['a1', 'b1'])
+
+    assert sorted(result['B1_COD'].str.strip().unique()) == ['A1', 'A2', 'B1']
+    assert result.attrs['not_found'] == []
+
+
+def test_batch_search_reports_codes_longer_than_b1_cod(hot_data):
+    long_code = 'X' * 31
+    result = batch_search_function(['B1', long_code])
+
+    assert result['B1_COD'].str.strip().tolist() == ['B1']
+    assert result.attrs['not_found'] == [long_code]
+
+
+def test_batch_search_with_only_invalid_codes_skips_the_query(hot_data):
+    result = batch_search_function(['Y' * 40])
+
+    assert result.empty
+    assert result.attrs['not_found'] == ['Y' * 40]
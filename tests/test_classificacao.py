@@ -0,0 +1,51 @@
+import datetime
+import pytest
+
+pd = pytest.importorskip("pandas")
+np = pytest.importorskip("numpy")
+
+from main_functions.classificacao import classify_abc_xyz
+
+END = datetime.date(2025, 6, 30)
+
+
+def sales(filial, group, revenue, quantities):
+    # One line per 30-day bucket, the most recent bucket first.
+    return [{'FILIAL': filial, 'B1_ZGRUPO': group, 'D2_TOTAL': revenue / len(quantities), 'D2_QUANT': quantity,
+             'D2_EMISSAO': (END - datetime.timedelta(days=30 * index + 1)).strftime('%Y%m%d')}
+            for index, quantity in enumerate(quantities)]
+
+
+def test_abc_by_revenue_share_and_xyz_by_demand_variation_per_branch():
+    vendas = pd.DataFrame(
+        sales('0101', 'G1', 800.0, [10, 10, 10])
+        + sales('0101', 'G2', 150.0, [10, 0, 20])
+        + sales('0101', 'G3', 50.0, [30, 0, 0])
+        + sales('0103', 'G1', 50.0, [1, 1, 1])
+        + sales('0103', 'G4', 950.0, [5, 5, 6])
+    )
+
+    result = classify_abc_xyz(vendas, days=90, end=END).set_index(['FILIAL', 'B1_ZGRUPO'])
+
+    assert result.loc[('0101', 'G1'), 'CLASSE_ABC'] == 'A'
+    assert result.loc[('0101', 'G2'), 'CLASSE_ABC'] == 'B'
+    assert result.loc[('0101', 'G3'), 'CLASSE_ABC'] == 'C'
+    assert result.loc[('0101', 'G3'), 'PARTICIPACAO_ACUM'] == pytest.approx(1.0)
+    # Shares are computed inside each branch.
+    assert result.loc[('0103', 'G4'), 'CLASSE_ABC'] == 'A'
+    assert result.loc[('0103', 'G1'), 'CLASSE_ABC'] == 'C'
+
+    assert result.loc[('0101', 'G1'), 'CLASSE'] == 'AX'
+    assert result.loc[('0101', 'G2'), 'CV_DEMANDA'] == pytest.approx(np.std([10, 0, 20]) / 10)
+    assert result.loc[('0101', 'G2'), 'CLASSE_XYZ'] == 'Y'
+    assert result.loc[('0101', 'G3'), 'CLASSE_XYZ'] == 'Z'
+
+
+def test_thresholds_and_single_branch_input():
+    vendas = pd.DataFrame(sales('0101', 'G1', 500.0, [10, 10]) + sales('0101', 'G2', 500.0, [10, 12]))
+    vendas = vendas.drop(columns='FILIAL')
+
+    result = classify_abc_xyz(vendas, days=60, end=END, thresholds={'a_share': 0.4, 'x_cv': 0.01})
+
+    assert 'FILIAL' not in result.columns
+    assert result['CLASSE'].tolist() == ['AX', 'BY']
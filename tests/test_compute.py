@@ -0,0 +1,73 @@
+import time
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("sqlalchemy")
+
+from database_functions import result_transport
+from main_functions.busca_produtos import pivot_estoque
+from main_functions.compute import ComputeExecutor
+from main_functions.sugestao_compra import calcular_sugestao
+
+
+def dormir(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+@pytest.fixture(scope='module')
+def executor():
+    executor = ComputeExecutor(workers=1, timeout=60, min_rows=0)
+    yield executor
+    executor.shutdown()
+
+
+def test_worker_result_matches_inline_result(executor):
+    historico = pd.DataFrame({'B1_ZGRUPO': ['G1', 'G2', 'G1'], 'B1_DESC': ['A', 'B', 'A'], 'D2_QUANT': [8.0, 4.0, 4.0],
+                              'D2_EMISSAO': ['20250106', '20250106', '20250113']})
+    saldo = pd.DataFrame({'B1_ZGRUPO': ['G1'], 'B2_QATU': [1.0]})
+    receber = pd.DataFrame({'B1_ZGRUPO': ['G2'], 'QRE': [1.0]})
+
+    result = executor.run(calcular_sugestao, historico, saldo, receber, 2)
+
+    expected = calcular_sugestao(historico, saldo, receber, 2)
+    pd.testing.assert_frame_equal(result.reset_index(drop=True), expected.reset_index(drop=True))
+
+
+def test_pivot_keeps_its_index_across_processes(executor):
+    search = pd.DataFrame({'B1_COD': ['A1', 'A1', 'A2'], 'B2_FILIAL': ['0101', '0103', '0101'], 'B2_QATU': [1.0, 2.0, 3.0]})
+
+    pivot = executor.run(pivot_estoque, search)
+
+    assert pivot.loc['A1', '0103'] == 2.0
+    assert pivot.loc['A2', '0103'] == 0
+
+
+def test_worker_runs_without_pyarrow(executor, monkeypatch):
+    # Without pyarrow the inputs are pickled to the worker instead of memory-mapped.
+    monkeypatch.setattr(result_transport, 'pa', None)
+    search = pd.DataFrame({'B1_COD': ['A1', 'A2'], 'B2_FILIAL': ['0101', '0103'], 'B2_QATU': [1.0, 3.0]})
+
+    pivot = executor.run(pivot_estoque, search)
+
+    assert pivot.loc['A2', '0103'] == 3.0
+    assert pivot.loc['A1', '0103'] == 0
+
+
+def test_small_inputs_run_inline():
+    executor = ComputeExecutor(workers=1, min_rows=1000)
+    assert executor.run(len, pd.DataFrame({'a': [1, 2]})) == 2
+    assert executor._executor is None
+
+
+def test_inline_errors_return_none_like_the_pool(executor):
+    def falhar():
+        raise ValueError("bad input")
+
+    assert ComputeExecutor(workers=0).run(falhar) is None
+    assert executor.run(int, 'x') is None
+
+
+def test_timeout_stops_the_worker(executor):
+    assert executor.run(dormir, 5, timeout=0.5) is None
+    assert executor.run(dormir, 0) == 0
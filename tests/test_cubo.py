@@ -0,0 +1,56 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+np = pytest.importorskip("numpy")
+
+from main_functions.cubo import SalesCube
+
+
+@pytest.fixture
+def cube():
+    rng = np.random.default_rng(7)
+    lines = 5000
+    vendas = pd.DataFrame({
+        'FILIAL': rng.choice(['0101', '0103'], lines),
+        'B1_GRUPO': rng.choice(['010', '020', '030'], lines),
+        'B1_ZGRUPO': rng.choice([f"G{index:03d}" for index in range(40)], lines),
+        'D2_EMISSAO': rng.choice(['20250105', '20250210', '20250320'], lines),
+        'D2_QUANT': rng.integers(1, 20, lines).astype(float),
+        'VFB': rng.uniform(10, 500, lines).round(2),
+        'D2_MARGEM': rng.uniform(-5, 40, lines).round(2),
+    })
+    estoque = pd.DataFrame({
+        'B2_FILIAL': ['0101', '0101', '0103'],
+        'B1_GRUPO': ['010', '020', '010'],
+        'B1_ZGRUPO': ['G001', 'G002', 'G001'],
+        'B2_VATU1': [100.0, 50.0, 25.0],
+    })
+    return vendas, estoque, SalesCube.from_frames(vendas, estoque, stock_month='202503')
+
+
+def test_rollup_matches_a_groupby_of_the_lines(cube):
+    vendas, _, cube = cube
+    vendas = vendas.assign(MES=vendas['D2_EMISSAO'].str[:6], MARGEM=vendas['VFB'] * vendas['D2_MARGEM'] / 100)
+    expected = vendas.groupby(['FILIAL', 'MES'])[['VFB', 'D2_QUANT', 'MARGEM']].sum()
+
+    result = cube.query(by=('FILIAL', 'MES')).set_index(['FILIAL', 'MES'])
+
+    assert len(cube) < len(vendas)
+    assert result['RECEITA'].to_numpy() == pytest.approx(expected['VFB'].to_numpy())
+    assert result['QUANTIDADE'].to_numpy() == pytest.approx(expected['D2_QUANT'].to_numpy())
+    assert result['MARGEM'].to_numpy() == pytest.approx(expected['MARGEM'].to_numpy())
+    assert result.loc[('0101', '202503'), 'VALOR_ESTOQUE'] == 150.0
+    assert result.loc[('0101', '202501'), 'VALOR_ESTOQUE'] == 0.0
+
+
+def test_slice_and_totals(cube):
+    vendas, _, cube = cube
+    selected = vendas[(vendas['B1_GRUPO'] == '010') & vendas['FILIAL'].isin(['0103'])]
+
+    result = cube.query(by=('B1_ZGRUPO',), where={'B1_GRUPO': '010', 'FILIAL': ['0103']})
+    totals = cube.query()
+
+    assert result['RECEITA'].sum() == pytest.approx(selected['VFB'].sum())
+    assert sorted(result['B1_ZGRUPO']) == sorted(set(selected['B1_ZGRUPO']) | {'G001'})
+    assert totals.loc[0, 'VALOR_ESTOQUE'] == 175.0
+    assert totals.loc[0, 'MARGEM_PCT'] == pytest.approx(totals.loc[0, 'MARGEM'] / totals.loc[0, 'RECEITA'] * 100)
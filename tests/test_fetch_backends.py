@@ -0,0 +1,54 @@
+from decimal import Decimal
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("pandas")
+sqlalchemy = pytest.importorskip("sqlalchemy")
+
+from database_functions.fetch_backends import _column_array, get_backend
+
+
+def _column(*values):
+    block = np.empty(len(values), dtype=object)
+    block[:] = values
+    return _column_array([block])
+
+
+def test_column_array_keeps_integers():
+    column = _column(1, 2, 3)
+    assert column.dtype == np.int64
+    assert column.tolist() == [1, 2, 3]
+
+
+def test_column_array_does_not_truncate_floats_after_an_integer():
+    column = _column(1, 2.7, 3)
+    assert column.dtype == np.float64
+    assert column.tolist() == [1.0, 2.7, 3.0]
+
+
+def test_column_array_converts_decimals_and_nulls():
+    column = _column(Decimal('1.5'), None, 2)
+    assert column.dtype == np.float64
+    assert column[0] == 1.5
+    assert np.isnan(column[1])
+
+
+def test_column_array_keeps_strings():
+    column = _column('A', None, 'B')
+    assert column.dtype == object
+    assert column.tolist() == ['A', None, 'B']
+
+
+def test_cursor_backend_matches_pandas_backend():
+    engine = sqlalchemy.create_engine("sqlite://")
+    with engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE T (COD TEXT, QTD, VALOR REAL)")
+        connection.exec_driver_sql("INSERT INTO T VALUES ('A', 1, 1.5), ('B', 2.5, NULL), ('C', 3, 2.0)")
+
+    query = "SELECT COD, QTD, VALOR FROM T ORDER BY COD"
+    cursor_frame = get_backend('cursor', arraysize=2).fetch(engine, query)
+    pandas_frame = get_backend('pandas').fetch(engine, query)
+
+    assert cursor_frame['QTD'].tolist() == [1.0, 2.5, 3.0]
+    assert cursor_frame['COD'].tolist() == pandas_frame['COD'].tolist()
+    assert cursor_frame['VALOR'].isna().tolist() == pandas_frame['VALOR'].isna().tolist()
@@ -0,0 +1,114 @@
+import datetime
+import pytest
+
+pd = pytest.importorskip("pandas")
+np = pytest.importorskip("numpy")
+
+from main_functions import fornecedores
+from main_functions.fornecedores import LeadTimeStats, load_state, save_state, update_statistics
+
+
+def orders(rows):
+    columns = ['C7_FILIAL', 'C7_FORNECE', 'C7_LOJA', 'A2_NOME', 'B1_ZGRUPO', 'C7_EMISSAO', 'C7_DATPRF',
+               'C7_QUANT', 'C7_QUJE', 'C7_RESIDUO']
+    return pd.DataFrame(rows, columns=columns)
+
+
+def test_lead_time_stats_survive_a_round_trip():
+    stats = LeadTimeStats()
+    stats.add(np.array(['a', 'b', 'a'], dtype=object), np.array([10, 400, 20]), np.array([10.0, 5.0, 10.0]),
+              np.array([10.0, 5.0, 5.0]))
+
+    frame = LeadTimeStats.from_dict(stats.to_dict()).to_frame()
+
+    assert frame.loc['a', 'LINHAS'] == 2
+    assert frame.loc['a', 'TAXA_ATENDIMENTO'] == 0.75
+    assert frame.loc['a', 'TAXA_COMPLETAS'] == 0.5
+    assert frame.loc['a', 'PRAZO_MEDIO'] == 15
+    assert frame.loc['a', 'PRAZO_P90'] == 20
+    assert frame.loc['b', 'PRAZO_P50'] == 365
+
+
+def test_update_statistics_only_settles_the_months_before_the_oldest_open_line(tmp_path):
+    today = datetime.date(2025, 3, 15)
+    state = load_state(str(tmp_path / 'missing.json'))
+    first = orders([
+        ['0101', 'F1', '01', 'ACME ', 'G1', '20250105', '20250115', 10.0, 10.0, ' '],
+        ['0101', 'F1', '01', 'ACME ', 'G1', '20250210', '20250220', 10.0, 0.0, ' '],
+        ['0101', 'F1', '01', 'ACME ', 'G2', '20250301', '20250331', 10.0, 4.0, 'S'],
+    ])
+
+    # Two chunks, as read with chunksize.
+    state, statistics = update_statistics([first[:2], first[2:]], state, today)
+
+    assert state['watermark'] == '20250201'
+    assert list(state['FORNECEDOR']) == ['0101|F1|01']
+    assert state['names'] == {'0101|F1|01': 'ACME'}
+    suppliers = statistics['FORNECEDOR'].to_frame()
+    assert suppliers.loc['0101|F1|01', 'LINHAS'] == 2
+    assert suppliers.loc['0101|F1|01', 'TAXA_ATENDIMENTO'] == 0.7
+
+    # The next run reads from the watermark on: the open line closed meanwhile.
+    second = orders([
+        ['0101', 'F1', '01', 'ACME', 'G1', '20250210', '20250220', 10.0, 10.0, ' '],
+        ['0101', 'F1', '01', 'ACME', 'G2', '20250301', '20250331', 10.0, 4.0, 'S'],
+    ])
+    state, statistics = update_statistics([second], state, today)
+
+    assert state['watermark'] == '20250301'
+    groups = statistics['GRUPO'].to_frame()
+    assert groups.loc['0101|G1', 'LINHAS'] == 2
+    assert groups.loc['0101|G1', 'PRAZO_MEDIO'] == 10
+    assert groups.loc['0101|G2', 'PRAZO_MEDIO'] == 30
+
+
+def test_lines_before_the_cutoff_month_are_settled_at_once(tmp_path):
+    today = datetime.date(2025, 3, 15)
+    state = load_state(str(tmp_path / 'missing.json'))
+    chunk = orders([
+        ['0101', 'F1', '01', 'ACME', 'G1', '20230510', '20230520', 10.0, 10.0, ' '],
+        ['0101', 'F1', '01', 'ACME', 'G1', '20240610', '20240620', 10.0, 0.0, ' '],
+        ['0101', 'F1', '01', 'ACME', 'G1', '20240801', '20240806', 10.0, 10.0, ' '],
+    ])
+
+    state, statistics = update_statistics([chunk], state, today)
+
+    # The open line of June holds the watermark; only the 2023 line is settled.
+    assert state['watermark'] == '20240601'
+    assert state['GRUPO']['0101|G1'][:4] == [1.0, 10.0, 10.0, 1.0]
+    assert statistics['GRUPO'].to_frame().loc['0101|G1', 'LINHAS'] == 2
+
+
+def test_lead_time_stats_added_in_chunks_match_a_single_add(monkeypatch):
+    monkeypatch.setattr(LeadTimeStats, 'PENDING_CELLS', 10)
+    rng = np.random.default_rng(0)
+    keys = rng.integers(0, 300, 5000).astype(str).astype(object)
+    lead = rng.integers(0, 90, 5000)
+    ordered = rng.integers(1, 10, 5000).astype(float)
+    received = np.minimum(ordered, rng.integers(0, 10, 5000))
+
+    whole = LeadTimeStats()
+    whole.add(keys, lead, ordered, received)
+    chunked = LeadTimeStats()
+    for start in range(0, 5000, 700):
+        part = slice(start, start + 700)
+        chunked.add(keys[part], lead[part], ordered[part], received[part])
+
+    pd.testing.assert_frame_equal(chunked.to_frame().sort_index(), whole.to_frame().sort_index())
+    assert LeadTimeStats.from_dict(chunked.to_dict()).to_dict() == chunked.to_dict()
+
+
+def test_reports_read_the_saved_statistics(tmp_path, monkeypatch):
+    path = str(tmp_path / 'fornecedores.json')
+    monkeypatch.setattr(fornecedores, 'state_path', lambda: path)
+    assert fornecedores.fornecedores_report('0101') is None
+
+    chunk = orders([['0101', 'F1', '01', 'ACME', 'G1', '20250105', '20250115', 10.0, 10.0, ' ']])
+    state, statistics = update_statistics([chunk], load_state(path), datetime.date(2025, 3, 15))
+    state['statistics'] = {dimension: stats.to_dict() for dimension, stats in statistics.items()}
+    save_state(path, state)
+
+    assert [file.name for file in tmp_path.iterdir()] == ['fornecedores.json']
+    report = fornecedores.fornecedores_report('0101')
+    assert report[['C7_FORNECE', 'C7_LOJA', 'A2_NOME', 'LINHAS']].values.tolist() == [['F1', '01', 'ACME', 1.0]]
+    assert fornecedores.prazos_grupos_report('0101')['PRAZO_MEDIO'].tolist() == [10.0]
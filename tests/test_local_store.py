@@ -0,0 +1,77 @@
+import sqlite3
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("sqlalchemy")
+
+from sqlalchemy import create_engine
+from database_functions.local_store import LocalStore
+from database_functions.queries import pedidos_local
+from database_functions.stand_in import build_stand_in
+
+
+@pytest.fixture
+def erp(tmp_path):
+    path = str(tmp_path / 'erp.db')
+    build_stand_in(path, products=300, sales=100, orders=3000)
+    return path, create_engine(f"sqlite:///{path}")
+
+
+def local_orders(store):
+    return store.read("SELECT * FROM SC7010 ORDER BY R_E_C_N_O_").drop(columns='ROW_HASH')
+
+
+def remote_orders(path, columns):
+    with sqlite3.connect(path) as connection:
+        return pd.read_sql(f"SELECT {', '.join(columns)} FROM SC7010 ORDER BY R_E_C_N_O_", connection)
+
+
+def test_first_sync_copies_the_tables(erp, tmp_path):
+    path, engine = erp
+    store = LocalStore(str(tmp_path / 'local.db'), range_size=500)
+
+    result = store.sync(engine, 'SC7010')
+
+    assert result['changed_ranges'] == result['ranges']
+    assert result['rows_fetched'] == 3000
+    local = local_orders(store)
+    pd.testing.assert_frame_equal(local, remote_orders(path, local.columns))
+
+
+def test_second_sync_downloads_only_the_changed_ranges(erp, tmp_path):
+    path, engine = erp
+    store = LocalStore(str(tmp_path / 'local.db'), range_size=500)
+    store.sync(engine, 'SC7010')
+
+    with sqlite3.connect(path) as connection:
+        connection.execute("UPDATE SC7010 SET C7_QUJE = C7_QUJE + 1 WHERE R_E_C_N_O_ = 10")
+        connection.execute("UPDATE SC7010 SET C7_RESIDUO = 'S' WHERE R_E_C_N_O_ = 1200")
+        connection.execute("DELETE FROM SC7010 WHERE R_E_C_N_O_ = 1300")
+        connection.execute("INSERT INTO SC7010 (C7_NUM, C7_PRODUTO, C7_EMISSAO, C7_QUANT, C7_QUJE, C7_RESIDUO, "
+                           "C7_FILIAL, D_E_L_E_T_) VALUES ('999999', '00000001', '20240101', 5, 0, ' ', '0101', ' ')")
+
+    changed = store.sync(engine, 'SC7010')
+    again = store.sync(engine, 'SC7010')
+
+    assert changed['rows_changed'] == 4
+    # Ranges 0 (row 10), 2 (rows 1200, 1300) and 6 (the new row 3001).
+    assert changed['changed_ranges'] == 3
+    assert changed['rows_fetched'] < 1500
+    assert again['changed_ranges'] == 0
+    assert again['rows_fetched'] == 0
+    local = local_orders(store)
+    pd.testing.assert_frame_equal(local, remote_orders(path, local.columns))
+
+
+def test_local_order_report_matches_the_erp(erp, tmp_path):
+    path, engine = erp
+    store = LocalStore(str(tmp_path / 'local.db'), range_size=500)
+    for table in ('SC7010', 'SB1010', 'SA2010'):
+        store.sync(engine, table)
+
+    local = store.read(pedidos_local, ('20000101', '0101'))
+    with sqlite3.connect(path) as connection:
+        remote = pd.read_sql(pedidos_local, connection, params=('20000101', '0101'))
+
+    assert len(local) == len(remote) > 0
+    assert local['QRE'].sum() == remote['QRE'].sum()
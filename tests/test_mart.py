@@ -0,0 +1,49 @@
+import sqlite3
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("sqlalchemy")
+
+from sqlalchemy import create_engine, text
+from database_functions.mart import FACT_TABLES, last_load, refresh_mart
+from database_functions.queries import faturamento, faturamento_mart, saldo_analitico, saldo_analitico_mart
+from database_functions.stand_in import build_stand_in
+
+
+@pytest.fixture
+def loaded_mart(tmp_path):
+    erp_path = str(tmp_path / 'erp.db')
+    build_stand_in(erp_path, products=300, sales=2000, orders=500)
+    with sqlite3.connect(erp_path) as connection:
+        connection.execute("UPDATE SA1010 SET A1_NOME = A1_NOME || '      ' WHERE A1_COD = 'C00001'")
+    erp = create_engine(f"sqlite:///{erp_path}")
+    mart = create_engine(f"sqlite:///{tmp_path / 'mart.db'}")
+    results = refresh_mart(erp, mart, chunk_size=700)
+    return erp, mart, results
+
+
+def test_refresh_copies_live_rows_and_builds_the_facts(loaded_mart):
+    erp, mart, results = loaded_mart
+    rows = {result['table']: result['rows'] for result in results}
+
+    with erp.connect() as connection:
+        live_sales = connection.execute(text("SELECT COUNT(*) FROM SD2010 WHERE D_E_L_E_T_ <> '*'")).scalar()
+    assert rows['SD2010'] == live_sales
+    assert set(FACT_TABLES) <= set(rows)
+    assert last_load(mart) is not None
+    with mart.connect() as connection:
+        assert connection.execute(text("SELECT A1_NOME FROM SA1010 WHERE A1_COD = 'C00001'")).scalar() == 'CLIENTE 1'
+        assert connection.execute(text("SELECT COUNT(*) FROM sqlite_master WHERE name LIKE '%_NOVA'")).scalar() == 0
+
+
+def test_mart_reports_match_the_erp_queries(loaded_mart):
+    erp, mart, _ = loaded_mart
+
+    erp_sales = pd.read_sql(faturamento, erp, params=('20000101', '0101'))
+    mart_sales = pd.read_sql(text(faturamento_mart), mart, params={'filial': '0101', 'inicio': '20000101'})
+    assert len(mart_sales) == len(erp_sales)
+    assert mart_sales['VFB'].sum() == pytest.approx(erp_sales['VFB'].sum())
+
+    erp_stock = pd.read_sql(saldo_analitico, erp, params=('0103', '0103'))
+    mart_stock = pd.read_sql(text(saldo_analitico_mart), mart, params={'filial': '0103'})
+    assert sorted(mart_stock['B1_COD']) == sorted(erp_stock['B1_COD'])
@@ -0,0 +1,38 @@
+import sqlite3
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("sqlalchemy")
+
+from sqlalchemy import create_engine
+from database_functions import funcoes_base
+from database_functions.stand_in import build_stand_in
+from main_functions.monitor_estoque import StockMonitor
+
+
+@pytest.fixture
+def erp(tmp_path, monkeypatch):
+    path = str(tmp_path / 'erp.db')
+    build_stand_in(path, products=200, sales=10, orders=10)
+    monkeypatch.setitem(funcoes_base._engines, 'sql_server', create_engine(f"sqlite:///{path}"))
+    return path
+
+
+def test_poll_returns_only_the_changed_cells(erp):
+    monitor = StockMonitor()
+    assert monitor.load()
+    assert monitor.poll() == []
+
+    with sqlite3.connect(erp) as connection:
+        old = connection.execute("SELECT B2_QATU FROM SB2010 WHERE B2_COD = '00000007' AND B2_FILIAL = '0103'"
+                                 ).fetchone()[0]
+        connection.execute("UPDATE SB2010 SET B2_QATU = B2_QATU + 5 WHERE B2_COD = '00000007' AND B2_FILIAL = '0103'")
+        connection.execute("UPDATE SB2010 SET D_E_L_E_T_ = '*' WHERE B2_COD = '00000009' AND B2_FILIAL = '0101'")
+
+    changes = monitor.poll()
+
+    assert ('00000007', '0103', old, old + 5) in changes
+    assert [change for change in changes if change[0] == '00000009'][0][3] == 0.0
+    assert len(changes) == 2
+    assert monitor.matrix.at['00000007', '0103'] == old + 5
+    assert monitor.poll() == []
@@ -0,0 +1,39 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+np = pytest.importorskip("numpy")
+
+from main_functions.previsao import calcular_previsao, forecast_matrix
+
+
+def test_forecast_matrix_follows_level_trend_and_season():
+    months = np.arange(36)
+    flat = np.full(36, 50.0) + np.where(months % 2, 1.0, -1.0)
+    trend = 10.0 + 5.0 * months
+    seasonal = 100.0 + 40.0 * np.sin(2 * np.pi * months / 12)
+
+    result = forecast_matrix(np.vstack([flat, trend, seasonal]), horizon=3, season=12)
+
+    assert result['forecast'].shape == (3, 3)
+    assert np.allclose(result['forecast'][0], 50.0, atol=2.0)
+    assert result['model'][1] in ('HOLT', 'SAZONAL')
+    assert np.allclose(result['forecast'][1], 10.0 + 5.0 * np.arange(36, 39), rtol=0.05)
+    assert result['model'][2] == 'SAZONAL'
+    assert np.allclose(result['forecast'][2], 100.0 + 40.0 * np.sin(2 * np.pi * np.arange(36, 39) / 12), atol=5.0)
+    assert (result['lower'] <= result['forecast']).all() and (result['forecast'] <= result['upper']).all()
+
+
+def test_calcular_previsao_returns_one_row_per_group_and_month():
+    historico = pd.DataFrame({
+        'B1_ZGRUPO': ['G1', 'G1', 'G1', 'G2', 'G1'],
+        'D2_EMISSAO': ['20250105', '20250210', '20250320', '20250315', '20250325'],
+        'D2_QUANT': [10.0, 10.0, 6.0, 4.0, 4.0],
+    })
+
+    previsao = calcular_previsao(historico, '20250101', '20250331', horizonte=2)
+
+    assert previsao['B1_ZGRUPO'].tolist() == ['G1', 'G1', 'G2', 'G2']
+    assert previsao['MES'].tolist() == [pd.Timestamp('2025-04-01'), pd.Timestamp('2025-05-01')] * 2
+    assert np.allclose(previsao.loc[previsao['B1_ZGRUPO'] == 'G1', 'PREVISAO'], 10.0, atol=1.0)
+    assert (previsao['LIMITE_INFERIOR'] <= previsao['PREVISAO']).all()
+    assert set(previsao['MODELO']) <= {'SES', 'HOLT'}
@@ -0,0 +1,50 @@
+import json
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("sqlalchemy")
+
+from sqlalchemy import create_engine
+from database_functions import profiler
+from database_functions.profiler import fingerprint, record_slow_query, summarize_slow_queries
+from database_functions.queries import report_query
+
+
+@pytest.fixture
+def slow_log(tmp_path, monkeypatch):
+    path = str(tmp_path / 'slow_queries.log')
+    monkeypatch.setattr(profiler, 'slow_log_path', lambda: path)
+    monkeypatch.setattr(profiler, '_slow_logger', None)
+    yield path
+    for handler in list(profiler._slow_log().handlers):
+        handler.close()
+        profiler._slow_log().removeHandler(handler)
+
+
+def test_fingerprint_ignores_literals_and_layout():
+    assert fingerprint(report_query(90, '0101')) == fingerprint(report_query(180, '0103'))
+    assert fingerprint("SELECT *\n  FROM SD2010 -- vendas\nWHERE D2_FILIAL = '0101'") == \
+        fingerprint("select * from SD2010 where D2_FILIAL = '0105'")
+    assert fingerprint("SELECT * FROM SD2010") != fingerprint("SELECT * FROM SC7010")
+
+
+def test_slow_queries_are_logged_with_the_sqlite_plan_and_summarized(tmp_path, slow_log):
+    engine = create_engine(f"sqlite:///{tmp_path / 'profiler.db'}")
+    with engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE SD2010 (D2_FILIAL TEXT, D2_QUANT REAL)")
+        connection.exec_driver_sql("CREATE INDEX SD2010_FILIAL ON SD2010 (D2_FILIAL)")
+
+    query = "SELECT SUM(D2_QUANT) FROM SD2010 WHERE D2_FILIAL = ?"
+    record_slow_query(engine, 'vendas', query, ('0101',), 3.0, 1)
+    record_slow_query(engine, 'vendas', query, ('0103',), 5.0, 1)
+    record_slow_query(engine, None, "SELECT * FROM SD2010", None, 2.5, 0)
+
+    with open(slow_log, encoding='utf-8') as f:
+        first = json.loads(f.readline())
+    assert 'SD2010_FILIAL' in first['server']['plan']
+
+    summary = summarize_slow_queries(slow_log)
+    assert summary['name'].tolist() == ['vendas', '']
+    assert summary.loc[0, 'runs'] == 2
+    assert summary.loc[0, 'total_seconds'] == 8.0
+    assert summary.loc[0, 'max_seconds'] == 5.0
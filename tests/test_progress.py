@@ -0,0 +1,69 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("sqlalchemy")
+
+from sqlalchemy import create_engine
+from database_functions.fetch_backends import get_backend
+from database_functions.progress import (ProgressReporter, progress_job, job_reporter, progress_text, record_rows,
+                                         estimate_rows)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'progress.db'}")
+    with engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE SD2010 (D2_COD TEXT, D2_QUANT REAL)")
+        connection.exec_driver_sql("INSERT INTO SD2010 VALUES " + ", ".join(f"('{i:05d}', {i})" for i in range(1200)))
+    return engine
+
+
+@pytest.mark.parametrize('backend', ['pandas', 'cursor'])
+def test_backends_report_phases_and_rows(engine, backend):
+    events = []
+    reporter = ProgressReporter(events.append, 'faturamento', total=1200, interval=0)
+    fetch_backend = get_backend(backend)
+    fetch_backend.chunksize = fetch_backend.arraysize = 500
+
+    data_frame = fetch_backend.fetch(engine, "SELECT * FROM SD2010", progress=reporter)
+    reporter.finish()
+
+    assert len(data_frame) == 1200
+    assert [event['phase'] for event in events][:2] == ['executando', 'lendo']
+    assert [event['rows'] for event in events if event['phase'] == 'lendo'][-1] == 1200
+    assert events[-1]['phase'] == 'concluído'
+    assert events[-1]['percent'] == 100
+
+
+def test_estimates_come_from_the_previous_runs():
+    assert estimate_rows('novo_relatorio', ('0101',)) is None
+    record_rows('novo_relatorio', ('0101',), 300)
+    assert estimate_rows('novo_relatorio', ('0101',)) == 300
+    assert estimate_rows('novo_relatorio', ('0103',)) == 300
+
+
+def test_first_run_is_indeterminate():
+    events = []
+    with progress_job(events.append):
+        reporter = job_reporter('relatorio_inedito', lambda: estimate_rows('relatorio_inedito', ('0101',)))
+    reporter.phase('lendo')
+    reporter.add_rows(500)
+    event = reporter.event()
+    assert event['total'] is None and event['percent'] is None and event['eta_seconds'] is None
+    assert event['rows'] == 500
+
+
+def test_reporter_only_exists_inside_a_job():
+    assert job_reporter('faturamento') is None
+    events = []
+    with progress_job(events.append):
+        reporter = job_reporter('faturamento', lambda: 4000)
+    reporter.add_rows(1000)
+    assert reporter.total == 4000
+
+
+def test_progress_text():
+    event = {'step': 'faturamento', 'phase': 'lendo', 'rows': 12000, 'total': 40000,
+             'rows_per_second': 2300, 'eta_seconds': 75, 'percent': 30}
+    assert progress_text(event) == "faturamento: lendo 12.000 de ~40.000 linhas (2.300 linhas/s, faltam 1:15)"
+    assert progress_text(dict(event, phase='executando')) == "faturamento: executando..."
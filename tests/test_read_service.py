@@ -0,0 +1,84 @@
+import threading
+import time
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("sqlalchemy")
+
+from database_functions import service_client
+from database_functions.service_client import ServiceClient, frame_to_payload, payload_to_frame
+from main_functions.service_server import ResultCache, create_server
+
+
+@pytest.fixture
+def service(hot_data):
+    server = create_server('127.0.0.1', 0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield ServiceClient(f"http://127.0.0.1:{server.server_address[1]}", timeout=10)
+    server.shutdown()
+    server.server_close()
+    service_client._backend_override = None
+
+
+def test_payload_round_trip_keeps_codes_dtypes_and_attrs(hot_data):
+    data_frame = pd.DataFrame({
+        'B1_COD': ['00123', 'NA'],
+        'B2_QATU': [1.5, None],
+        'R_E_C_N_O_': [1, 2],
+        'D2_EMISSAO': pd.to_datetime(['2024-01-01', '2024-02-01']),
+    })
+    data_frame.attrs.update({'source': 'hot_data', 'snapshot_created': hot_data, 'not_found': ['X']})
+
+    result = payload_to_frame(frame_to_payload(data_frame))
+
+    pd.testing.assert_frame_equal(result, data_frame)
+    assert result.attrs == data_frame.attrs
+
+
+def test_service_answers_searches(service, hot_data):
+    result = service.search('a1')
+    assert sorted(result['B1_COD'].str.strip()) == ['A1', 'A2']
+    assert result.attrs['snapshot_created'] == hot_data
+
+    batch = service.search_batch(['b1', 'zz'])
+    assert batch['B1_COD'].str.strip().tolist() == ['B1']
+    assert batch.attrs['not_found'] == ['ZZ']
+
+
+def test_service_rejects_unknown_endpoints(service):
+    assert service.request('GET', '/query', {'sql': 'SELECT 1'}) is None
+    assert service.report('relatorio_inexistente', '0101') is None
+
+
+def test_result_cache_computes_each_key_once():
+    cache = ResultCache(ttl_seconds=60)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)
+        return 'resultado'
+
+    threads = [threading.Thread(target=cache.get_or_compute, args=(('search', 'A1'), compute)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert cache.get_or_compute(('search', 'A1'), compute) == 'resultado'
+
+
+def test_result_cache_drops_the_lock_of_keys_that_cached_nothing():
+    cache = ResultCache(ttl_seconds=60)
+
+    def fail():
+        raise RuntimeError("database down")
+
+    assert cache.get_or_compute(('search', 'missing'), lambda: None) is None
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute(('search', 'broken'), fail)
+    cache.get_or_compute(('search', 'A1'), lambda: 'resultado')
+
+    assert list(cache._key_locks) == [('search', 'A1')]
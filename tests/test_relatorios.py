@@ -0,0 +1,117 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from main_functions.relatorios import calcular_analise_inventario
+from main_functions.sugestao_compra import calcular_sugestao, HISTORICO_MESES
+
+
+def test_calcular_sugestao_covers_average_minus_stock_and_orders():
+    historico = pd.DataFrame({
+        'B1_ZGRUPO': ['G1', 'G1', 'G2', 'G3'],
+        'B1_DESC': ['ITEM 1', 'ITEM 1', 'ITEM 2', 'ITEM 3'],
+        'D2_QUANT': [30.0, 10.0, 8.0, 4.0],
+        'D2_EMISSAO': ['20250106', '20250106', '20250113', '20250120'],
+    })
+    saldo = pd.DataFrame({'B1_ZGRUPO': ['G1', 'G2', 'G2'], 'B2_QATU': [5.0, 10.0, 2.0]})
+    receber = pd.DataFrame({'B1_ZGRUPO': ['G1'], 'QRE': [1.0]})
+
+    result = calcular_sugestao(historico, saldo, receber, meses_cobertura=2).set_index('B1_ZGRUPO')
+
+    assert result.loc['G1', 'MEDIA_MENSAL'] == 40.0 / HISTORICO_MESES
+    # 10 * 2 - 5 - 1 = 14
+    assert result.loc['G1', 'SUGESTAO'] == 14
+    # 2 * 2 - 12 < 0 -> nothing to buy
+    assert result.loc['G2', 'SUGESTAO'] == 0
+    # Groups without stock or open orders: 1 * 2 = 2
+    assert result.loc['G3', 'ESTOQUE'] == 0
+    assert result.loc['G3', 'A_RECEBER'] == 0
+    assert result.loc['G3', 'SUGESTAO'] == 2
+
+
+def test_calcular_sugestao_rounds_up():
+    historico = pd.DataFrame({'B1_ZGRUPO': ['G1'], 'B1_DESC': ['ITEM'], 'D2_QUANT': [5.0], 'D2_EMISSAO': ['20250106']})
+    saldo = pd.DataFrame({'B1_ZGRUPO': [], 'B2_QATU': []})
+    receber = pd.DataFrame({'B1_ZGRUPO': [], 'QRE': []})
+
+    result = calcular_sugestao(historico, saldo, receber, meses_cobertura=1)
+
+    # 5 / 4 = 1.25 -> 2
+    assert result['SUGESTAO'].tolist() == [2]
+
+
+def test_calcular_sugestao_caps_a_one_off_sale():
+    weeks = pd.date_range('2025-01-06', periods=16, freq='7D').strftime('%Y%m%d')
+    quantities = [10.0, 12.0, 9.0, 11.0, 10.0, 400.0, 10.0, 11.0, 9.0, 12.0, 10.0, 11.0, 10.0, 9.0, 12.0, 10.0]
+    historico = pd.DataFrame({'B1_ZGRUPO': 'G1', 'B1_DESC': 'ITEM', 'D2_QUANT': quantities, 'D2_EMISSAO': weeks})
+    saldo = pd.DataFrame({'B1_ZGRUPO': [], 'B2_QATU': []})
+    receber = pd.DataFrame({'B1_ZGRUPO': [], 'QRE': []})
+
+    result = calcular_sugestao(historico, saldo, receber, meses_cobertura=1).set_index('B1_ZGRUPO')
+
+    assert 370 < result.loc['G1', 'AJUSTE_OUTLIERS'] < 390
+    assert result.loc['G1', 'MEDIA_MENSAL'] < sum(quantities) / HISTORICO_MESES / 2
+    # The capped week is listed with the result.
+    assert [(item['B1_ZGRUPO'], item['SEMANA'], item['QUANTIDADE']) for item in result.attrs['ajustes']] == [
+        ('G1', '20250210', 400.0)]
+    assert 10 < result.attrs['ajustes'][0]['LIMITE'] < 30
+
+
+def test_calcular_analise_inventario_aggregates_per_group():
+    vendas = pd.DataFrame({
+        'B1_ZGRUPO': ['G1', 'G1', 'G2'],
+        'B1_DESC': ['ITEM 1', 'ITEM 1', 'ITEM 2'],
+        'D2_QUANT': [6.0, 3.0, 0.0],
+        'D2_TOTAL': [60.0, 30.0, 0.0],
+        'D2_EMISSAO': ['20250101'] * 3,
+    })
+    precos = pd.DataFrame({'B1_ZGRUPO': ['G1'], 'PRECO_MEDIO_COMPRA': [9.0], 'PRECO_MEDIO_PONDERADO': [9.5],
+                           'ULTIMO_PRECO': [10.0], 'PRECO_MINIMO': [8.0], 'PRECO_MAXIMO': [10.0],
+                           'PEDIDOS_COMPRA': [2]})
+    saldo = pd.DataFrame({'B1_ZGRUPO': ['G1'], 'B2_QATU': [6.0]})
+
+    result = calcular_analise_inventario(vendas, precos, saldo, days=90)
+
+    assert result['B1_ZGRUPO'].tolist() == ['G1', 'G2']
+    g1 = result.set_index('B1_ZGRUPO').loc['G1']
+    assert g1['QTD_VENDIDA'] == 9.0
+    assert g1['VALOR_VENDIDO'] == 90.0
+    assert g1['MEDIA_MENSAL'] == 3.0
+    assert g1['PRECO_MEDIO_COMPRA'] == 9.0
+    assert g1['ULTIMO_PRECO'] == 10.0
+    assert g1['COBERTURA_MESES'] == 2.0
+    assert g1['CLASSE_ABC'] == 'A'
+    g2 = result.set_index('B1_ZGRUPO').loc['G2']
+    assert g2['ESTOQUE'] == 0
+    assert pd.isna(g2['COBERTURA_MESES'])
+    assert pd.isna(g2['PRECO_MEDIO_COMPRA'])
+
+
+def test_precos_compra_aggregates_the_order_lines_per_group(tmp_path):
+    pytest.importorskip("sqlalchemy")
+    from sqlalchemy import create_engine
+    from database_functions.queries import precos_compra
+    from database_functions.stand_in import build_stand_in
+
+    path = str(tmp_path / 'erp.db')
+    build_stand_in(path, products=300, sales=10, orders=3000)
+    engine = create_engine(f"sqlite:///{path}")
+
+    precos = pd.read_sql(precos_compra, engine, params=('20000101', '0101')).set_index('B1_ZGRUPO')
+    linhas = pd.read_sql("""
+        SELECT SB.B1_ZGRUPO, SC7.C7_NUM, SC7.C7_ITEM, SC7.C7_EMISSAO, SC7.C7_PRECO, SC7.C7_QUANT
+        FROM SC7010 AS SC7 INNER JOIN SB1010 AS SB ON SC7.C7_PRODUTO = SB.B1_COD AND SB.D_E_L_E_T_ <> '*'
+        WHERE SC7.D_E_L_E_T_ <> '*' AND SC7.C7_FILIAL = '0101'
+        AND SB.B1_GRUPO NOT IN ('002', '001', '003') AND SB.B1_TIPO IN ('ME', 'MI', 'KT', 'PA')
+        """, engine)
+
+    assert sorted(precos.index) == sorted(linhas['B1_ZGRUPO'].unique())
+    grupo = linhas['B1_ZGRUPO'].value_counts().index[0]
+    compras = linhas[linhas['B1_ZGRUPO'] == grupo].sort_values(['C7_EMISSAO', 'C7_NUM', 'C7_ITEM'])
+    resultado = precos.loc[grupo]
+    assert resultado['ULTIMO_PRECO'] == compras['C7_PRECO'].iloc[-1]
+    assert resultado['PRECO_MEDIO_COMPRA'] == pytest.approx(compras['C7_PRECO'].mean())
+    assert resultado['PRECO_MEDIO_PONDERADO'] == pytest.approx(
+        (compras['C7_PRECO'] * compras['C7_QUANT']).sum() / compras['C7_QUANT'].sum())
+    assert resultado['PRECO_MINIMO'] == compras['C7_PRECO'].min()
+    assert resultado['PEDIDOS_COMPRA'] == compras['C7_NUM'].nunique()
@@ -0,0 +1,71 @@
+import gc
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("sqlalchemy")
+
+from database_functions import result_transport
+from database_functions.result_transport import ResultHandle, publish_result, open_result, remove_stale_results
+
+# The memory-mapped transport needs pyarrow; without it results travel inline.
+requires_pyarrow = pytest.mark.skipif(result_transport.pa is None, reason="pyarrow is not installed")
+
+
+def build_result(rows):
+    data_frame = pd.DataFrame({'B1_COD': [f"{i:08d}" for i in range(rows)], 'D2_QUANT': [float(i) for i in range(rows)]})
+    data_frame.attrs['source'] = 'database'
+    return publish_result(data_frame)
+
+
+@pytest.fixture(autouse=True)
+def transport_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_transport, '_directory', str(tmp_path))
+    return tmp_path
+
+
+@requires_pyarrow
+def test_result_published_by_a_worker_process_is_mapped_and_removed(transport_directory):
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        handle = executor.submit(build_result, 1000).result()
+
+    assert handle.frame is None
+    assert os.path.exists(handle.path)
+
+    data_frame = open_result(handle)
+    assert len(data_frame) == 1000
+    assert data_frame['B1_COD'].iloc[7] == '00000007'
+    assert data_frame['D2_QUANT'].sum() == sum(range(1000))
+    assert data_frame.attrs['source'] == 'database'
+
+    del data_frame
+    gc.collect()
+    assert not os.path.exists(handle.path)
+
+
+@requires_pyarrow
+def test_remove_stale_results(transport_directory):
+    handle = build_result(10)
+    assert remove_stale_results(max_age_seconds=3600) == 0
+    os.utime(handle.path, (0, 0))
+    assert remove_stale_results(max_age_seconds=3600) == 1
+    assert not os.listdir(transport_directory)
+
+
+def test_results_travel_inline_without_pyarrow(transport_directory, monkeypatch):
+    monkeypatch.setattr(result_transport, 'pa', None)
+    data_frame = pd.DataFrame({'B1_COD': ['00000001', '00000002'], 'D2_QUANT': [1.0, 2.0]})
+    data_frame.attrs['source'] = 'database'
+
+    handle = publish_result(data_frame)
+
+    assert handle.path is None and handle.rows == 2
+    assert not os.listdir(transport_directory)
+    handle = pickle.loads(pickle.dumps(handle))
+    opened = open_result(handle)
+    pd.testing.assert_frame_equal(opened, data_frame)
+    assert opened.attrs['source'] == 'database'
+    handle.release()
+    assert isinstance(handle, ResultHandle)
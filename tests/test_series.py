@@ -0,0 +1,74 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+np = pytest.importorskip("numpy")
+
+from main_functions.series import (RollingWindow, bucket_index, bucket_series, bucket_start, cap_outliers,
+                                   day_index, rolling_sum)
+
+
+def test_day_and_bucket_indices():
+    days = day_index(['19700101', '20250303', '', None, '20250331'])
+
+    assert days.dtype == np.int32
+    assert days[0] == 0 and days[2] == -1 and days[3] == -1
+    assert bucket_start(bucket_index(days[[1]], 'W'), 'W')[0] == np.datetime64('2025-03-03')
+    assert bucket_start(bucket_index(days[[4]], 'M'), 'M')[0] == np.datetime64('2025-03-01')
+    assert bucket_index(days[[1, 4]], 'M').tolist() == [55 * 12 + 2] * 2
+
+
+def test_bucket_series_builds_a_dense_matrix_with_empty_buckets():
+    vendas = pd.DataFrame({
+        'B1_ZGRUPO': ['G2', 'G1', 'G1', 'G2', 'G1'],
+        'D2_EMISSAO': ['20250105', '20250110', '20250320', '20250131', '19991231'],
+        'D2_QUANT': [1.0, 2.0, 3.0, 4.0, 100.0],
+    })
+
+    series = bucket_series(vendas['B1_ZGRUPO'], vendas['D2_EMISSAO'], vendas['D2_QUANT'], 'M',
+                           start='20250101', end='20250331')
+
+    assert series.groups.tolist() == ['G1', 'G2']
+    assert series.values.tolist() == [[2.0, 0.0, 3.0], [5.0, 0.0, 0.0]]
+    assert series.to_frame().columns[1] == pd.Timestamp('2025-02-01')
+
+
+def test_rolling_window_matches_a_full_recomputation():
+    rng = np.random.default_rng(3)
+    history = rng.integers(0, 10, size=(50, 40)).astype(float)
+    window = RollingWindow(history[:, :30], window=7)
+    assert window.total == pytest.approx(history[:, 23:30].sum(axis=1))
+
+    for day in range(30, 40):
+        window.push(history[:, day])
+        assert window.total == pytest.approx(history[:, day - 6:day + 1].sum(axis=1))
+
+    assert rolling_sum(history, 7)[:, -1] == pytest.approx(window.total)
+    window.add_groups(2)
+    window.push(np.arange(52))
+    assert window.total[-1] == 51.0
+
+
+def test_bucket_series_starts_at_the_first_date_without_bounds():
+    series = bucket_series(['G1', 'G1'], ['20250310', '20250105'], [1.0, 2.0], 'M')
+
+    assert series.values.tolist() == [[2.0, 0.0, 1.0]]
+    assert series.dates[0] == np.datetime64('2025-01-01')
+
+
+def test_cap_outliers_caps_spikes_of_regular_and_intermittent_rows():
+    matrix = np.array([
+        [10.0, 11.0, 9.0, 10.0, 300.0, 10.0, 12.0, 9.0, 11.0],
+        [0.0, 2.0, 0.0, 0.0, 500.0, 0.0, 3.0, 0.0, 0.0],
+        [0.0, 0.0, 0.0, 0.0, 7.0, 0.0, 0.0, 0.0, 0.0],
+        [5.0, 6.0, 5.0, 7.0, 6.0, 5.0, 6.0, 7.0, 5.0],
+    ])
+
+    capped, adjusted, limit = cap_outliers(matrix, window=7, threshold=3.5)
+
+    assert np.flatnonzero(adjusted).tolist() == [4, 13]
+    assert 10 < capped[0, 4] < 20 and 0 < capped[1, 4] < 10
+    # A lone sale in a window without spread is kept, and so are regular rows.
+    assert capped[2, 4] == 7.0
+    assert (capped[3] == matrix[3]).all()
+    assert (capped[~adjusted] == matrix[~adjusted]).all()
+    assert cap_outliers(matrix[:, :2])[1].sum() == 0
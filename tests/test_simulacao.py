@@ -0,0 +1,55 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+np = pytest.importorskip("numpy")
+
+from main_functions import simulacao
+from main_functions.simulacao import calcular_estoque_seguranca, simulate_reorder_points
+
+
+def test_reorder_point_of_a_constant_demand_and_lead_time():
+    daily = np.array([[2.0] * 30, [0.0] * 30])
+    lead_groups = np.array(['G1', 'G1', 'G2'], dtype=object)
+
+    result = simulate_reorder_points(daily, np.array(['G1', 'G2'], dtype=object), lead_groups, [5, 5, -1],
+                                     scenarios=200, candidates=[5.0, 10.0], seed=1)
+
+    assert result['reorder_point'].tolist() == [10.0, 0.0]
+    assert result['mean_lead_time'][0] == 5
+    # G2 has no valid order: it borrows the lead times of the other groups.
+    assert result['mean_lead_time'][1] == 5
+    assert result['service_level'].tolist() == [1.0, 1.0]
+    assert result['candidate_service'][0].tolist() == [0.0, 1.0]
+    assert result['candidate_shortage'][0].tolist() == [5.0, 0.0]
+
+
+def test_chunked_simulation_reaches_the_service_level(monkeypatch):
+    rng = np.random.default_rng(0)
+    daily = rng.poisson(3, (7, 90)).astype(float)
+    groups = np.array([f"G{index}" for index in range(7)], dtype=object)
+    lead_groups = np.repeat(groups, 3)
+    lead_days = np.tile([3, 7, 14], 7)
+
+    monkeypatch.setattr(simulacao, 'CHUNK_CELLS', 2000)
+    result = simulate_reorder_points(daily, groups, lead_groups, lead_days, 0.9, scenarios=1000, seed=2)
+
+    assert (result['service_level'] >= 0.9).all()
+    assert (result['reorder_point'] >= result['mean_demand']).all()
+    assert np.allclose(result['mean_demand'], daily.mean(axis=1) * 8, rtol=0.05)
+
+
+def test_calcular_estoque_seguranca_returns_one_row_per_group():
+    historico = pd.DataFrame({
+        'B1_ZGRUPO': ['G1', 'G1', 'G2'],
+        'D2_EMISSAO': ['20250101', '20250105', '20250103'],
+        'D2_QUANT': [4.0, 6.0, 1.0],
+    })
+    prazos = pd.DataFrame({'B1_ZGRUPO': ['G1', 'G2'], 'C7_EMISSAO': ['20241201', '20241201'],
+                           'C7_DATPRF': ['20241203', '20241201']})
+
+    estoque = calcular_estoque_seguranca(historico, prazos, '20250101', '20250110', 0.95, 500, seed=3)
+
+    assert sorted(estoque['B1_ZGRUPO']) == ['G1', 'G2']
+    g2 = estoque.set_index('B1_ZGRUPO').loc['G2']
+    assert g2['PONTO_PEDIDO'] == 0 and g2['PRAZO_MEDIO'] == 0
+    assert (estoque['PONTO_PEDIDO'] >= estoque['ESTOQUE_SEGURANCA']).all()
@@ -0,0 +1,44 @@
+import datetime
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("sqlalchemy")
+
+from sqlalchemy import exc as sa_exc
+from database_functions.snapshots import SnapshotStore
+from database_functions.funcoes_base import is_connection_error
+
+
+def test_snapshot_round_trip_keeps_dtypes(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    data_frame = pd.DataFrame({
+        'B1_COD': ['NA', '00123', ' '],
+        'B2_QATU': [1.5, None, 3.0],
+        'R_E_C_N_O_': [1, 2, 3],
+        'D2_EMISSAO': pd.to_datetime(['2024-01-01', '2024-02-01', '2024-03-01']),
+    })
+
+    store.save("SELECT 1", ('0101',), data_frame, 'teste')
+    loaded, created = store.load("SELECT 1", ('0101',))
+
+    assert isinstance(created, datetime.datetime)
+    assert loaded['B1_COD'].tolist() == ['NA', '00123', ' ']
+    assert loaded['R_E_C_N_O_'].dtype == 'int64'
+    assert pd.isna(loaded['B2_QATU'][1])
+    assert loaded['D2_EMISSAO'].dtype.kind == 'M'
+    assert loaded.attrs['source'] == 'snapshot'
+    assert not list(tmp_path.glob('*.pkl'))
+
+
+def test_only_connection_errors_fall_back_to_snapshots():
+    class OperationalError(Exception):
+        pass
+
+    class ProgrammingError(Exception):
+        pass
+
+    assert is_connection_error(sa_exc.OperationalError("SELECT 1", None, OperationalError()))
+    assert is_connection_error(OperationalError("08S01 communication link failure"))
+    assert is_connection_error(TimeoutError())
+    assert not is_connection_error(sa_exc.ProgrammingError("SELECT 1", None, ProgrammingError()))
+    assert not is_connection_error(ValueError("bad value"))
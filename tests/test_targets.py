@@ -0,0 +1,48 @@
+import sqlite3
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("sqlalchemy")
+
+from database_functions import funcoes_base
+from database_functions.db_connect import config
+from database_functions.funcoes_base import download, target_route
+
+QUERY = "SELECT ORIGEM FROM MARCADOR"
+
+
+@pytest.fixture
+def targets(tmp_path, monkeypatch):
+    sections = {}
+    for section, origem in (('teste_primario', 'primario'), ('teste_replica', 'replica')):
+        path = str(tmp_path / f"{origem}.db")
+        with sqlite3.connect(path) as connection:
+            connection.execute("CREATE TABLE MARCADOR (ORIGEM TEXT)")
+            connection.execute("INSERT INTO MARCADOR VALUES (?)", (origem,))
+        sections[section] = {'type': 'sqlite', 'path': path}
+    sections['targets'] = {'primary': 'teste_primario', 'reporting': 'teste_replica'}
+    for section, values in sections.items():
+        config[section] = values
+    monkeypatch.setattr(funcoes_base, '_targets_down', {})
+    yield sections
+    for section in sections:
+        config.remove_section(section)
+        funcoes_base._engines.pop(section, None)
+
+
+def test_bulk_queries_read_the_replica_and_lookups_the_primary(targets):
+    assert download(QUERY)['ORIGEM'].tolist() == ['replica']
+    assert download(QUERY, name='estoque_por_filial')['ORIGEM'].tolist() == ['primario']
+
+
+def test_unreachable_replica_falls_back_to_the_primary(targets, tmp_path):
+    config['teste_replica']['path'] = str(tmp_path / 'sem_pasta' / 'replica.db')
+
+    assert download(QUERY)['ORIGEM'].tolist() == ['primario']
+    # The replica is skipped until 'retry_seconds' pass.
+    assert target_route('reporting') == ['primary']
+
+
+def test_unconfigured_target_uses_the_primary(targets):
+    assert target_route('analitico') == ['primary']
+    assert target_route('reporting') == ['reporting', 'primary']
@@ -0,0 +1,48 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+np = pytest.importorskip("numpy")
+
+from main_functions.transferencias import calcular_transferencias, match_transfers
+
+
+def test_match_transfers_moves_surplus_to_the_largest_deficits():
+    stock = np.array([[100.0, 0.0, 5.0, 0.0],
+                      [10.0, 10.0, 10.0, 10.0]])
+    rate = np.array([[1.0, 2.0, 1.0, 1.0],
+                     [1.0, 1.0, 1.0, 1.0]])
+
+    transfers, deficit, surplus = match_transfers(stock, rate, 30)
+
+    assert deficit[0].tolist() == [0.0, 60.0, 25.0, 30.0]
+    assert surplus[0].tolist() == [70.0, 0.0, 0.0, 0.0]
+    # 70 units cover the 60 of branch 1 first, then 10 of the 30 of branch 3.
+    assert transfers[0, 0].tolist() == [0.0, 60.0, 0.0, 10.0]
+    assert transfers[0, 1:].sum() == 0
+    # Nobody has a surplus of the second product.
+    assert transfers[1].sum() == 0
+
+
+def test_fractional_stock_moves_whole_units():
+    stock = np.array([[2.5, 14.7]])
+    rate = np.array([[1.0, 1.0]])
+
+    transfers, deficit, surplus = match_transfers(stock, rate, 4)
+
+    assert deficit.tolist() == [[2.0, 0.0]]
+    assert surplus.tolist() == [[0.0, 10.0]]
+    assert transfers[0, 1].tolist() == [2.0, 0.0]
+    assert np.array_equal(transfers, np.round(transfers))
+
+
+def test_calcular_transferencias_lists_the_transfers():
+    estoque = pd.DataFrame({'B2_COD': ['A  ', 'A  ', 'B  ', 'B  '], 'B2_FILIAL': ['0101', '0104', '0101', '0104'],
+                            'B2_QATU': [50.0, 0.0, 0.0, 2.0]})
+    vendas = pd.DataFrame({'D2_COD': ['A', 'A', 'B'], 'D2_QUANT': [10.0, 20.0, 30.0],
+                           'FILIAL': ['0101', '0104', '0101']})
+
+    result = calcular_transferencias(estoque, vendas, ('0101', '0104'), 10, cover_days=5)
+
+    assert result[['COD', 'FILIAL_ORIGEM', 'FILIAL_DESTINO', 'QUANTIDADE']].values.tolist() == [
+        ['A', '0101', '0104', 10.0], ['B', '0104', '0101', 2.0]]
+    assert result['FALTA_PROJETADA'].tolist() == [10.0, 15.0]
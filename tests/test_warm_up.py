@@ -0,0 +1,27 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("sqlalchemy")
+
+from database_functions.snapshots import snapshot_age_text
+from main_functions import warm_up
+
+
+def test_hot_data_results_carry_their_load_time(hot_data):
+    result = warm_up.search_hot_data('A1')
+
+    assert sorted(result['B1_COD'].str.strip()) == ['A1', 'A2']
+    assert result.attrs['source'] == 'hot_data'
+    assert result.attrs['snapshot_created'] == hot_data
+    assert snapshot_age_text(result) == "Dados carregados há 3 min"
+
+
+def test_hot_data_batch_results_carry_their_load_time(hot_data):
+    result = warm_up.search_hot_data_batch(['B1'])
+
+    assert result['B1_COD'].str.strip().tolist() == ['B1']
+    assert result.attrs['snapshot_created'] == hot_data
+
+
+def test_hot_data_search_ignores_case(hot_data):
+    assert sorted(warm_up.search_hot_data(' a2 ')['B1_COD'].str.strip()) == ['A1', 'A2']
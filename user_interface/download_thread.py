@@ -1,5 +1,6 @@
 from PyQt5.QtCore import QThread, pyqtSignal
 import logging
+from database_functions.progress import progress_job
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -9,17 +10,25 @@ class DownloadThread(QThread):
     progress_started = pyqtSignal()
     progress_stopped = pyqtSignal()
     finished_with_result = pyqtSignal(object)
+    progress_changed = pyqtSignal(object)
+    job_progress = pyqtSignal(object)
 
-    def __init__(self, func, *args, **kwargs):
+    def __init__(self, func, *args, report_progress=False, **kwargs):
         super(DownloadThread, self).__init__()
         self.func = func
         self.args = args
         self.kwargs = kwargs
 
+        # Let the function report its progress through the progress_changed signal.
+        if report_progress:
+            self.kwargs['progress'] = self.progress_changed.emit
+
     def run(self):
         try:
             self.progress_started.emit()
-            result = self.func(*self.args, **self.kwargs)
+            # The downloads made by the function report their progress through job_progress.
+            with progress_job(self.job_progress.emit):
+                result = self.func(*self.args, **self.kwargs)
             self.finished_with_result.emit(result)
             logger.info(f"Successfully executed {self.func.__name__}")
         except Exception as e:
@@ -1,56 +1,229 @@
 import logging
 import pandas
 from . import resources_rc
+from PyQt5.QtCore import QRect, QTimer
 from PyQt5.QtGui import QColor
-from PyQt5.QtWidgets import QTableWidgetItem, QCheckBox, QVBoxLayout
+from PyQt5.QtWidgets import QTableWidgetItem, QCheckBox, QVBoxLayout, QLabel, QPlainTextEdit, QPushButton
 from .download_thread import DownloadThread
+from main_functions.monitor_estoque import StockMonitor, monitor_interval_seconds
+from main_functions.busca_produtos import search_function, batch_search_function, parse_codes, search_with_pivot
+from database_functions.snapshots import snapshot_age_text
+from database_functions.cancellation import CancellationToken
+from database_functions.progress import progress_text
 
 logger = logging.getLogger(__name__)
 
+# Time without typing, in milliseconds, before the code in lineEdit is searched.
+SEARCH_DEBOUNCE_MS = 500
+
+# Column of each branch in the search table: Matriz, Cariacica, Poconé and Parauapebas.
+BRANCH_COLUMNS = {'0101': 1, '0104': 2, '0103': 3, '0105': 4}
+
+# Background of the cells updated by the live stock mode.
+CHANGED_CELL_COLOR = QColor(255, 230, 150)
+
 
 class BaseLogic:
-    def __init__(self, ui):
+    def __init__(self, ui, progress_bar=None):
         self.ui = ui
         self.download_thread = None
+        # Each view shows the progress of its own jobs in its own bar.
+        self.progress_bar = progress_bar
 
     def on_thread_finished(self):
         self.download_thread.deleteLater()
 
     def start_progress(self):
-        self.ui.progressBar.show()
-        self.ui.progress_sug.show()
-        self.ui.progressBar_search.show()
-        self.ui.progressBar_2.show()
+        if self.progress_bar is None:
+            return
+        # Busy indicator until the first event with an estimated total arrives.
+        self.progress_bar.setRange(0, 0)
+        self.progress_bar.setToolTip("")
+        self.progress_bar.show()
+
+    def update_progress(self, event):
+        """
+        Show a progress event of the data layer (see progress.ProgressReporter).
+        """
+        if self.progress_bar is None:
+            return
+        text = progress_text(event)
+        if event['percent'] is not None:
+            self.progress_bar.setRange(0, 100)
+            self.progress_bar.setValue(event['percent'])
+            self.progress_bar.setFormat("%p%")
+        else:
+            self.progress_bar.setRange(0, 0)
+        self.progress_bar.setToolTip(text)
+        self.ui.statusBar().showMessage(text, 5000)
 
     def stop_progress(self):
-        self.ui.progressBar.hide()
-        self.ui.progress_sug.hide()
-        self.ui.progressBar_search.hide()
-        self.ui.progressBar_2.hide()
+        if self.progress_bar is None:
+            return
+        self.progress_bar.hide()
 
 
 class BuscaLogic(BaseLogic):
 
     def __init__(self, ui):
-        super().__init__(ui)
+        super().__init__(ui, ui.progressBar_search)
+        self.snapshot_label = QLabel(self.ui.base_frame_search)
+        self.snapshot_label.setGeometry(QRect(350, 355, 400, 20))
+        self.snapshot_label.setStyleSheet("color: rgb(150, 90, 0);")
+
+        # Paste area for searching a list of codes at once.
+        self.batch_codes = QPlainTextEdit(self.ui.base_frame_search)
+        self.batch_codes.setGeometry(QRect(10, 320, 200, 210))
+        self.batch_codes.setPlaceholderText("Cole aqui uma lista de códigos")
+        self.batch_codes.setStyleSheet("color: rgb(0, 0, 0);\n"
+                                       "background-color: rgb(214, 214, 214);")
+        self.batch_search_start = QPushButton("Buscar lista", self.ui.base_frame_search)
+        self.batch_search_start.setGeometry(QRect(220, 320, 110, 30))
+        self.batch_search_start.setStyleSheet(self.ui.search_start.styleSheet())
+
+        # Every search gets a generation number; only the latest one may update the view.
+        self.search_generation = 0
+        self.search_token = None
+        self.search_threads = set()
+
+        self.debounce_timer = QTimer()
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.setInterval(SEARCH_DEBOUNCE_MS)
+
+        # Live mode: poll the stock changes and update the cells of the displayed codes.
+        self.live_check = QCheckBox("Ao vivo", self.ui.base_frame_search)
+        self.live_check.setGeometry(QRect(220, 360, 110, 20))
+        self.stock_monitor = StockMonitor()
+        self.live_timer = QTimer()
+        self.live_timer.setInterval(int(monitor_interval_seconds() * 1000))
+        self.live_thread = None
+        self.displayed_rows = {}
         self.setup_connections()
 
     def setup_connections(self):
         self.ui.search_start.clicked.connect(self.start_search)
+        self.batch_search_start.clicked.connect(self.start_batch_search)
+        self.ui.lineEdit.returnPressed.connect(self.start_search)
+        self.ui.lineEdit.textEdited.connect(lambda _: self.debounce_timer.start())
+        self.debounce_timer.timeout.connect(self.on_typing_stopped)
+        self.live_check.toggled.connect(self.on_live_toggled)
+        self.live_timer.timeout.connect(self.poll_stock)
+
+    def on_typing_stopped(self):
+        if self.ui.lineEdit.text().strip():
+            self.start_search()
 
     def start_search(self):
         product_id = self.ui.lineEdit.text().strip()
-        self.download_thread = DownloadThread(search_function, product_id)
+        self.run_search(search_function, product_id, self.on_search_result)
+
+    def start_batch_search(self):
+        codes = parse_codes(self.batch_codes.toPlainText())
+        if codes:
+            self.run_search(batch_search_function, codes, self.on_batch_result)
+
+    def run_search(self, func, search, on_result):
+        """
+        Run a search in a DownloadThread, superseding the one still running.
+
+        Parameters:
+        - func (callable): search_function or batch_search_function.
+        - search: The code or list of codes to search.
+        - on_result (callable): Receives the generation of the search, its result and the pivot of the table.
+        """
+        self.debounce_timer.stop()
+
+        # Cancel the search still running, its result would be outdated.
+        if self.search_token:
+            self.search_token.cancel()
+        self.search_generation += 1
+        generation = self.search_generation
+        self.search_token = CancellationToken()
+
+        # The pivot of the table is built in the thread too (or in a compute worker for large results).
+        self.download_thread = DownloadThread(search_with_pivot, func, search, token=self.search_token)
         self.download_thread.progress_started.connect(self.start_progress)
-        self.download_thread.progress_stopped.connect(self.stop_progress)
+        self.download_thread.progress_stopped.connect(lambda: self.on_search_stopped(generation))
+        self.download_thread.job_progress.connect(lambda event: self.on_search_progress(generation, event))
+        self.download_thread.finished_with_result.connect(lambda result: on_result(generation, *result))
+
+        # Keep a reference to every running thread until it finishes.
+        thread = self.download_thread
+        self.search_threads.add(thread)
+        thread.finished.connect(lambda: self.on_search_thread_finished(thread))
+
+        thread.start()
+
+    def on_search_result(self, generation, df, pivot):
+        # Drop the results of searches superseded by a newer one.
+        if generation != self.search_generation:
+            return
+        self.update_labels(df)
+        self.display_dataframe(pivot)
+
+    def on_batch_result(self, generation, df, pivot):
+        # Drop the results of searches superseded by a newer one.
+        if generation != self.search_generation:
+            return
+        self.snapshot_label.setText(snapshot_age_text(df))
+        self.clear_labels()
+        if df is None:
+            self.ui.agrup_label.setText(f"Agrupamento: Lista não encontrada!")
+        else:
+            not_found = df.attrs.get('not_found', [])
+            self.ui.agrup_label.setText(f"Agrupamento: Lista de códigos")
+            self.ui.desc_label.setText(f"Descrição: {df['B1_COD'].nunique()} códigos encontrados")
+            if not_found:
+                self.ui.group_label.setText(f"Não encontrados: {', '.join(not_found[:5])}"
+                                            f"{'...' if len(not_found) > 5 else ''}")
+        self.display_dataframe(pivot)
+
+    def on_search_progress(self, generation, event):
+        if generation == self.search_generation:
+            self.update_progress(event)
+
+    def on_search_stopped(self, generation):
+        if generation == self.search_generation:
+            self.stop_progress()
 
-        # Connect both update_labels to the finished_with_result signal
-        self.download_thread.finished_with_result.connect(self.update_labels)
-        self.download_thread.finished_with_result.connect(self.display_dataframe)
+    def on_search_thread_finished(self, thread):
+        self.search_threads.discard(thread)
+        thread.deleteLater()
 
-        self.download_thread.start()
+    def on_live_toggled(self, checked):
+        if checked:
+            self.poll_stock()
+            self.live_timer.start()
+        else:
+            self.live_timer.stop()
+
+    def poll_stock(self):
+        # Skip a poll while the previous one (or the first load of the stock) still runs.
+        if self.live_thread is not None and self.live_thread.isRunning():
+            return
+        self.live_thread = DownloadThread(self.stock_monitor.poll)
+        self.live_thread.finished_with_result.connect(self.apply_stock_changes)
+        self.live_thread.start()
+
+    def apply_stock_changes(self, changes):
+        """
+        Update and highlight the cells of the displayed codes whose stock changed.
+
+        Parameters:
+        - changes (list): (code, branch, old quantity, new quantity) from StockMonitor.poll.
+        """
+        for code, branch, _, quantity in changes or []:
+            row_index = self.displayed_rows.get(code)
+            column_index = BRANCH_COLUMNS.get(branch)
+            if row_index is None or column_index is None:
+                continue
+            item = QTableWidgetItem(str(quantity))
+            item.setBackground(CHANGED_CELL_COLOR)
+            self.ui.search_result.setItem(row_index, column_index, item)
 
     def update_labels(self, df):
+        # Tell the user when the result came from an offline snapshot.
+        self.snapshot_label.setText(snapshot_age_text(df))
         if df is None or df.empty:
             self.clear_labels()
             self.ui.agrup_label.setText(f"Agrupamento: Não encontrado!")
@@ -79,42 +252,29 @@ class BuscaLogic(BaseLogic):
             self.ui.group_label.setText(f"Grupo: {item_group_value} - {group_desc}")
             self.ui.desc_label.setText(f"Descrição: {desc_value}")
 
-    def display_dataframe(self, df):
+    def display_dataframe(self, grouped_df):
         """
-        Display the dataframe in the QTableWidget.
+        Display the quantities per branch (see pivot_estoque) in the QTableWidget.
         """
-        if df is None or df.empty:
+        # Rows of the displayed codes, for the live stock updates.
+        self.displayed_rows = {}
+        if grouped_df is None or grouped_df.empty:
             self.ui.search_result.clearContents()
             self.ui.search_result.setRowCount(1)
             return
 
-            # Rename columns
-        column_names = {"B1_COD": "Código", "B2_QATU": "Quantidade", "B2_FILIAL": "Filial"}
-        df.rename(columns=column_names, inplace=True)
-
-        # Group by 'Código' and aggregate 'Quantidade' for each 'Filial'
-        grouped_df = df.pivot_table(index='Código', columns='Filial', values='Quantidade', aggfunc='sum', fill_value=0)
-
         # Set the row count
         self.ui.search_result.setRowCount(grouped_df.shape[0])
 
-        # Define the column index for branches
-        matriz_col_index = 1
-        cariacica_col_index = 2
-        pocone_col_index = 3
-        paraua_col_index = 4
-
         # Populate the QTableWidget
         for row_index, (codigo, row_data) in enumerate(grouped_df.iterrows()):
             # Set code value
             self.ui.search_result.setItem(row_index, 0, QTableWidgetItem(str(codigo)))
+            self.displayed_rows[str(codigo).strip().upper()] = row_index
 
             # Set quantities in respective columns
-            self.ui.search_result.setItem(row_index, matriz_col_index, QTableWidgetItem(str(row_data.get('0101', 0))))
-            self.ui.search_result.setItem(row_index, cariacica_col_index,
-                                          QTableWidgetItem(str(row_data.get('0104', 0))))
-            self.ui.search_result.setItem(row_index, pocone_col_index, QTableWidgetItem(str(row_data.get('0103', 0))))
-            self.ui.search_result.setItem(row_index, paraua_col_index, QTableWidgetItem(str(row_data.get('0105', 0))))
+            for filial, column_index in BRANCH_COLUMNS.items():
+                self.ui.search_result.setItem(row_index, column_index, QTableWidgetItem(str(row_data.get(filial, 0))))
 
     def clear_labels(self):
         self.ui.agrup_label.setText(f"Agrupamento: ")
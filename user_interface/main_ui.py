@@ -2,9 +2,11 @@ import logging
 import os
 from datetime import datetime
 from PyQt5.QtWidgets import QMainWindow, QDesktopWidget, QWidget, QFileDialog
-from PyQt5.QtCore import QPropertyAnimation, Qt, QPoint
+from PyQt5.QtCore import QPropertyAnimation, Qt, QPoint, QTimer
 from .design import Ui_MainWindow
 from .logic import BuscaLogic
+from .download_thread import DownloadThread
+from main_functions.warm_up import warm_up, hot_data_refresh_interval
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +16,7 @@ class MainWindowLogic(QMainWindow, Ui_MainWindow):
     def __init__(self):
         super().__init__()
         self.create_df_thread = None
+        self.warm_up_thread = None
         self.update_excel_thread = None
         self.update_inv_thread = None
         self.setupUi(self)
@@ -23,6 +26,10 @@ class MainWindowLogic(QMainWindow, Ui_MainWindow):
         self._drag_position = QPoint()
         self.search_logic = BuscaLogic(self)
 
+        # Reloads the search data in the background before it expires.
+        self.hot_data_timer = QTimer(self)
+        self.hot_data_timer.timeout.connect(self.refresh_hot_data)
+
         self.progressBar.hide()
         self.progress_sug.hide()
         self.progressBar_search.hide()
@@ -46,6 +53,31 @@ class MainWindowLogic(QMainWindow, Ui_MainWindow):
         self.utility_frame.mouseMoveEvent = self.utility_frame_mouseMoveEvent
         self.utility_frame.mouseReleaseEvent = self.utility_frame_mouseReleaseEvent
 
+    def start_warm_up(self):
+        """
+        Open the database connection and load the search data in the background.
+
+        Progress is shown in the status bar only, the progress bars stay hidden.
+        """
+        self.warm_up_thread = DownloadThread(warm_up, report_progress=True)
+        self.warm_up_thread.progress_changed.connect(self.statusBar().showMessage)
+        self.warm_up_thread.finished_with_result.connect(
+            lambda _: QTimer.singleShot(5000, self.statusBar().clearMessage))
+        self.warm_up_thread.start()
+        self.hot_data_timer.start(int(hot_data_refresh_interval().total_seconds() * 1000))
+
+    def refresh_hot_data(self):
+        """
+        Reload the search data in the background, silently.
+
+        Skipped while the previous load is still running. If a refresh fails the
+        old data keeps answering until it expires, then searches go to the database.
+        """
+        if self.warm_up_thread is not None and self.warm_up_thread.isRunning():
+            return
+        self.warm_up_thread = DownloadThread(warm_up)
+        self.warm_up_thread.start()
+
     def switch_view(self, index):
         self.view.setCurrentIndex(index)
 